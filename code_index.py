@@ -0,0 +1,203 @@
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+## Inverted index from clinical codes (SNOMED, RxNorm, ...) to patients.
+##
+## Built at ingest from the structured documents (structured_data_upload.py
+## keeps `code` and `codeSystem` on every coded resource: conditions,
+## medications, care plans, encounters, immunizations, procedures)
+## and written next to the S3 outputs as four NumPy files that load with
+## mmap_mode="r" - nothing is parsed or copied at startup:
+##
+##   patients.npy  sorted patient ids (fixed-width bytes); position = ordinal
+##   keys.npy      sorted "system:code" keys, binary-searched in place
+##   offsets.npy   int64, postings of keys[i] are postings[offsets[i]:offsets[i+1]]
+##   postings.npy  int32 patient ordinals, sorted within each key
+##
+## A code lookup is one searchsorted over the keys plus a slice; "patients with
+## all of these codes" is a merge of sorted int32 arrays.
+##
+## Usage: python code_index.py build s3://structuredhealthbotdata/structured/ --out code_index
+##        python code_index.py count snomed:44054006 rxnorm:860975
+##        python code_index.py lookup snomed:44054006
+
+SYSTEMS = {
+    "http://snomed.info/sct": "snomed",
+    "http://www.nlm.nih.gov/research/umls/rxnorm": "rxnorm",
+    "http://loinc.org": "loinc",
+    "http://hl7.org/fhir/sid/cvx": "cvx",
+}
+FILES = ("patients.npy", "keys.npy", "offsets.npy", "postings.npy", "header.json")
+
+
+def code_key(system, code):
+    """'snomed:44054006'; unknown systems keep their URI; None without a code"""
+    if not code:
+        return None
+    return f"{SYSTEMS.get(system, system or 'unknown')}:{code}"
+
+
+class CodeIndexBuilder:
+
+    def __init__(self):
+        self.postings = defaultdict(set)  # key -> patient ids
+        self.patients = set()
+
+    def add_document(self, document: dict):
+        pid = (document.get("patient") or {}).get("id")
+        if not pid:
+            return
+        self.patients.add(pid)
+        # Every list section with coded entries, so resource types added to fhir_paths.json are indexed too
+        for entries in document.values():
+            if not isinstance(entries, list):
+                continue
+            for entry in entries:
+                if isinstance(entry, dict):
+                    key = code_key(entry.get("codeSystem"), entry.get("code"))
+                    if key:
+                        self.postings[key].add(pid)
+
+    def add_index(self, index: "CodeIndex"):
+        """
+        Carry over an earlier index, so a run that ingests only some bundles
+        does not drop everyone else. Call after this run's add_document calls:
+        re-ingested patients keep only their new codes.
+        """
+        patients = [pid.decode("utf-8") for pid in index.patients.tolist()]
+        keep = np.fromiter((pid not in self.patients for pid in patients), dtype=bool, count=len(patients))
+        for slot, key in enumerate(index.keys.tolist()):
+            ordinals = np.asarray(index.postings[index.offsets[slot]:index.offsets[slot + 1]])
+            kept = ordinals[keep[ordinals]]
+            if len(kept):
+                self.postings[key.decode("utf-8")].update(patients[i] for i in kept.tolist())
+        self.patients.update(pid for pid, kept in zip(patients, keep.tolist()) if kept)
+
+    def write(self, directory: str) -> dict:
+        os.makedirs(directory, exist_ok=True)
+        patients = sorted(self.patients)
+        ordinal = {pid: i for i, pid in enumerate(patients)}
+        keys = sorted(self.postings)
+
+        lengths = np.fromiter((len(self.postings[key]) for key in keys), dtype=np.int64, count=len(keys))
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        for i, key in enumerate(keys):
+            postings[offsets[i]:offsets[i + 1]] = sorted(ordinal[pid] for pid in self.postings[key])
+
+        np.save(os.path.join(directory, "patients.npy"), np.array(patients, dtype=bytes) if patients else np.zeros(0, "S1"))
+        np.save(os.path.join(directory, "keys.npy"), np.array(keys, dtype=bytes) if keys else np.zeros(0, "S1"))
+        np.save(os.path.join(directory, "offsets.npy"), offsets)
+        np.save(os.path.join(directory, "postings.npy"), postings)
+        header = {"patients": len(patients), "codes": len(keys), "postings": int(offsets[-1]), "built_at": time.time()}
+        with open(os.path.join(directory, "header.json"), "w") as f:
+            json.dump(header, f)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in FILES)
+        print(f"✅ Code index: {len(keys)} codes, {len(patients)} patients, {header['postings']} postings ({size / 1024:.0f} KB) → {directory}")
+        return header
+
+
+class CodeIndex:
+    """Read side: memory-mapped, safe to share between threads"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.patients = np.load(os.path.join(directory, "patients.npy"), mmap_mode="r")
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(directory, "postings.npy"), mmap_mode="r")
+
+    def ordinals(self, key: str) -> np.ndarray:
+        """Sorted patient ordinals for one 'system:code' key (empty when unknown)"""
+        needle = key.encode("utf-8")
+        slot = int(np.searchsorted(self.keys, needle))
+        if slot >= len(self.keys) or self.keys[slot] != needle:
+            return self.postings[0:0]
+        return self.postings[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def all_of(self, keys) -> np.ndarray:
+        """Patients carrying every key, rarest first so the intersection shrinks fast"""
+        arrays = sorted((self.ordinals(key) for key in keys), key=len)
+        if not arrays:
+            return self.postings[0:0]
+        result = np.asarray(arrays[0])
+        for array in arrays[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, array, assume_unique=True)
+        return result
+
+    def any_of(self, keys) -> np.ndarray:
+        arrays = [self.ordinals(key) for key in keys]
+        return np.unique(np.concatenate(arrays)) if arrays else self.postings[0:0]
+
+    def count(self, key: str) -> int:
+        return len(self.ordinals(key))
+
+    def patient_ids(self, ordinals: np.ndarray, limit: int = None) -> list:
+        selected = ordinals if limit is None else ordinals[:limit]
+        return [pid.decode("utf-8") for pid in self.patients[selected]]
+
+    def lookup(self, key: str, limit: int = None) -> list:
+        return self.patient_ids(self.ordinals(key), limit)
+
+
+def download_code_index(bucket: str, directory: str, prefix: str = "code_index/") -> bool:
+    """Fetch the index currently on S3 into `directory`; False when there is none yet"""
+    import boto3
+    from botocore.exceptions import ClientError
+    s3 = boto3.client("s3")
+    os.makedirs(directory, exist_ok=True)
+    for name in FILES:
+        try:
+            s3.download_file(bucket, f"{prefix}{name}", os.path.join(directory, name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+    return True
+
+
+def upload_code_index(directory: str, bucket: str, prefix: str = "code_index/"):
+    import boto3
+    s3 = boto3.client("s3")
+    for name in FILES:
+        s3.upload_file(os.path.join(directory, name), bucket, f"{prefix}{name}")
+    print(f"✅ Uploaded code index → s3://{bucket}/{prefix}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Code -> patient inverted index")
+    parser.add_argument("command", choices=["build", "lookup", "count"])
+    parser.add_argument("arguments", nargs="*")
+    parser.add_argument("--out", default=os.getenv("CODE_INDEX_DIR", "code_index"))
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from patient_store import iter_local, iter_s3
+        source = args.arguments[0]
+        builder = CodeIndexBuilder()
+        for document in iter_s3(source) if source.startswith("s3://") else iter_local(source):
+            builder.add_document(document)
+        builder.write(args.out)
+        sys.exit(0)
+
+    index = CodeIndex(args.out)
+    started = time.perf_counter()
+    if args.command == "lookup":
+        for key in args.arguments:
+            print(f"{key}: {index.count(key)} patient(s)")
+            print("\n".join(index.lookup(key, args.limit)))
+    else:
+        matched = index.all_of(args.arguments)
+        print(f"{len(matched)} patient(s) with all of {', '.join(args.arguments)}")
+    print(f"⏱️ {(time.perf_counter() - started) * 1e6:.0f} µs")
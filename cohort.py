@@ -0,0 +1,609 @@
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_right
+from datetime import date
+
+## Population-level cohort queries over the structured EHR tables.
+##
+## A filter expression such as
+##
+##     condition:diabetes and medication:metformin and not careplan:"diabetes self management"
+##     (medication:simvastatin or medication:atorvastatin) and age>=65 and gender:female
+##     condition:44054006 and medication:860975        (all-digit values match codes)
+##
+## is parsed once into a small tree and compiled into one set-based query over
+## `patients`: every condition/medication/careplan term becomes an
+## uncorrelated `p.id IN (SELECT patient_id FROM <table> WHERE ...)` semi-join
+## with its predicate pushed into the child-table scan (never a join of whole
+## child tables followed by DISTINCT), OR-ed terms on the same table share one
+## scan, and age is rewritten into a birthdate range so it stays sargable. All
+## tables are distributed on the patient key, so the semi-joins are collocated.
+##
+## CohortIndex is an optional local cache: one bitmap (a Python int) of patient
+## positions per description, code, gender and birth year, rebuilt when a new
+## ingest batch lands. Intersections then take milliseconds with no database
+## round trip. It is cached as JSON (bitmaps as hex), so loading a path taken
+## from the environment never runs code. Both paths give the same counts: SQL
+## negations compile to `(...) IS NOT TRUE`, so a patient with no gender or
+## birthdate is in `not gender:female` exactly as in the bitmap complement.
+## Runs against Redshift or a local Postgres (--dsn).
+##
+## Usage: python cohort.py --dsn postgresql://localhost/healthbot setup
+##        python cohort.py --dsn postgresql://localhost/healthbot seed fhir_structured/
+##        python cohort.py count 'condition:diabetes and medication:metformin'
+##        python cohort.py --index cohort_index.json bench 'age>=65 and medication:lisinopril'
+
+COHORT_DSN = os.getenv("COHORT_DSN")
+COHORT_INDEX_PATH = os.getenv("COHORT_INDEX_PATH")
+
+# filter field -> (table, text column); any of them can also be matched by code
+# (SNOMED for conditions and care plans, RxNorm for medications)
+TABLE_FIELDS = {
+    "condition": ("conditions", "description"),
+    "medication": ("medications", "medication"),
+    "careplan": ("careplans", "description"),
+}
+CODE_COLUMNS = {"conditions": "code", "medications": "code", "careplans": "code"}
+FIELD_ALIASES = {
+    "conditions": "condition", "diagnosis": "condition",
+    "medications": "medication", "med": "medication", "meds": "medication", "drug": "medication",
+    "careplans": "careplan", "plan": "careplan",
+}
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|(>=|<=|!=|=|<|>|:)|([^\s()"<>=!:]+))')
+
+
+class CohortSyntaxError(ValueError):
+    pass
+
+
+# =============================
+# Parsing
+# =============================
+#
+# Tree nodes are tuples:
+#   ("and", [nodes]) ("or", [nodes]) ("not", node)
+#   ("has", table, "text" | "code", value)
+#   ("gender", value) ("deceased", bool) ("born", "<=" | ">", date)
+
+def tokenize(expression: str) -> list:
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise CohortSyntaxError(f"Unexpected input at: {expression[position:]!r}")
+        open_paren, close_paren, quoted, operator, word = match.groups()
+        if open_paren or close_paren:
+            tokens.append(("paren", open_paren or close_paren))
+        elif quoted is not None:
+            tokens.append(("value", quoted))
+        elif operator:
+            tokens.append(("op", operator))
+        else:
+            tokens.append(("word", word))
+        position = match.end()
+    return tokens
+
+
+def years_before(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:  # 29 February
+        return day.replace(year=day.year - years, day=28)
+
+
+def age_terms(op: str, age: int, today: date) -> list:
+    """age <op> N -> birthdate bounds: age >= N <=> born on or before today minus N years"""
+    at_least = lambda n: ("born", "<=", years_before(today, n))
+    at_most = lambda n: ("born", ">", years_before(today, n + 1))
+    if op == ">=":
+        return [at_least(age)]
+    if op == ">":
+        return [at_least(age + 1)]
+    if op == "<=":
+        return [at_most(age)]
+    if op == "<":
+        return [at_most(age - 1)]
+    if op in ("=", ":"):
+        return [at_least(age), at_most(age)]
+    raise CohortSyntaxError(f"Unsupported age comparison: {op}")
+
+
+class Parser:
+
+    def __init__(self, expression: str, today: date = None):
+        self.tokens = tokenize(expression)
+        self.position = 0
+        self.today = today or date.today()
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise CohortSyntaxError("Empty cohort expression")
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise CohortSyntaxError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ("word", "or"):
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek()[0] in ("word", "value") or self.peek() == ("paren", "("):
+            if self.peek() == ("word", "or"):
+                break
+            if self.peek() == ("word", "and"):
+                self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == ("word", "not"):
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_term()
+
+    def parse_term(self):
+        kind, text = self.take()
+        if (kind, text) == ("paren", "("):
+            node = self.parse_or()
+            if self.take() != ("paren", ")"):
+                raise CohortSyntaxError("Missing closing parenthesis")
+            return node
+        if kind != "word":
+            raise CohortSyntaxError(f"Expected a field name, got {text!r}")
+
+        field = FIELD_ALIASES.get(text.lower(), text.lower())
+        op_kind, op = self.take()
+        if op_kind != "op":
+            raise CohortSyntaxError(f"Expected ':' or a comparison after {text!r}")
+        value_kind, value = self.take()
+        if value_kind not in ("word", "value"):
+            raise CohortSyntaxError(f"Missing value for {text!r}")
+
+        if field == "code":
+            return ("or", [("has", table, "code", value) for table in CODE_COLUMNS])
+        if field in TABLE_FIELDS:
+            table = TABLE_FIELDS[field][0]
+            if table in CODE_COLUMNS and value.isdigit():
+                return ("has", table, "code", value)
+            return ("has", table, "text", value.lower())
+        if field == "gender":
+            return ("gender", value.lower())
+        if field == "deceased":
+            return ("deceased", value.lower() in ("yes", "true", "1"))
+        if field == "age":
+            if not value.isdigit():
+                raise CohortSyntaxError(f"Age must be a whole number, got {value!r}")
+            terms = age_terms(op, int(value), self.today)
+            return terms[0] if len(terms) == 1 else ("and", terms)
+        raise CohortSyntaxError(f"Unknown field {text!r}")
+
+
+def parse(expression: str, today: date = None):
+    return Parser(expression, today).parse()
+
+
+# =============================
+# SQL compilation
+# =============================
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _leaf_predicate(node, params: list) -> str:
+    """Predicate for one table term, evaluated inside the child-table scan"""
+    _, table, match, value = node
+    if match == "code":
+        params.append(value)
+        return f"{CODE_COLUMNS[table]} = %s"
+    column = next(col for tbl, col in TABLE_FIELDS.values() if tbl == table)
+    params.append(_like_pattern(value))
+    return f"LOWER({column}) LIKE %s"
+
+
+def _semi_join(table: str, predicates: list) -> str:
+    return f"p.id IN (SELECT patient_id FROM {table} WHERE {' OR '.join(predicates)})"
+
+
+def compile_node(node, params: list) -> str:
+    kind = node[0]
+    if kind == "has":
+        return _semi_join(node[1], [_leaf_predicate(node, params)])
+    if kind == "gender":
+        params.append(node[1])
+        return "LOWER(p.gender) = %s"
+    if kind == "deceased":
+        return "p.deceaseddatetime IS NOT NULL" if node[1] else "p.deceaseddatetime IS NULL"
+    if kind == "born":
+        params.append(node[2])
+        return f"p.birthdate {node[1]} %s"
+    if kind == "not":
+        # NOT (x) is NULL where x is NULL (no gender, no birthdate); IS NOT TRUE keeps those patients,
+        # matching the bitmap complement
+        return f"({compile_node(node[1], params)}) IS NOT TRUE"
+    if kind == "and":
+        return "(" + " AND ".join(compile_node(child, params) for child in node[1]) + ")"
+    if kind == "or":
+        # Terms on the same child table share one scan: IN (... WHERE a OR b)
+        parts, by_table = [], {}
+        for child in node[1]:
+            if child[0] == "has":
+                by_table.setdefault(child[1], []).append(child)
+            else:
+                parts.append(child)
+        clauses = [
+            _semi_join(table, [_leaf_predicate(child, params) for child in children])
+            for table, children in by_table.items()
+        ]
+        clauses += [compile_node(child, params) for child in parts]
+        return "(" + " OR ".join(clauses) + ")"
+    raise ValueError(f"Unknown cohort node: {kind}")
+
+
+def compile_count(node) -> tuple:
+    params = []
+    where = compile_node(node, params)
+    return f"SELECT COUNT(*) FROM patients p WHERE {where}", params
+
+
+def compile_ids(node, limit: int = 100) -> tuple:
+    params = []
+    where = compile_node(node, params)
+    return f"SELECT p.id FROM patients p WHERE {where} ORDER BY p.id LIMIT %s", params + [limit]
+
+
+# =============================
+# Local bitmap index
+# =============================
+
+def _hex(bitmap: int) -> str:
+    return format(bitmap, "x")
+
+
+def _bitmap(positions) -> int:
+    """Bitmap (Python int, bit i = patient position i) from an iterable of positions"""
+    positions = list(positions)
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+class CohortIndex:
+    """Patient-position bitmaps per description, code, gender and birth year"""
+
+    def __init__(self, ids: list, batch_id=None):
+        self.ids = ids  # position -> patient id, sorted
+        self.batch_id = batch_id
+        self.everyone = (1 << len(ids)) - 1
+        self.text = {table: {} for table, _ in TABLE_FIELDS.values()}  # table -> lower-cased text -> bitmap
+        self.codes = {table: {} for table in CODE_COLUMNS}  # table -> code -> bitmap
+        self.genders = {}
+        self.deceased = 0
+        self.born_before = {}  # year -> bitmap of patients born before 1 January of that year
+        self.births_in = {}  # year -> sorted [(birthdate, position)]
+        self.with_birthdate = 0
+
+    @classmethod
+    def build(cls, conn):
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(batch_id), 0) FROM ingest_batches;")
+            batch_id = cur.fetchone()[0]
+            cur.execute("SELECT id, LOWER(gender), birthdate, deceaseddatetime IS NOT NULL FROM patients ORDER BY id;")
+            patients = cur.fetchall()
+            index = cls([row[0] for row in patients], batch_id)
+            position = {pid: i for i, pid in enumerate(index.ids)}
+
+            genders, deceased = {}, []
+            for i, (_, gender, birthdate, is_deceased) in enumerate(patients):
+                genders.setdefault(gender, []).append(i)
+                if is_deceased:
+                    deceased.append(i)
+                if birthdate is not None:
+                    index.births_in.setdefault(birthdate.year, []).append((birthdate, i))
+            index.genders = {gender: _bitmap(members) for gender, members in genders.items()}
+            index.deceased = _bitmap(deceased)
+            index._build_birth_years()
+
+            for table, column in TABLE_FIELDS.values():
+                code_column = CODE_COLUMNS.get(table)
+                selected = f"LOWER({column})" + (f", {code_column}" if code_column else "")
+                cur.execute(f"SELECT DISTINCT patient_id, {selected} FROM {table};")
+                by_text, by_code = {}, {}
+                for row in cur.fetchall():
+                    i = position.get(row[0])
+                    if i is None:
+                        continue
+                    if row[1]:
+                        by_text.setdefault(row[1], []).append(i)
+                    if code_column and row[2]:
+                        by_code.setdefault(row[2], []).append(i)
+                index.text[table] = {text: _bitmap(members) for text, members in by_text.items()}
+                if code_column:
+                    index.codes[table] = {code: _bitmap(members) for code, members in by_code.items()}
+        conn.rollback()
+        print(f"✅ Built cohort index over {len(index.ids)} patients in {time.perf_counter() - started:.1f}s")
+        return index
+
+    def _build_birth_years(self):
+        running = 0
+        for year in sorted(self.births_in):
+            self.born_before[year] = running
+            self.births_in[year].sort()
+            running |= _bitmap(i for _, i in self.births_in[year])
+        self.with_birthdate = running
+
+    def born_on_or_before(self, day: date) -> int:
+        years = sorted(self.born_before)
+        if not years:
+            return 0
+        if day.year < years[0]:
+            return 0
+        if day.year > years[-1]:
+            return self.with_birthdate
+        earlier = self.born_before.get(day.year)
+        if earlier is None:  # no births recorded in that year
+            later = [year for year in years if year > day.year]
+            return self.born_before[later[0]]
+        births = self.births_in[day.year]
+        cut = bisect_right(births, (day, len(self.ids)))
+        return earlier | _bitmap(i for _, i in births[:cut])
+
+    def evaluate(self, node) -> int:
+        kind = node[0]
+        if kind == "has":
+            _, table, match, value = node
+            if match == "code":
+                return self.codes[table].get(value, 0)
+            result = 0
+            for text, bitmap in self.text[table].items():
+                if value in text:
+                    result |= bitmap
+            return result
+        if kind == "gender":
+            return self.genders.get(node[1], 0)
+        if kind == "deceased":
+            return self.deceased if node[1] else self.everyone & ~self.deceased
+        if kind == "born":
+            on_or_before = self.born_on_or_before(node[2])
+            return on_or_before if node[1] == "<=" else self.with_birthdate & ~on_or_before
+        if kind == "not":
+            return self.everyone & ~self.evaluate(node[1])
+        if kind == "and":
+            result = self.everyone
+            for child in node[1]:
+                result &= self.evaluate(child)
+                if not result:
+                    break
+            return result
+        if kind == "or":
+            result = 0
+            for child in node[1]:
+                result |= self.evaluate(child)
+            return result
+        raise ValueError(f"Unknown cohort node: {kind}")
+
+    def patient_ids(self, bitmap: int, limit: int = 100) -> list:
+        ids = []
+        while bitmap and len(ids) < limit:
+            lowest = bitmap & -bitmap
+            ids.append(self.ids[lowest.bit_length() - 1])
+            bitmap ^= lowest
+        return ids
+
+    def save(self, path: str):
+        state = {
+            "ids": self.ids,
+            "batch_id": None if self.batch_id is None else int(self.batch_id),
+            "text": {table: {text: _hex(b) for text, b in bitmaps.items()} for table, bitmaps in self.text.items()},
+            "codes": {table: {code: _hex(b) for code, b in bitmaps.items()} for table, bitmaps in self.codes.items()},
+            "genders": [[gender, _hex(b)] for gender, b in self.genders.items()],  # gender may be None
+            "deceased": _hex(self.deceased),
+            "births": [[day.isoformat(), i] for births in self.births_in.values() for day, i in births],
+        }
+        with open(path, "w") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path: str):
+        """Plain JSON - no pickle, since the path can come from COHORT_INDEX_PATH"""
+        with open(path) as f:
+            state = json.load(f)
+        index = cls(state["ids"], state["batch_id"])
+        index.text.update({table: {text: int(b, 16) for text, b in bitmaps.items()} for table, bitmaps in state["text"].items()})
+        index.codes.update({table: {code: int(b, 16) for code, b in bitmaps.items()} for table, bitmaps in state["codes"].items()})
+        index.genders = {gender: int(b, 16) for gender, b in state["genders"]}
+        index.deceased = int(state["deceased"], 16)
+        for day, i in state["births"]:
+            birthdate = date.fromisoformat(day)
+            index.births_in.setdefault(birthdate.year, []).append((birthdate, i))
+        index._build_birth_years()
+        return index
+
+
+def latest_batch_id(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(batch_id), 0) FROM ingest_batches;")
+        batch_id = cur.fetchone()[0]
+    conn.rollback()
+    return batch_id
+
+
+def load_or_build_index(conn, path: str = COHORT_INDEX_PATH) -> CohortIndex:
+    """Reuse the cached index unless a newer ingest batch has been loaded since it was built"""
+    if path and os.path.exists(path):
+        index = CohortIndex.load(path)
+        if index.batch_id == latest_batch_id(conn):
+            return index
+        print(f"🔄 Cohort index is from batch {index.batch_id}; rebuilding")
+    index = CohortIndex.build(conn)
+    if path:
+        index.save(path)
+    return index
+
+
+# =============================
+# Engine
+# =============================
+
+class CohortEngine:
+    """Counts and patient ids for filter expressions, from the bitmap index when one is loaded"""
+
+    def __init__(self, conn, index: CohortIndex = None):
+        self.conn = conn
+        self.index = index
+
+    def _tree(self, expression):
+        return parse(expression) if isinstance(expression, str) else expression
+
+    def count(self, expression) -> int:
+        node = self._tree(expression)
+        if self.index is not None:
+            return self.index.evaluate(node).bit_count()
+        sql, params = compile_count(node)
+        return self._fetch(sql, params)[0][0]
+
+    def patient_ids(self, expression, limit: int = 100) -> list:
+        node = self._tree(expression)
+        if self.index is not None:
+            return self.index.patient_ids(self.index.evaluate(node), limit)
+        sql, params = compile_ids(node, limit)
+        return [row[0] for row in self._fetch(sql, params)]
+
+    def _fetch(self, sql: str, params: list) -> list:
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        self.conn.rollback()
+        return rows
+
+
+# =============================
+# Local Postgres helpers
+# =============================
+
+def _status_code(status):
+    """FHIR clinicalStatus is a CodeableConcept in R4 and a plain string in older bundles"""
+    if isinstance(status, dict):
+        status = (status.get("coding") or [{}])[0].get("code")
+    return status
+
+
+def seed(conn, folder: str) -> int:
+    """Insert structured documents from a local folder into the four cohort tables"""
+    from patient_store import iter_local
+
+    patients, conditions, medications, careplans = [], [], [], []
+    for document in iter_local(folder):
+        patient = document.get("patient") or {}
+        pid = patient.get("id")
+        if not pid:
+            continue
+        patients.append((pid, patient.get("gender"), patient.get("birthDate"), patient.get("deceasedDateTime")))
+        conditions += [
+            (c.get("code"), c.get("description"), c.get("onset"), _status_code(c.get("clinicalStatus")), pid, c.get("codeSystem"))
+            for c in document.get("conditions", [])
+        ]
+        medications += [
+            (m.get("medication"), m.get("authoredOn"), pid, m.get("code"), m.get("codeSystem"))
+            for m in document.get("medications", [])
+        ]
+        careplans += [
+            (c.get("description"), c.get("status"), pid, c.get("code"), c.get("codeSystem"))
+            for c in document.get("careplans", [])
+        ]
+
+    with conn:
+        with conn.cursor() as cur:
+            cur.executemany("INSERT INTO patients (id, gender, birthdate, deceaseddatetime) VALUES (%s, %s, %s, %s);", patients)
+            cur.executemany(
+                "INSERT INTO conditions (code, description, onset, clinicalstatus, patient_id, codesystem) "
+                "VALUES (%s, %s, %s, %s, %s, %s);",
+                conditions
+            )
+            cur.executemany(
+                "INSERT INTO medications (medication, authoredon, patient_id, code, codesystem) VALUES (%s, %s, %s, %s, %s);",
+                medications
+            )
+            cur.executemany(
+                "INSERT INTO careplans (description, status, patient_id, code, codesystem) VALUES (%s, %s, %s, %s, %s);",
+                careplans
+            )
+    print(f"✅ Seeded {len(patients)} patients, {len(conditions)} conditions, {len(medications)} medications, {len(careplans)} care plans")
+    return len(patients)
+
+
+def get_connection(dsn: str = None):
+    if dsn:
+        import psycopg2
+        return psycopg2.connect(dsn)
+    from redshift_loader import get_connection as redshift_connection
+    return redshift_connection()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cohort counts over the structured EHR tables")
+    parser.add_argument("--dsn", default=COHORT_DSN, help="Postgres DSN (default: Redshift via IAM)")
+    parser.add_argument("--index", default=COHORT_INDEX_PATH, help="Answer from a local bitmap index cached at this path")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("command", choices=["setup", "seed", "sql", "count", "ids", "build-index", "bench"])
+    parser.add_argument("argument", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "sql":
+        sql, params = compile_count(parse(args.argument))
+        print(sql)
+        print(params)
+        sys.exit(0)
+
+    conn = get_connection(args.dsn)
+    try:
+        if args.command == "setup":
+            from redshift_schema import create_tables
+            create_tables(conn, portable=bool(args.dsn))
+        elif args.command == "seed":
+            seed(conn, args.argument)
+        elif args.command == "build-index":
+            CohortIndex.build(conn).save(args.index or "cohort_index.json")
+        elif args.command in ("count", "ids"):
+            engine = CohortEngine(conn, load_or_build_index(conn, args.index) if args.index else None)
+            started = time.perf_counter()
+            if args.command == "count":
+                print(f"{engine.count(args.argument)} patient(s)")
+            else:
+                print("\n".join(engine.patient_ids(args.argument, args.limit)))
+            print(f"⏱️ {(time.perf_counter() - started) * 1000:.1f} ms")
+        elif args.command == "bench":
+            node = parse(args.argument)
+            sql_engine = CohortEngine(conn)
+            index_engine = CohortEngine(conn, load_or_build_index(conn, args.index))
+            for label, engine in (("sql", sql_engine), ("bitmap index", index_engine)):
+                started = time.perf_counter()
+                count = engine.count(node)
+                print(f"📊 {label}: {count} patient(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        conn.close()
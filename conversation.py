@@ -0,0 +1,91 @@
+import os
+import re
+import sys
+from collections import deque
+
+# Token counting is shared with the web app's prompt budgeting
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "healthbot-web"))
+from context_budget import count_tokens
+from patient_store import RECORD_TEXT_TOKENS
+
+## Per-session conversation state for the LangGraph CLI (test-models.py).
+##
+## Keeps what a follow-up question needs so run_agent does not start from
+## zero each turn: the parsed record (fetched once per patient), the outputs
+## of tool calls already made, and the conversation itself - recent turns
+## verbatim, older turns folded into a one-line-per-turn summary - bounded to
+## CONVERSATION_TOKENS so the prompt does not grow with the session.
+##
+## The record lookup tool returns up to RECORD_TEXT_TOKENS of record text, so
+## the budget never goes below that plus one exchange: otherwise the first
+## turn's record lookup is trimmed away before the follow-up can reuse it.
+
+EXCHANGE_TOKENS = 500
+CONVERSATION_TOKENS = max(int(os.getenv("CONVERSATION_TOKENS", "0")), RECORD_TEXT_TOKENS + EXCHANGE_TOKENS)
+RECENT_TURNS = 3
+SUMMARY_ANSWER_CHARS = 120
+
+def normalize(question: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+class Conversation:
+
+    def __init__(self, lookup_key: str, record, max_tokens: int = CONVERSATION_TOKENS):
+        self.lookup_key = lookup_key
+        self.record = record
+        self.max_tokens = max_tokens
+        self.recent = deque()  # (question, answer)
+        self.summary = []  # compacted older turns, oldest first
+        self.tool_outputs = {}  # (tool name, tool input) -> output
+        self.answers = {}  # normalized question -> answer
+        self.turns = 0
+
+    def cached_answer(self, question: str):
+        """Answer already given this session to the same question"""
+        return self.answers.get(normalize(question))
+
+    def remember_tools(self, intermediate_steps):
+        """Keep (action, observation) pairs from an AgentExecutor run"""
+        for action, observation in intermediate_steps or ():
+            tool_input = action.tool_input if isinstance(action.tool_input, str) else repr(sorted(action.tool_input.items()))
+            self.tool_outputs[(action.tool, tool_input)] = str(observation)
+
+    def add_turn(self, question: str, answer: str):
+        self.turns += 1
+        self.answers[normalize(question)] = answer
+        self.recent.append((question, answer))
+        while len(self.recent) > RECENT_TURNS:
+            self._fold(*self.recent.popleft())
+        self._trim()
+
+    def _fold(self, question: str, answer: str):
+        first_line = answer.strip().splitlines()[0] if answer.strip() else ""
+        if len(first_line) > SUMMARY_ANSWER_CHARS:
+            first_line = first_line[:SUMMARY_ANSWER_CHARS].rstrip() + "…"
+        self.summary.append(f"Q: {question} → {first_line}")
+
+    def _trim(self):
+        """Drop the oldest material until the rendered context fits the budget"""
+        while count_tokens(self.context()) > self.max_tokens:
+            if self.summary:
+                self.summary.pop(0)
+            elif self.tool_outputs:
+                self.tool_outputs.pop(next(iter(self.tool_outputs)))
+            elif len(self.recent) > 1:
+                self._fold(*self.recent.popleft())
+            else:
+                break
+
+    def context(self) -> str:
+        """Earlier turns and tool results, for the agent's next invocation"""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+        if self.tool_outputs:
+            parts.append("Tool results already retrieved:\n" + "\n".join(
+                f"- {tool}({tool_input}): {output}" for (tool, tool_input), output in self.tool_outputs.items()
+            ))
+        if self.recent:
+            parts.append("Recent turns:\n" + "\n".join(f"User: {q}\nHealthBot: {a}" for q, a in self.recent))
+        return "\n\n".join(parts)
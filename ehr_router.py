@@ -0,0 +1,246 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+# Observation storage/analytics and the interaction list are shared with the web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "healthbot-web"))
+import interactions
+import observations
+
+## Deterministic fast path for the LangGraph CLI (test-models.py).
+##
+## Questions the structured record can answer on its own - medication and
+## condition lists, vitals, dates, counts, interactions within the medication
+## list - are served straight from an index over the parsed EhrRecord.
+## Anything open-ended ("should", "why", "risk", ...) or anything the index
+## cannot match returns None and goes to the GPT-4 AgentExecutor as before. ROUTER_STATS keeps per-route hits and
+## latency, including the agent fallback, for the end-of-session report.
+## "Is my glucose normal?" is answered from the reference-range flags only when
+## it names a measured type that has a range in observations.REFERENCE_RANGES;
+## "is it normal to feel dizzy" and the like still go to the agent.
+
+OPEN_ENDED = re.compile(
+    r"\b(why|should|could|would|risk|risks|safe|recommend|advice|explain|"
+    r"side effects?|cause|treat|better|worse|worry|mean)\b"
+)
+COUNT = re.compile(r"\bhow many\b|\bnumber of\b|\bcount\b")
+WHEN = re.compile(r"\bwhen\b|\bwhat date\b|\bsince when\b")
+NORMAL = re.compile(r"\b(normal|in range|within range)\b")
+LABS = re.compile(r"\babnormal\b|\bout of range\b|\bflagged\b|\blabs?\b|\blab results\b|\btest results\b")
+
+# route name -> (question keywords, observation type keywords, unit)
+VITALS = {
+    "temperature": (("temperature", "fever"), ("body temperature",), "Cel"),
+    "blood pressure": (("blood pressure", " bp"), ("blood pressure",), None),
+    "heart rate": (("heart rate", "pulse"), ("heart rate",), None),
+    "respiratory rate": (("respiratory rate", "breathing rate"), ("respiratory rate",), None),
+    "oxygen saturation": (("oxygen", "spo2", "saturation"), ("oxygen saturation",), None),
+    "weight": (("weight", "weigh "), ("body weight",), None),
+    "height": (("height", "how tall"), ("body height",), None),
+    "bmi": (("bmi", "body mass"), ("body mass index",), None),
+}
+
+
+class RouterStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def record(self, route: str, seconds: float):
+        with self._lock:
+            self.calls[route] += 1
+            self.seconds[route] += seconds
+
+    def report(self) -> str:
+        total = sum(self.calls.values())
+        if not total:
+            return "No questions routed yet."
+        lines = [f"{'route':<20} {'calls':>6} {'share':>7} {'avg':>12}"]
+        for route in sorted(self.calls, key=lambda r: -self.calls[r]):
+            average = self.seconds[route] / self.calls[route]
+            shown = f"{average * 1e6:.0f} µs" if average < 0.01 else f"{average:.2f} s"
+            lines.append(f"{route:<20} {self.calls[route]:>6} {self.calls[route] / total:>7.0%} {shown:>12}")
+        fast = total - self.calls.get("agent", 0)
+        lines.append(f"fast-path hit rate: {fast / total:.0%}")
+        return "\n".join(lines)
+
+
+ROUTER_STATS = RouterStats()
+
+# Words too common in observation names to identify one ("high density", "blood")
+GENERIC_TYPE_WORDS = {"blood", "body", "total", "rate", "high", "low", "density", "mass", "volume", "arterial"}
+
+
+@lru_cache(maxsize=256)
+def record_index(record) -> dict:
+    """Per-record lookups built once: names -> entries, observation summaries per vital"""
+    summaries = observations.summarize(record.observations)
+    vitals = {}
+    for route, (_, type_words, unit) in VITALS.items():
+        vitals[route] = [
+            s for s in summaries
+            if (unit and s["unit"] == unit) or any(word in s["type"].lower() for word in type_words)
+        ]
+    return {
+        "medications": {(m.medication or "").lower(): m for m in record.medications},
+        "conditions": {(c.description or "").lower(): c for c in record.conditions},
+        "observations": summaries,
+        "vitals": vitals,
+    }
+
+
+def _mentioned(question: str, names: dict):
+    """Entries whose name (or its first word, e.g. 'lisinopril') appears in the question"""
+    found = []
+    for name, entry in names.items():
+        if not name:
+            continue
+        first_word = name.split()[0]
+        if name in question or (len(first_word) > 3 and re.search(rf"\b{re.escape(first_word)}\b", question)):
+            found.append(entry)
+    return found
+
+
+def _date(value) -> str:
+    return (value or "unknown date")[:10]
+
+
+def answer_counts(question: str, record):
+    sections = (
+        ("medication", record.medications, "medication(s)"),
+        ("condition", record.conditions, "condition(s)"),
+        ("care plan", record.careplans, "care plan(s)"),
+        ("careplan", record.careplans, "care plan(s)"),
+        ("observation", record.observations, "observation(s)"),
+    )
+    for word, entries, label in sections:
+        if word in question:
+            return f"{len(entries)} {label} on record."
+    return None
+
+
+def answer_dates(question: str, record, index: dict):
+    if "born" in question or "birth" in question:
+        return f"Date of birth: {record.birth_date}"
+    lines = [f"- {c.description}: onset {_date(c.onset)}" for c in _mentioned(question, index["conditions"])]
+    lines += [f"- {m.medication}: prescribed {_date(m.authored_on)}" for m in _mentioned(question, index["medications"])]
+    return "\n".join(lines) or None
+
+
+def answer_vitals(question: str, index: dict):
+    for route, (question_words, _, _) in VITALS.items():
+        if any(word in f" {question}" for word in question_words):
+            summaries = index["vitals"][route]
+            if not summaries:
+                return route, f"No {route} records found."
+            return route, "\n".join(observations.describe(s) for s in summaries)
+    return None
+
+
+def _names_type(question: str, type_name: str) -> bool:
+    """Whether the question refers to an observation type, by name, a distinctive word or a vitals alias"""
+    name = type_name.lower()
+    if name in question:
+        return True
+    for word in re.findall(r"[a-z0-9]+", name):
+        if len(word) >= 3 and word not in GENERIC_TYPE_WORDS and re.search(rf"\b{re.escape(word)}\b", question):
+            return True
+    return any(
+        any(word in f" {question}" for word in question_words) and any(word in name for word in type_words)
+        for question_words, type_words, _ in VITALS.values()
+    )
+
+
+def answer_ranges(question: str, index: dict):
+    """Reference-range verdicts for the measured types a "normal?" question names, else None"""
+    lines = []
+    for summary in index["observations"]:
+        if summary["flag"] is None or not _names_type(question, summary["type"]):
+            continue
+        verdict = "within" if summary["flag"] == "normal" else "outside"
+        lines.append(
+            f"{observations.describe(summary)} - {verdict} the reference range"
+            f" {summary['low']:g}-{summary['high']:g} {summary['unit']}"
+        )
+    return "\n".join(lines) or None
+
+
+def answer_labs(index: dict):
+    flagged = [s for s in index["observations"] if s["flag"] in ("low", "high")]
+    if not flagged:
+        return "All latest results with a reference range are within range."
+    return "\n".join(observations.describe(s) for s in flagged)
+
+
+def fast_answer(question: str, record):
+    """(route, answer) when the structured record answers the question directly, else None"""
+    question = question.lower().strip()
+    if OPEN_ENDED.search(question):
+        return None
+    medications = [m.medication for m in record.medications if m.medication]
+    if interactions.is_list_question(question, medications):
+        return "interactions", interactions.answer(medications)
+    # Interactions with another drug, food or alcohol need the agent
+    if interactions.INTERACTION_QUESTION.search(question):
+        return None
+    routed = record_answer(question, record)
+    # A "normal?" question that names no ranged measurement is about symptoms, not the record
+    if NORMAL.search(question) and (routed is None or routed[0] != "ranges"):
+        return None
+    return routed
+
+
+def record_answer(question: str, record):
+    """
+    (route, answer) for the record section a question is about, however it is
+    phrased, else None. fast_answer only uses it for plain lookups; the agent's
+    data tool also uses it for open-ended questions, to fetch the material the
+    LLM reasons over.
+    """
+    question = question.lower().strip()
+    index = record_index(record)
+
+    if COUNT.search(question):
+        answer = answer_counts(question, record)
+        if answer:
+            return "counts", answer
+    if WHEN.search(question) or "date of birth" in question or "born" in question:
+        answer = answer_dates(question, record, index)
+        if answer:
+            return "dates", answer
+    if NORMAL.search(question):
+        answer = answer_ranges(question, index)
+        if answer:
+            return "ranges", answer
+    vital = answer_vitals(question, index)
+    if vital:
+        return vital
+    if LABS.search(question):
+        return "labs", answer_labs(index)
+    if re.search(r"\bmedications?\b|\bmeds\b|\bprescri|\bdrugs?\b|\bpills?\b", question):
+        return "medications", "\n".join(f"- {m.medication}" for m in record.medications) or "No medications found."
+    if re.search(r"\bconditions?\b|\bdiagnos|\bproblems?\b|\bdiseases?\b", question):
+        lines = [f"- {c.description} (onset: {_date(c.onset)})" for c in record.conditions]
+        return "conditions", "\n".join(lines) or "No conditions found."
+    if re.search(r"\bcare ?plans?\b", question):
+        lines = [f"- {c.description} ({c.status})" for c in record.careplans]
+        return "careplans", "\n".join(lines) or "No care plans found."
+    return None
+
+
+def route(question: str, record, agent_fn):
+    """Fast path when possible, otherwise agent_fn(); latency is recorded either way"""
+    started = time.perf_counter()
+    routed = fast_answer(question, record)
+    if routed is not None:
+        ROUTER_STATS.record(routed[0], time.perf_counter() - started)
+        return routed[1]
+    answer = agent_fn()
+    ROUTER_STATS.record("agent", time.perf_counter() - started)
+    return answer
@@ -0,0 +1,256 @@
+import json
+import os
+import re
+import time
+from collections import defaultdict
+
+## Declarative FHIR extraction for parse_fhir_bundle.
+##
+## fhir_paths.json maps each resourceType to the section of the structured
+## document it fills and a field -> path spec ("code.coding[0].display", or a
+## list of paths tried in order). The spec is validated once, then every
+## resource type is compiled into one generated function that reads all of its
+## fields with plain subscripts inside try/except, so a missing key or an
+## empty `coding` list yields None for that field instead of failing the file.
+##
+## Extraction dispatches through a resourceType -> rule table: entries are
+## bucketed by type in one pass and each bucket runs through its compiled
+## extractor as a batch. Supporting Encounter, Immunization, Procedure or any
+## other resource type is a spec edit, not a code change. ExtractionStats keeps
+## per-type counts, seconds and errors for the end-of-run report.
+##
+## A rule's optional "components" path names a list inside the resource (e.g.
+## an Observation's `component`). Each element becomes an extra record,
+## extracted with the same fields from the element laid over its resource, so
+## a blood pressure panel yields systolic and diastolic readings that carry
+## the panel's effectiveDateTime.
+
+FHIR_PATHS = os.getenv("FHIR_PATHS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fhir_paths.json"))
+
+_STEP = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)((?:\[\d+\])*)$")
+_INDEX = re.compile(r"\[(\d+)\]")
+TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+}
+RULE_KEYS = {"section", "fields", "single", "required", "types", "components"}
+
+
+class SpecError(ValueError):
+    pass
+
+
+def parse_path(path: str) -> list:
+    """'code.coding[0].display' -> ['code', 'coding', 0, 'display']"""
+    steps = []
+    for part in path.split("."):
+        match = _STEP.match(part)
+        if not match:
+            raise SpecError(f"Invalid path segment {part!r} in {path!r}")
+        steps.append(match.group(1))
+        steps += [int(i) for i in _INDEX.findall(match.group(2))]
+    return steps
+
+
+def validate_spec(spec) -> list:
+    """Every problem in a paths spec; empty when it is usable"""
+    if not isinstance(spec, dict) or not spec:
+        return ["spec must be a non-empty object keyed by resourceType"]
+    problems = []
+    sections = defaultdict(list)
+    for r_type, rule in spec.items():
+        where = f"{r_type}:"
+        if not isinstance(rule, dict):
+            problems.append(f"{where} rule must be an object")
+            continue
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            problems.append(f"{where} unknown keys {sorted(unknown)}")
+        if not isinstance(rule.get("section"), str) or not rule.get("section"):
+            problems.append(f"{where} 'section' must be a non-empty string")
+        else:
+            sections[rule["section"]].append(r_type)
+        fields = rule.get("fields")
+        if not isinstance(fields, dict) or not fields:
+            problems.append(f"{where} 'fields' must be a non-empty object")
+            continue
+        for name, paths in fields.items():
+            paths = [paths] if isinstance(paths, str) else paths
+            if not isinstance(paths, list) or not paths or not all(isinstance(p, str) for p in paths):
+                problems.append(f"{where} field {name!r} must be a path or a non-empty list of paths")
+                continue
+            for path in paths:
+                try:
+                    parse_path(path)
+                except SpecError as e:
+                    problems.append(f"{where} {e}")
+        for name in rule.get("required", []):
+            if name not in fields:
+                problems.append(f"{where} required field {name!r} is not in 'fields'")
+        for name, type_name in rule.get("types", {}).items():
+            if name not in fields:
+                problems.append(f"{where} typed field {name!r} is not in 'fields'")
+            if type_name not in TYPE_CHECKS:
+                problems.append(f"{where} unknown type {type_name!r} (use one of {sorted(TYPE_CHECKS)})")
+        if not isinstance(rule.get("single", False), bool):
+            problems.append(f"{where} 'single' must be true or false")
+        if "components" in rule:
+            if not isinstance(rule["components"], str):
+                problems.append(f"{where} 'components' must be a path")
+            else:
+                try:
+                    parse_path(rule["components"])
+                except SpecError as e:
+                    problems.append(f"{where} {e}")
+    for section, types in sections.items():
+        if len(types) > 1:
+            problems.append(f"section {section!r} is filled by several resource types: {types}")
+    return problems
+
+
+def _field_source(name: str, paths: list) -> list:
+    """Source lines that read the first non-None of `paths` into out[name]"""
+    lines = []
+    for number, path in enumerate(paths):
+        indent = "    " if number == 0 else "        "
+        if number:
+            lines.append("    if v is None:")
+        subscripts = "".join(f"[{step!r}]" for step in parse_path(path))
+        lines += [
+            f"{indent}try:",
+            f"{indent}    v = r{subscripts}",
+            f"{indent}except (KeyError, IndexError, TypeError):",
+            f"{indent}    v = None",
+        ]
+    lines.append(f"    out[{name!r}] = v")
+    return lines
+
+
+def compile_extractor(r_type: str, fields: dict):
+    """One generated function per resource type: resource dict -> flat record"""
+    lines = ["def extract(r):", "    out = {}"]
+    for name, paths in fields.items():
+        lines += _field_source(name, [paths] if isinstance(paths, str) else paths)
+    lines.append("    return out")
+    namespace = {}
+    exec(compile("\n".join(lines), f"<fhir_paths:{r_type}>", "exec"), namespace)
+    return namespace["extract"]
+
+
+class Rule:
+    __slots__ = ("resource_type", "section", "single", "required", "types", "extract", "components")
+
+    def __init__(self, resource_type: str, rule: dict):
+        self.resource_type = resource_type
+        self.section = rule["section"]
+        self.single = rule.get("single", False)
+        self.required = tuple(rule.get("required", ()))
+        self.types = tuple((name, TYPE_CHECKS[type_name]) for name, type_name in rule.get("types", {}).items())
+        self.extract = compile_extractor(resource_type, rule["fields"])
+        self.components = parse_path(rule["components"]) if "components" in rule else None
+
+    def extract_all(self, resource: dict) -> list:
+        """The resource's record, then one per element of its components list"""
+        records = [self.extract(resource)]
+        if self.components is None:
+            return records
+        try:
+            components = resource
+            for step in self.components:
+                components = components[step]
+        except (KeyError, IndexError, TypeError):
+            return records
+        if isinstance(components, list):
+            records += [self.extract({**resource, **c}) for c in components if isinstance(c, dict)]
+        return records
+
+    def check(self, record: dict) -> int:
+        """Validation errors in an extracted record; mistyped values are cleared"""
+        errors = 0
+        for name, is_valid in self.types:
+            value = record[name]
+            if value is not None and not is_valid(value):
+                record[name] = None
+                errors += 1
+        return errors
+
+
+class ExtractionStats:
+
+    def __init__(self):
+        self.resources = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.unhandled = defaultdict(int)
+        self.malformed = 0
+
+    def report(self) -> str:
+        if not self.resources and not self.unhandled and not self.malformed:
+            return "No resources extracted."
+        lines = [f"{'resource type':<22} {'count':>9} {'per sec':>11} {'errors':>7}"]
+        for r_type in sorted(self.resources, key=lambda t: -self.resources[t]):
+            seconds = self.seconds[r_type]
+            rate = f"{self.resources[r_type] / seconds:,.0f}" if seconds > 0 else "-"
+            lines.append(f"{r_type:<22} {self.resources[r_type]:>9} {rate:>11} {self.errors[r_type]:>7}")
+        if self.unhandled:
+            skipped = ", ".join(f"{t} ({n})" for t, n in sorted(self.unhandled.items(), key=lambda item: -item[1]))
+            lines.append(f"not in spec, skipped: {skipped}")
+        if self.malformed:
+            lines.append(f"malformed entries skipped: {self.malformed}")
+        return "\n".join(lines)
+
+
+class Extractor:
+    """Bundle -> structured document, driven by the compiled dispatch table"""
+
+    def __init__(self, spec: dict):
+        problems = validate_spec(spec)
+        if problems:
+            raise SpecError("Invalid FHIR paths spec:\n  " + "\n  ".join(problems))
+        self.rules = {r_type: Rule(r_type, rule) for r_type, rule in spec.items()}
+        self.stats = ExtractionStats()
+
+    @classmethod
+    def from_file(cls, path: str = FHIR_PATHS):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def empty_document(self) -> dict:
+        return {rule.section: ({} if rule.single else []) for rule in self.rules.values()}
+
+    def extract_bundle(self, bundle: dict) -> dict:
+        buckets = defaultdict(list)
+        for entry in bundle.get("entry") or ():
+            resource = entry.get("resource") if isinstance(entry, dict) else None
+            if isinstance(resource, dict):
+                buckets[resource.get("resourceType")].append(resource)
+            else:
+                self.stats.malformed += 1
+
+        document = self.empty_document()
+        for r_type, resources in buckets.items():
+            rule = self.rules.get(r_type)
+            if rule is None:
+                self.stats.unhandled[r_type or "(no resourceType)"] += len(resources)
+                continue
+            started = time.perf_counter()
+            if rule.components is None:
+                records = [rule.extract(resource) for resource in resources]
+            else:
+                records = [record for resource in resources for record in rule.extract_all(resource)]
+            errors = sum(rule.check(record) for record in records) if rule.types else 0
+            if rule.required:
+                kept = [record for record in records if all(record[name] is not None for name in rule.required)]
+                errors += len(records) - len(kept)
+                records = kept
+            if rule.single:
+                document[rule.section] = records[-1] if records else {}
+            else:
+                document[rule.section] = records
+            self.stats.seconds[r_type] += time.perf_counter() - started
+            self.stats.resources[r_type] += len(resources)
+            self.stats.errors[r_type] += errors
+        return document
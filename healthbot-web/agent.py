@@ -0,0 +1,94 @@
+import re
+
+import clients
+import context_budget
+import interactions
+import outbound
+import vector_index
+
+## The two-step agentic assistant: a short reasoning pass over the patient
+## profile, then an evidence-backed answer built from a live search.
+
+def extract_links_from_tavily(search_results):
+    """Extract and format links from Tavily search results"""
+    links = []
+    try:
+        # Tavily returns results in different formats, handle both
+        if isinstance(search_results, str):
+            # If it's a string, look for URLs
+            urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', search_results)
+            for url in urls[:3]:  # Limit to 3 links
+                links.append(f"- {url}")
+        elif isinstance(search_results, list):
+            # If it's a list of result objects
+            for result in search_results[:3]:
+                if isinstance(result, dict) and 'url' in result:
+                    title = result.get('title', 'Medical Resource')
+                    url = result.get('url', '')
+                    links.append(f"- [{title}]({url})")
+        
+        return "\n".join(links) if links else "- Additional resources available through medical databases"
+    except:
+        return "- Additional resources available through medical databases"
+
+def listed(record, section: str) -> str:
+    """A section as prompt text, saying how many entries the record did not list"""
+    if not record[section]:
+        return "None documented"
+    omitted = record.omitted(section)
+    return ", ".join(record[section]) + (f" (+{omitted} more)" if omitted else "")
+
+def patient_context(record) -> dict:
+    """Prompt variables describing the patient"""
+    return {
+        "age": record['age'],
+        "gender": record['gender'],
+        "conditions": listed(record, 'conditions'),
+        "medications": listed(record, 'medications')
+    }
+
+def run_reasoning(record, query: str) -> str:
+    """Agent reasoning step"""
+    return outbound.call(
+        "openai",
+        clients.get_agent_reasoning_chain().run,
+        dict(patient_context(record), query=query),
+        priority=outbound.INTERACTIVE
+    )
+
+def answer_interactions(record, query: str):
+    """Direct answer to "do these medications interact?" from the offline list, no LLM call"""
+    if not interactions.is_list_question(query, record['medications']):
+        return None
+    return interactions.answer(record['medications'])
+
+def search_evidence(query: str):
+    """Search for evidence, from the local vector index when it has close matches"""
+    results = vector_index.retrieve(query, kind="snippet")
+    if results is None:
+        results = outbound.call("tavily", clients.get_tavily().run, query, priority=outbound.INTERACTIVE)
+        vector_index.remember(vector_index.snippet_entries(query, results))
+    return results
+
+def log_prompt_tokens(record, query: str, raw_results, inputs: dict):
+    """Print the fitted prompt size next to what the untrimmed prompt would have been"""
+    untrimmed = dict(patient_context(record), interactions=inputs["interactions"], query=query, search_results=raw_results)
+    fitted_tokens = context_budget.count_tokens(clients.AGENTIC_SEARCH_TEMPLATE.format(**inputs))
+    untrimmed_tokens = context_budget.count_tokens(clients.AGENTIC_SEARCH_TEMPLATE.format(**untrimmed))
+    print(f"🧮 Prompt tokens for \"{query[:60]}\": {fitted_tokens} (untrimmed {untrimmed_tokens}, budget {context_budget.AGENT_CONTEXT_TOKENS} for context)")
+
+def run_recommendation(record, query: str, raw_results) -> str:
+    """Generate comprehensive response with the extracted evidence links appended"""
+    inputs = context_budget.assemble_context(record, query, raw_results)
+    log_prompt_tokens(record, query, raw_results, inputs)
+    response = outbound.call(
+        "openai",
+        clients.get_agentic_search_chain().run,
+        inputs,
+        priority=outbound.INTERACTIVE
+    )
+    
+    formatted_links = extract_links_from_tavily(raw_results)
+    if formatted_links:
+        response += f"\n\n**Evidence Sources:**\n{formatted_links}"
+    return response
@@ -0,0 +1,172 @@
+import hashlib
+import itertools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from embeddings import embed
+
+## Semantic cache for agent answers.
+##
+## Clinicians ask the same handful of questions about similar patients. An
+## answer is reused when the patient's profile signature matches exactly
+## (gender, age, sorted conditions and medications) and the new
+## question's embedding is within ANSWER_CACHE_MIN_SIMILARITY of a cached one.
+##
+## A quality guard refuses near matches that differ in a word that changes the
+## meaning - a negation, a number, or a term from the patient's own conditions
+## or medications ("risks of lisinopril" vs "risks of metformin"). Guard
+## rejections and clinician "regenerate" clicks are counted so the threshold
+## can be tuned. Age is matched exactly, not by band, because answers name it
+## ("Clinical Analysis for 67-year-old female"). The cache is per process;
+## with the local hashing embedder it works fully offline.
+
+ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("ANSWER_CACHE_MIN_SIMILARITY", "0.9"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+MIN_ANSWER_CHARS = 40
+
+_WORD = re.compile(r"[a-z0-9]+")
+_NEGATIONS = {"no", "not", "without", "avoid", "stop", "stopping", "never", "except"}
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+def profile_signature(record) -> str:
+    """Canonical hash of the parts of the record an answer depends on"""
+    canonical = "|".join([
+        str(record['gender']).lower(),
+        str(record['age']),
+        ";".join(sorted({item.strip().lower() for item in record['conditions']})),
+        ";".join(sorted({item.strip().lower() for item in record['medications']})),
+    ])
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def profile_terms(record) -> set:
+    terms = set()
+    for item in list(record['conditions']) + list(record['medications']):
+        terms |= {word for word in _words(item) if len(word) > 3 and not word.isdigit()}
+    return terms
+
+
+def meaning_changed(cached_query: str, query: str, sensitive_terms: set) -> bool:
+    """True when the two questions differ in a negation, a number or a patient-specific term"""
+    difference = _words(cached_query) ^ _words(query)
+    return any(word in _NEGATIONS or word.isdigit() or word in sensitive_terms for word in difference)
+
+
+class _Entry:
+    __slots__ = ("id", "signature", "query", "vector", "answer", "created", "hits")
+
+    def __init__(self, entry_id, signature, query, vector, answer):
+        self.id = entry_id
+        self.signature = signature
+        self.query = query
+        self.vector = vector
+        self.answer = answer
+        self.created = time.time()
+        self.hits = 0
+
+
+class AnswerCache:
+
+    def __init__(
+        self,
+        min_similarity: float = ANSWER_CACHE_MIN_SIMILARITY,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ):
+        self.min_similarity = min_similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._by_signature = {}  # signature -> [id]
+        self._ids = itertools.count(1)
+        self.metrics = {
+            "hits": 0, "misses": 0, "stores": 0, "guard_rejections": 0,
+            "expired": 0, "evictions": 0, "regenerated": 0, "hit_similarity_sum": 0.0
+        }
+
+    def _drop(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            ids = self._by_signature[entry.signature]
+            ids.remove(entry_id)
+            if not ids:
+                del self._by_signature[entry.signature]
+
+    def lookup(self, record, query: str):
+        """(answer, similarity, entry_id) for a reusable prior answer, else None"""
+        signature = profile_signature(record)
+        vector = embed([query])[0]
+        now = time.time()
+        with self._lock:
+            best, best_similarity = None, -1.0
+            for entry_id in list(self._by_signature.get(signature, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl_seconds:
+                    self._drop(entry_id)
+                    self.metrics["expired"] += 1
+                    continue
+                similarity = float(entry.vector @ vector)
+                if similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+
+            if best is None or best_similarity < self.min_similarity:
+                self.metrics["misses"] += 1
+                return None
+            if meaning_changed(best.query, query, profile_terms(record)):
+                self.metrics["guard_rejections"] += 1
+                self.metrics["misses"] += 1
+                return None
+
+            best.hits += 1
+            self._entries.move_to_end(best.id)
+            self.metrics["hits"] += 1
+            self.metrics["hit_similarity_sum"] += best_similarity
+            return best.answer, best_similarity, best.id
+
+    def store(self, record, query: str, answer: dict):
+        """Cache an answer ({"reasoning", "recommendation"}) unless it looks degraded"""
+        if not all(len(str(answer.get(part, "")).strip()) >= MIN_ANSWER_CHARS for part in ("reasoning", "recommendation")):
+            return None
+        signature = profile_signature(record)
+        vector = embed([query])[0]
+        with self._lock:
+            entry = _Entry(next(self._ids), signature, query, vector, answer)
+            self._entries[entry.id] = entry
+            self._by_signature.setdefault(signature, []).append(entry.id)
+            self.metrics["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.metrics["evictions"] += 1
+            return entry.id
+
+    def regenerate(self, entry_id):
+        """A clinician rejected a cached answer: drop it and count it against the threshold"""
+        with self._lock:
+            if entry_id in self._entries:
+                self._drop(entry_id)
+                self.metrics["regenerated"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            hits = self.metrics["hits"]
+            return {
+                "entries": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "mean_hit_similarity": self.metrics["hit_similarity_sum"] / hits if hits else 0.0,
+                "regenerated_share": self.metrics["regenerated"] / hits if hits else 0.0,
+                **{k: v for k, v in self.metrics.items() if k != "hit_similarity_sum"}
+            }
+
+
+# Shared by every session in this process.
+ANSWERS = AnswerCache()
@@ -0,0 +1,262 @@
+import asyncio
+import hmac
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import agent
+import enrichment
+import interactions
+import outbound
+import reports
+import vector_index
+from answer_cache import ANSWERS
+from record_cache import EnrichmentCache
+from single_flight import FLIGHTS
+
+## HTTP/JSON API over the same record store, enrichment and agent logic the
+## Streamlit app uses, for callers that are not a browser session.
+##
+## A plain ASGI app (no framework); blocking Redshift, Tavily and OpenAI calls
+## run on a bounded thread pool so the event loop keeps serving other
+## requests. Identical in-flight lookups share one computation through the
+## process-wide single-flight layer (FLIGHTS), like the Streamlit app.
+##
+## Every /patients route requires "Authorization: Bearer $HEALTHBOT_API_TOKEN";
+## without a configured token they all answer 401. /health carries no
+## patient data and stays open for load balancer checks.
+##
+##   GET  /health
+##   GET  /patients/{id}              patient record
+##   GET  /patients/{id}/enrichment   NDJSON, one line per item as it completes
+##   POST /patients/{id}/agent        {"query": "..."} -> reasoning + recommendation
+##   POST /patients/{id}/report       PDF to S3 -> {"key": "..."}
+##
+## Usage: HEALTHBOT_API_TOKEN=... uvicorn api_service:app --port 8080
+##        HEALTHBOT_API_TOKEN=... HEALTHBOT_FAKE_DATA=1 HEALTHBOT_FAKE_CLIENTS=1 uvicorn api_service:app --port 8080
+
+REGION = os.getenv("AWS_REGION", "us-east-1")
+WORKGROUP_NAME = os.getenv("WORKGROUP_NAME", "healthbot-data")
+S3_BUCKET = os.getenv("S3_BUCKET", "healthbot-pdfs")
+RECORD_CACHE_MB = int(os.getenv("RECORD_CACHE_MB", "64"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "30"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "32"))
+SIDECAR_ADDRESS = os.getenv("HEALTHBOT_SIDECAR")
+FAKE_DATA = os.getenv("HEALTHBOT_FAKE_DATA") == "1"
+API_TOKEN = os.getenv("HEALTHBOT_API_TOKEN", "")
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+ENRICHMENT_CACHE_ITEMS = int(os.getenv("ENRICHMENT_CACHE_ITEMS", "5000"))
+
+EXECUTOR = ThreadPoolExecutor(max_workers=API_WORKER_THREADS, thread_name_prefix="api")
+
+
+def build_backends():
+    """(record store, enrichment cache) for the configured mode"""
+    if FAKE_DATA:
+        from fakes import FakeRecordStore
+        return FakeRecordStore(), EnrichmentCache(ENRICHMENT_CACHE_ITEMS)
+    if SIDECAR_ADDRESS:
+        import cache_sidecar
+        sidecar = cache_sidecar.connect(SIDECAR_ADDRESS)
+        return sidecar.records(), sidecar.enrichment_cache()
+
+    import db
+    from patient_records import PatientRecordStore
+    pool = db.ConnectionPool(lambda: db.connect(REGION, WORKGROUP_NAME), max_size=DB_POOL_SIZE)
+    store = PatientRecordStore(
+        pool.fetch_rows,
+        max_bytes=RECORD_CACHE_MB * 1024 * 1024,
+        poll_seconds=INGEST_POLL_SECONDS
+    )
+    return store, EnrichmentCache(ENRICHMENT_CACHE_ITEMS)
+
+
+async def run_blocking(key: tuple, fn, *args):
+    """Run blocking work on the pool; concurrent calls with the same key share one execution"""
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR, FLIGHTS.do, key, fn, *args)
+
+
+def authorized(scope) -> bool:
+    if not API_TOKEN:
+        return False
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), API_TOKEN.encode())
+    return False
+
+
+class ApiService:
+
+    def __init__(self):
+        self.records, self.enrichment_cache = build_backends()
+
+    def record_json(self, record) -> dict:
+        return {
+            "id": record.id,
+            "gender": record.gender,
+            "age": record.age,
+            "conditions": list(record.conditions),
+            "medications": list(record.medications),
+            "careplans": list(record.careplans),
+            "counts": {section: record.count(section) for section in ("conditions", "medications", "careplans")}
+        }
+
+    async def get_record(self, pid: str):
+        return await run_blocking(("record", pid), self.records.get, pid)
+
+    async def get_enrichment(self, record, item: str, section_type: str) -> dict:
+        # get_enrichment already single-flights cache misses
+        info = await asyncio.get_running_loop().run_in_executor(
+            EXECUTOR, enrichment.get_enrichment, self.enrichment_cache, item, section_type, record.age, record.gender
+        )
+        return {"section": section_type, "item": item, "summary": info["summary"], "links": info["links"]}
+
+    def run_agent(self, record, query: str) -> dict:
+        direct = agent.answer_interactions(record, query)
+        if direct is not None:
+            return {"reasoning": "Checked the medication list against the offline interaction list.",
+                    "recommendation": direct, "cached": False, "source": "interaction index"}
+
+        cached = ANSWERS.lookup(record, query)
+        if cached is not None:
+            answer, similarity, _ = cached
+            return dict(answer, cached=True, similarity=round(similarity, 3))
+
+        reasoning = agent.run_reasoning(record, query)
+        raw_results = agent.search_evidence(query)
+        answer = {
+            "reasoning": reasoning,
+            "recommendation": agent.run_recommendation(record, query, raw_results)
+        }
+        ANSWERS.store(record, query, answer)
+        return dict(answer, cached=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await handle_lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method = scope["method"]
+        parts = [part for part in scope["path"].split("/") if part]
+
+        if parts == ["health"]:
+            await send_json(send, 200, {
+                "status": "ok",
+                "single_flight": FLIGHTS.stats(),
+                "outbound": outbound.snapshot(),
+                "vector_index": vector_index.stats(),
+                "answer_cache": ANSWERS.stats(),
+                "interactions": interactions.stats()
+            })
+            return
+
+        if len(parts) < 2 or parts[0] != "patients":
+            await send_json(send, 404, {"error": "not found"})
+            return
+        if not authorized(scope):
+            await send_json(send, 401, {"error": "missing or invalid bearer token"})
+            return
+
+        pid = parts[1]
+        action = parts[2] if len(parts) > 2 else None
+        try:
+            record = await self.get_record(pid)
+        except Exception as e:
+            # Redshift failures, raised locally or as a RemoteError from the sidecar
+            await send_json(send, 502, {"error": f"record lookup failed: {e}"})
+            return
+        if record is None:
+            await send_json(send, 404, {"error": f"patient {pid} not found"})
+            return
+
+        if action is None and method == "GET":
+            await send_json(send, 200, self.record_json(record))
+        elif action == "enrichment" and method == "GET":
+            await self.stream_enrichment(send, record)
+        elif action == "agent" and method == "POST":
+            body = await read_json(receive)
+            query = (body.get("query") or "").strip()
+            if not query:
+                await send_json(send, 400, {"error": "query is required"})
+                return
+            result = await run_blocking(("agent", pid, query), self.run_agent, record, query)
+            await send_json(send, 200, result)
+        elif action == "report" and method == "POST":
+            try:
+                key = await asyncio.get_running_loop().run_in_executor(
+                    EXECUTOR, reports.upload_report, record, S3_BUCKET
+                )
+            except Exception as e:
+                await send_json(send, 502, {"error": f"failed to save report: {e}"})
+                return
+            await send_json(send, 200, {"key": key})
+        else:
+            await send_json(send, 405, {"error": "method not allowed"})
+
+    async def stream_enrichment(self, send, record):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")]
+        })
+        tasks = [
+            asyncio.ensure_future(self.get_enrichment(record, item, section_type))
+            for section_type in ("conditions", "medications", "careplans")
+            for item in record[section_type]
+        ]
+        for next_done in asyncio.as_completed(tasks):
+            line = json.dumps(await next_done) + "\n"
+            await send({"type": "http.response.body", "body": line.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            EXECUTOR.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def read_json(receive) -> dict:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+async def send_json(send, status: int, payload: dict):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+app = ApiService()
+
+
+if __name__ == "__main__":
+    import sys
+    import uvicorn
+
+    if not API_TOKEN:
+        print("❌ Set HEALTHBOT_API_TOKEN; the API serves patient records and refuses to run without one")
+        sys.exit(1)
+    uvicorn.run(app, host=API_HOST, port=int(os.getenv("API_PORT", "8080")))
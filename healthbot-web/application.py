@@ -1,19 +1,29 @@
+import html
 import os
-from datetime import datetime
+import time
+import functools
+from collections import deque
 import streamlit as st
-import pandas as pd
-import boto3
-import psycopg2
 from dotenv import load_dotenv
-from io import BytesIO
-from typing import Dict, List
-import json
-from langchain.chat_models import ChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_community.tools.tavily_search import TavilySearchResults
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.pagesizes import letter
+import agent
+import cards
+import clients
+import db
+import enrichment
+import interactions
+import observations
+import outbound
+import reports
+import vector_index
+from single_flight import FLIGHTS
+from answer_cache import ANSWERS
+from prefetch import PatientPrefetcher
+import cache_sidecar
+from patient_records import PatientRecordStore
+from record_cache import EnrichmentCache, PatientRecord
+
+# CPU time of this script run (full reruns only; fragments time themselves)
+_script_started = time.thread_time()
 
 # =============================
 # 🌱 ENVIRONMENT
@@ -26,6 +36,13 @@ TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 WORKGROUP_NAME = os.getenv("WORKGROUP_NAME", "healthbot-data")
 REGION = os.getenv("AWS_REGION", "us-east-1")
 S3_BUCKET = os.getenv("S3_BUCKET", "healthbot-pdfs")
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+RECORD_CACHE_MB = int(os.getenv("RECORD_CACHE_MB", "64"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "30"))
+RERUN_SAMPLES = 50
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+SIDECAR_ADDRESS = os.getenv("HEALTHBOT_SIDECAR")
+ENRICHMENT_CACHE_ITEMS = int(os.getenv("ENRICHMENT_CACHE_ITEMS", "5000"))
 
 st.set_page_config(
     page_title="HealthBot AI Pro",
@@ -395,340 +412,91 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-llm = ChatOpenAI(model="gpt-4", temperature=0.2, openai_api_key=OPENAI_API_KEY)
-tavily = TavilySearchResults(api_key=TAVILY_API_KEY, max_results=5)
+if os.getenv("HEALTHBOT_EAGER_CLIENTS") == "1":
+    clients.warm_up()
 
 # =============================
 # 🔍 ENHANCED TAVILY-POWERED MEDICAL INFORMATION GENERATION
 # =============================
 
-def get_medical_info_with_search(item_name: str, item_type: str, age: int, gender: str) -> dict:
-    """Get comprehensive medical information using Tavily search"""
-    
-    try:
-        # Create focused search queries
-        if item_type == "medication":
-            search_query = f"{item_name} medication uses side effects dosage information"
-        elif item_type == "condition":
-            search_query = f"{item_name} medical condition symptoms causes treatment"
-        else:  # careplan
-            search_query = f"{item_name} care plan treatment management"
-        
-        # Search for medical information
-        search_results = tavily.run(search_query)
-        
-        # Extract summary from search results
-        summary = extract_medical_summary(search_results, item_name, item_type, age, gender)
-        
-        # Extract relevant links
-        links = extract_medical_links(search_results, item_name, item_type)
-        
-        return {
-            "summary": summary,
-            "links": links
-        }
-        
-    except Exception as e:
-        # Fallback information
-        fallback_summary = generate_fallback_summary(item_name, item_type, age, gender)
-        fallback_links = generate_fallback_links(item_name, item_type)
-        
-        return {
-            "summary": fallback_summary,
-            "links": fallback_links
-        }
+@st.cache_resource
+def get_enrichment_cache() -> dict:
+    """Enrichment results shared by every session and the prefetcher (and every worker with a sidecar)"""
+    sidecar = get_sidecar()
+    return sidecar.enrichment_cache() if sidecar is not None else EnrichmentCache(ENRICHMENT_CACHE_ITEMS)
 
-def extract_medical_summary(search_results, item_name: str, item_type: str, age: int, gender: str) -> str:
-    """Extract and generate a medical summary from search results"""
-    
-    try:
-        # Combine search result content
-        content_pieces = []
-        
-        if isinstance(search_results, list):
-            for result in search_results[:3]:  # Use top 3 results
-                if isinstance(result, dict):
-                    if 'content' in result:
-                        content_pieces.append(result['content'])
-                    elif 'snippet' in result:
-                        content_pieces.append(result['snippet'])
-        
-        combined_content = " ".join(content_pieces)
-        
-        # Use LLM to generate patient-specific summary
-        summary_prompt = f"""
-        Based on the following medical information about "{item_name}", create a clear 2-3 sentence summary for a {age}-year-old {gender}.
-
-        Medical Information: {combined_content[:1500]}  # Limit content length
-
-        Focus on:
-        1. What {item_name} is and its primary purpose/effects
-        2. Key considerations for someone of this age and gender
-        3. Important things to know or monitor
-
-        Keep it professional but accessible. Avoid medical jargon where possible.
-        """
-        
-        summary = llm.predict(summary_prompt)
-        return summary.strip()
-        
-    except Exception:
-        return generate_fallback_summary(item_name, item_type, age, gender)
-
-def extract_medical_links(search_results, item_name: str, item_type: str) -> list:
-    """Extract authoritative medical links from search results"""
-    
-    # Preferred medical domains
-    preferred_domains = [
-        'mayoclinic.org',
-        'medlineplus.gov',
-        'webmd.com',
-        'drugs.com',
-        'healthline.com',
-        'clevelandclinic.org',
-        'nih.gov',
-        'fda.gov',
-        'cdc.gov'
-    ]
-    
-    links = []
-    
-    try:
-        if isinstance(search_results, list):
-            for result in search_results:
-                if isinstance(result, dict) and 'url' in result:
-                    url = result['url']
-                    title = result.get('title', 'Medical Information')
-                    
-                    # Check if it's from a preferred domain
-                    is_preferred = any(domain in url.lower() for domain in preferred_domains)
-                    
-                    if is_preferred:
-                        links.append({
-                            'title': title,
-                            'url': url,
-                            'domain': extract_domain(url)
-                        })
-        
-        # If we don't have enough preferred links, add others
-        if len(links) < 3 and isinstance(search_results, list):
-            for result in search_results:
-                if isinstance(result, dict) and 'url' in result and len(links) < 4:
-                    url = result['url']
-                    title = result.get('title', 'Medical Information')
-                    
-                    # Skip if already added
-                    if not any(link['url'] == url for link in links):
-                        links.append({
-                            'title': title,
-                            'url': url,
-                            'domain': extract_domain(url)
-                        })
-        
-        return links[:4]  # Limit to 4 links
-        
-    except Exception:
-        return generate_fallback_links(item_name, item_type)
-
-def extract_domain(url: str) -> str:
-    """Extract domain name from URL"""
-    try:
-        from urllib.parse import urlparse
-        return urlparse(url).netloc.replace('www.', '')
-    except:
-        return 'Medical Resource'
-
-def generate_fallback_summary(item_name: str, item_type: str, age: int, gender: str) -> str:
-    """Generate fallback summary when search fails"""
-    
-    if item_type == "medication":
-        return f"{item_name} is a medication prescribed for this {age}-year-old {gender}. It's important to take as directed by the healthcare provider and be aware of potential side effects. Regular monitoring may be required to ensure safe and effective treatment."
-    elif item_type == "condition":
-        return f"{item_name} is a medical condition affecting this {age}-year-old {gender}. Proper management typically involves regular monitoring, lifestyle considerations, and following the treatment plan. Age and gender may influence how this condition affects the patient."
-    else:  # careplan
-        return f"This care plan for {item_name} is designed specifically for this {age}-year-old {gender}. It outlines important steps for managing health and treatment goals. Following the care plan helps ensure the best possible health outcomes."
-
-def generate_fallback_links(item_name: str, item_type: str) -> list:
-    """Generate fallback links when search fails"""
-    
-    clean_name = item_name.lower().replace(" ", "+")
-    
-    links = [
-        {
-            'title': f'{item_name} - MedlinePlus',
-            'url': f'https://medlineplus.gov/search/?query={clean_name}',
-            'domain': 'medlineplus.gov'
-        },
-        {
-            'title': f'{item_name} - Mayo Clinic',
-            'url': f'https://www.mayoclinic.org/search/?q={clean_name}',
-            'domain': 'mayoclinic.org'
-        }
-    ]
-    
-    if item_type == "medication":
-        links.append({
-            'title': f'{item_name} - Drugs.com',
-            'url': f'https://www.drugs.com/search.php?searchterm={clean_name}',
-            'domain': 'drugs.com'
-        })
-    
-    return links
+def enrichment_key(item_name: str, section_type: str, age: int, gender: str) -> str:
+    return enrichment.enrichment_key(item_name, section_type, age, gender)
 
-# Enhanced AGENTIC AI prompts
-agentic_search_prompt = PromptTemplate.from_template("""
-You are an expert medical AI agent assisting healthcare providers. Think step by step.
-
-PATIENT CONTEXT:
-- Age: {age}, Gender: {gender}
-- Medical Conditions: {conditions}  
-- Current Medications: {medications}
-
-QUERY: "{query}"
-
-AVAILABLE INFORMATION: {search_results}
-
-AGENT REASONING:
-1. First, analyze the patient's profile for relevant risk factors
-2. Consider drug interactions and contraindications
-3. Evaluate evidence quality from search results
-4. Formulate patient-specific recommendations
-
-RESPONSE FORMAT:
-**Clinical Analysis for {age}-year-old {gender}:**
-
-[Your evidence-based analysis here]
-
-**Patient-Specific Considerations:**
-- [Consideration 1 based on their conditions]
-- [Consideration 2 based on their medications]
-- [Age/gender specific factors]
-
-**Recommended Actions:**
-- [Specific actionable recommendation 1]
-- [Specific actionable recommendation 2]
-
-**Additional Resources:**
-- [Include relevant URLs from search results]
-- [Medical guidelines or authoritative sources]
-
-Remember: Base recommendations on patient's specific profile and current evidence.
-""")
-
-agent_reasoning_prompt = PromptTemplate.from_template("""
-As a medical AI agent, I need to think through this step by step:
-
-Patient: {age}-year-old {gender}
-Query: "{query}"
-Conditions: {conditions}
-Medications: {medications}
-
-My reasoning process:
-1. What are the key medical considerations for this patient?
-2. How do their conditions and medications affect the answer?
-3. What evidence-based recommendations can I provide?
-4. What safety considerations should I highlight?
-
-Provide your reasoning in 2-3 sentences, then I'll search for evidence.
-""")
-
-# Create LLM chains
-agentic_search_chain = LLMChain(llm=llm, prompt=agentic_search_prompt)
-agent_reasoning_chain = LLMChain(llm=llm, prompt=agent_reasoning_prompt)
+def get_enrichment(item_name: str, section_type: str, age: int, gender: str) -> dict:
+    """Return cached medical information for an item, searching on a miss"""
+    return enrichment.get_enrichment(get_enrichment_cache(), item_name, section_type, age, gender)
 
 # =============================
 # 🗄️ DATABASE FUNCTIONS
 # =============================
 
-def get_connection():
+@st.cache_resource
+def get_pool() -> db.ConnectionPool:
+    return db.ConnectionPool(lambda: db.connect(REGION, WORKGROUP_NAME), max_size=DB_POOL_SIZE)
+
+def fetch_rows(query: str, params=None) -> list:
+    """Run a query on a pooled connection and return named-tuple rows (empty on failure)"""
     try:
-        creds = boto3.client("redshift-serverless", region_name=REGION).get_credentials(
-            workgroupName=WORKGROUP_NAME, durationSeconds=900
-        )
-        return psycopg2.connect(
-            host='healthbot-data.692859942702.us-east-1.redshift-serverless.amazonaws.com',
-            port=5439, database='healthbot',
-            user=creds["dbUser"], password=creds["dbPassword"], sslmode='require'
-        )
+        return get_pool().fetch_rows(query, params)
     except Exception as e:
-        st.error(f"Database connection failed: {str(e)}")
-        return None
+        st.error(f"Query failed: {str(e)}")
+        return []
+
+@st.cache_resource
+def get_sidecar():
+    """Connection to the multi-worker cache sidecar (None in single-process mode)"""
+    return cache_sidecar.connect(SIDECAR_ADDRESS) if SIDECAR_ADDRESS else None
+
+@st.cache_resource
+def get_record_store():
+    sidecar = get_sidecar()
+    if sidecar is not None:
+        return sidecar.records()
+    # Raises on query failure rather than calling st.error, so the prefetch threads can use it too
+    return PatientRecordStore(
+        get_pool().fetch_rows,
+        max_bytes=RECORD_CACHE_MB * 1024 * 1024,
+        poll_seconds=INGEST_POLL_SECONDS
+    )
 
-def fetch_df(query: str, params=None):
-    conn = get_connection()
-    if conn is None:
-        return pd.DataFrame()
+def get_patient_record(pid: str) -> PatientRecord:
+    """Serve from the shared record cache, loading from patient_summary on a miss"""
     try:
-        with conn:
-            return pd.read_sql(query, conn, params=params)
+        return get_record_store().get(pid)
     except Exception as e:
+        # Includes RemoteError from the sidecar when its Redshift query fails
         st.error(f"Query failed: {str(e)}")
-        return pd.DataFrame()
-
-@st.cache_data(ttl=300)
-def get_patient_record(pid: str) -> Dict:
-    df = fetch_df("SELECT id, gender, birthdate FROM patients WHERE id=%s", (pid,))
-    if df.empty: 
         return None
-    
-    age = int((datetime.today().date() - df.at[0, 'birthdate']).days / 365.25)
-    return {
-        "id": df.at[0, 'id'], 
-        "gender": df.at[0, 'gender'], 
-        "age": age,
-        "conditions": fetch_df("SELECT description FROM conditions WHERE patient_id=%s", (pid,)),
-        "medications": fetch_df("SELECT medication AS description FROM medications WHERE patient_id=%s", (pid,)),
-        "careplans": fetch_df("SELECT description FROM careplans WHERE patient_id=%s", (pid,))
-    }
+
+@st.cache_data(ttl=INGEST_POLL_SECONDS, show_spinner=False)
+def get_observation_summaries(pid: str) -> list:
+    """Per-type vitals/lab summaries (latest, trend, rolling mean, range flags)"""
+    return observations.summarize_rows(fetch_rows(observations.OBSERVATIONS_QUERY, (pid,)))
+
+@st.cache_resource
+def get_prefetcher() -> PatientPrefetcher:
+    # Resolve the shared store and cache here, in the script thread: the pool
+    # threads must not touch st.* caches or elements outside a script run
+    return PatientPrefetcher(
+        get_record_store().get,
+        functools.partial(enrichment.enrich_record, get_enrichment_cache()),
+        max_workers=PREFETCH_WORKERS
+    )
 
 # =============================
 # 📄 ENHANCED PDF GENERATION
 # =============================
 
-def save_enhanced_pdf(record: Dict):
+def save_enhanced_pdf(record: PatientRecord):
     """Generate professional medical summary PDF"""
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=letter)
-    
-    story = [
-        Paragraph(f"<b>HealthBot AI Pro - Medical Summary Report</b>"),
-        Paragraph(f"<br/>Patient ID: {record['id']}"),
-        Paragraph(f"Demographics: {record['age']}-year-old {record['gender']}"),
-        Paragraph(f"<br/><b>Medical Conditions ({len(record['conditions'])}):</b>"),
-    ]
-    
-    # Add conditions
-    for condition in record['conditions']['description'].tolist():
-        story.append(Paragraph(f"• {condition}"))
-    
-    story.extend([
-        Paragraph(f"<br/><b>Current Medications ({len(record['medications'])}):</b>"),
-    ])
-    
-    # Add medications
-    for medication in record['medications']['description'].tolist():
-        story.append(Paragraph(f"• {medication}"))
-    
-    story.extend([
-        Paragraph(f"<br/><b>Active Care Plans ({len(record['careplans'])}):</b>"),
-    ])
-    
-    # Add care plans
-    for careplan in record['careplans']['description'].tolist():
-        story.append(Paragraph(f"• {careplan}"))
-    
-    story.extend([
-        Paragraph(f"<br/>Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"),
-        Paragraph(f"<br/><i>This report is for healthcare professional use only.</i>")
-    ])
-    
-    doc.build(story)
-    buf.seek(0)
-    
     try:
-        s3 = boto3.client("s3")
-        key = f"medical_reports/{record['id']}_{datetime.now().isoformat()}.pdf"
-        s3.upload_fileobj(buf, S3_BUCKET, key)
+        key = reports.upload_report(record, S3_BUCKET)
         st.success(f"✅ Medical report saved to secure storage: {key}")
     except Exception as e:
         st.error(f"Failed to save report: {str(e)}")
@@ -737,6 +505,24 @@ def save_enhanced_pdf(record: Dict):
 # 🖥️ UI COMPONENTS
 # =============================
 
+def record_rerun_cpu(scope: str, started: float):
+    """Keep the last RERUN_SAMPLES CPU timings (ms) per rerun scope in the session"""
+    samples = st.session_state.setdefault("rerun_cpu_ms", {})
+    samples.setdefault(scope, deque(maxlen=RERUN_SAMPLES)).append((time.thread_time() - started) * 1000)
+
+def timed_fragment(scope: str):
+    """st.fragment that also records the CPU time of each of its runs"""
+    def decorate(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            started = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_rerun_cpu(scope, started)
+        return st.fragment(run)
+    return decorate
+
 def render_medical_header():
     """Professional medical header"""
     st.markdown("""
@@ -746,7 +532,7 @@ def render_medical_header():
     </div>
     """, unsafe_allow_html=True)
 
-def render_patient_overview(record: Dict):
+def render_patient_overview(record: PatientRecord):
     """Professional patient overview with metrics"""
     st.markdown("""
     <div class="medical-card">
@@ -778,7 +564,7 @@ def render_patient_overview(record: Dict):
     with col3:
         st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">{len(record['conditions'])}</div>
+            <div class="metric-value">{record.count('conditions')}</div>
             <div class="metric-label">Conditions</div>
         </div>
         """, unsafe_allow_html=True)
@@ -786,7 +572,7 @@ def render_patient_overview(record: Dict):
     with col4:
         st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">{len(record['medications'])}</div>
+            <div class="metric-value">{record.count('medications')}</div>
             <div class="metric-label">Medications</div>
         </div>
         """, unsafe_allow_html=True)
@@ -794,14 +580,15 @@ def render_patient_overview(record: Dict):
     with col5:
         st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">{len(record['careplans'])}</div>
+            <div class="metric-value">{record.count('careplans')}</div>
             <div class="metric-label">Care Plans</div>
         </div>
         """, unsafe_allow_html=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-def render_medical_section_enhanced(record: Dict, df: pd.DataFrame, section_type: str, icon: str):
+@timed_fragment("section tab")
+def render_medical_section_enhanced(record: PatientRecord, items: tuple, section_type: str, icon: str):
     """Render medical section with Tavily-powered summaries and links"""
     
     section_map = {
@@ -814,94 +601,89 @@ def render_medical_section_enhanced(record: Dict, df: pd.DataFrame, section_type
     
     st.markdown(f"""
     <div class="medical-card">
-        <div class="card-title">{icon} {title} ({len(df)})</div>
+        <div class="card-title">{icon} {title} ({record.count(section_type)})</div>
     </div>
     """, unsafe_allow_html=True)
     
-    if df.empty:
-        st.markdown(f"""
-        <div class="{card_class}">
-            <div class="item-name">No {section_type} recorded</div>
-            <div class="item-description">No {section_type} found in patient medical record.</div>
-        </div>
-        """, unsafe_allow_html=True)
+    if not items:
+        st.markdown(cards.render_empty_section(card_class, section_type), unsafe_allow_html=True)
         return
     
-    for item in df['description'].tolist():
-        # Create cache key for medical information
-        cache_key = f"{section_type}_{item}_{record['age']}_{record['gender']}_enhanced"
-        
-        if cache_key not in st.session_state:
+    entries = []
+    for item in items:
+        if enrichment_key(item, section_type, record['age'], record['gender']) not in get_enrichment_cache():
             with st.spinner(f"🔍 Searching medical databases for {item}..."):
-                try:
-                    # Get comprehensive medical information using Tavily
-                    medical_info = get_medical_info_with_search(
-                        item, 
-                        section_type[:-1],  # Remove 's' from section_type
-                        record['age'],
-                        record['gender']
-                    )
-                    
-                    st.session_state[cache_key] = medical_info
-                    
-                except Exception as e:
-                    # Fallback
-                    st.session_state[cache_key] = {
-                        "summary": generate_fallback_summary(item, section_type[:-1], record['age'], record['gender']),
-                        "links": generate_fallback_links(item, section_type[:-1])
-                    }
-        
-        cached_data = st.session_state[cache_key]
-        summary = cached_data["summary"]
-        links = cached_data["links"]
+                get_enrichment(item, section_type, record['age'], record['gender'])
         
-        # Determine status
-        status_class = "status-active" if section_type in ["medications", "careplans"] else "status-monitored"
-        status_text = "Active" if section_type in ["medications", "careplans"] else "Monitored"
-        
-        # Create links HTML
-        links_html = ""
-        if links:
-            for link in links:
-                links_html += f'<a href="{link["url"]}" target="_blank" class="medical-link">🔗 {link["domain"]}</a>'
-        
-        st.markdown(f"""
-        <div class="{card_class}">
-            <div style="display: flex; justify-content: space-between; align-items: flex-start; margin-bottom: 0.75rem;">
-                <div class="item-name">{item}</div>
-                <span class="{status_class}">{status_text}</span>
-            </div>
-            <div class="item-description">{summary}</div>
-            <div class="links-container">
-                {links_html}
-            </div>
+        entries.append((item, get_enrichment(item, section_type, record['age'], record['gender'])))
+    
+    # Determine status
+    status_class = "status-active" if section_type in ["medications", "careplans"] else "status-monitored"
+    status_text = "Active" if section_type in ["medications", "careplans"] else "Monitored"
+    
+    # One escaped HTML payload for the whole section
+    st.markdown(
+        cards.render_section_cards(entries, card_class, status_class, status_text),
+        unsafe_allow_html=True
+    )
+    if record.omitted(section_type):
+        st.caption(f"+{record.omitted(section_type)} more not shown")
+
+def render_agent_reasoning(reasoning: str):
+    """Agent reasoning callout"""
+    st.markdown(f"""
+    <div class="agent-thinking">
+        <strong>🤔 Agent Reasoning:</strong><br>
+        {cards.answer_html(reasoning)}
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_agent_recommendation(record: PatientRecord, response: str):
+    """Final recommendation card with the patient context footer"""
+    st.markdown(f"""
+    <div class="search-results">
+        <h5>🎯 AI Agent Clinical Recommendation</h5>
+        <div style="line-height: 1.6;">{cards.answer_html(response)}</div>
+        <div style="margin-top: 1rem; padding: 1rem; background: rgba(255, 255, 255, 0.8); border-radius: 6px; font-size: 0.875rem;">
+            <strong>🤖 Agent Analysis Context:</strong> {record['age']}-year-old {html.escape(str(record['gender']))} • {record.count('conditions')} condition(s) • {record.count('medications')} medication(s)
+            <br><strong>🧠 AI Confidence:</strong> High (evidence-based recommendations)
         </div>
-        """, unsafe_allow_html=True)
+    </div>
+    """, unsafe_allow_html=True)
 
-def extract_links_from_tavily(search_results):
-    """Extract and format links from Tavily search results"""
-    links = []
-    try:
-        # Tavily returns results in different formats, handle both
-        if isinstance(search_results, str):
-            # If it's a string, look for URLs
-            import re
-            urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', search_results)
-            for url in urls[:3]:  # Limit to 3 links
-                links.append(f"- {url}")
-        elif isinstance(search_results, list):
-            # If it's a list of result objects
-            for result in search_results[:3]:
-                if isinstance(result, dict) and 'url' in result:
-                    title = result.get('title', 'Medical Resource')
-                    url = result.get('url', '')
-                    links.append(f"- [{title}]({url})")
-        
-        return "\n".join(links) if links else "- Additional resources available through medical databases"
-    except:
-        return "- Additional resources available through medical databases"
+def render_interaction_alerts(record: PatientRecord):
+    """Interacting medication pairs from the offline list, above the medication cards"""
+    for interaction in interactions.interactions_for(record['medications']):
+        alert = st.error if interaction.severity in ("contraindicated", "major") else st.warning
+        alert(f"⚠️ {interactions.describe(interaction)}")
+
+@timed_fragment("vitals tab")
+def render_observations_section(record: PatientRecord):
+    """Vitals and labs: latest value, trend and reference-range flags per observation type"""
+    summaries = get_observation_summaries(record['id'])
+    if not summaries:
+        st.info("No vitals or lab results on record for this patient.")
+        return
+    
+    flagged = [s for s in summaries if s['flag'] in ("low", "high")]
+    if flagged:
+        st.warning("⚠️ Latest value out of range: " + ", ".join(f"{s['type']} ({s['flag']})" for s in flagged))
+    
+    st.table([
+        {
+            "Observation": s['type'],
+            "Latest": f"{s['latest']:.4g} {s['unit']}",
+            "Date": s['latest_at'],
+            f"Avg (last {observations.ROLLING_WINDOW})": f"{s['rolling_mean']:.4g}",
+            "Trend / yr": f"{s['slope_per_year']:+.2g}",
+            "Range": f"{s['low']:g}–{s['high']:g}" if s['low'] is not None else "",
+            "Out of range": f"{s['out_of_range']}/{s['count']}",
+        }
+        for s in summaries
+    ])
 
-def render_agentic_search(record: Dict):
+@timed_fragment("agent panel")
+def render_agentic_search(record: PatientRecord):
     """Enhanced AGENTIC search interface with reasoning"""
     st.markdown("""
     <div class="search-container">
@@ -918,87 +700,157 @@ def render_agentic_search(record: Dict):
         key="agentic_query"
     )
     
-    if st.button("🧠 Activate Medical AI Agent", type="primary"):
+    activate = st.button("🧠 Activate Medical AI Agent", type="primary")
+    regenerate = st.session_state.pop('regenerate_agent_answer', False)
+    
+    if activate or regenerate:
         if query:
-            # Step 1: Agent Reasoning
-            st.markdown("""
-            <div class="agent-thinking">
-                🧠 <strong>AI Agent is analyzing...</strong>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            with st.spinner("AI Agent reasoning through the query..."):
-                conditions_text = ", ".join(record['conditions']['description'].tolist()) if not record['conditions'].empty else "None documented"
-                medications_text = ", ".join(record['medications']['description'].tolist()) if not record['medications'].empty else "None documented"
-                
-                # Agent reasoning step
-                reasoning = agent_reasoning_chain.run({
-                    "query": query,
-                    "age": record['age'],
-                    "gender": record['gender'],
-                    "conditions": conditions_text,
-                    "medications": medications_text
-                })
-                
-                st.markdown(f"""
+            st.session_state.pop('cached_agent_answer', None)
+            direct = None if regenerate else agent.answer_interactions(record, query)
+            cached = None if regenerate or direct is not None else ANSWERS.lookup(record, query)
+            if direct is not None:
+                st.caption("⚡ Answered from the offline drug interaction list - no AI call needed")
+                render_agent_recommendation(record, direct)
+            elif cached is not None:
+                st.session_state['cached_agent_answer'] = (query, record['id']) + cached
+            else:
+                # Step 1: Agent Reasoning
+                st.markdown("""
                 <div class="agent-thinking">
-                    <strong>🤔 Agent Reasoning:</strong><br>
-                    {reasoning}
+                    🧠 <strong>AI Agent is analyzing...</strong>
                 </div>
                 """, unsafe_allow_html=True)
-            
-            # Step 2: Evidence Gathering
-            with st.spinner("AI Agent gathering evidence from medical databases..."):
-                progress_bar = st.progress(0)
-                progress_bar.progress(25)
-                
-                # Search for evidence
-                raw_results = tavily.run(query)
-                progress_bar.progress(50)
                 
-                # Extract links
-                formatted_links = extract_links_from_tavily(raw_results)
-                progress_bar.progress(75)
+                with st.spinner("AI Agent reasoning through the query..."):
+                    reasoning = agent.run_reasoning(record, query)
+                    render_agent_reasoning(reasoning)
                 
-                # Generate comprehensive response
-                response = agentic_search_chain.run({
-                    "query": query,
-                    "age": record['age'],
-                    "gender": record['gender'],
-                    "conditions": conditions_text,
-                    "medications": medications_text,
-                    "search_results": raw_results
-                })
-                
-                # Add extracted links to response
-                if formatted_links:
-                    response += f"\n\n**Evidence Sources:**\n{formatted_links}"
-                
-                progress_bar.progress(100)
-                
-                st.markdown(f"""
-                <div class="search-results">
-                    <h5>🎯 AI Agent Clinical Recommendation</h5>
-                    <div style="line-height: 1.6;">{response}</div>
-                    <div style="margin-top: 1rem; padding: 1rem; background: rgba(255, 255, 255, 0.8); border-radius: 6px; font-size: 0.875rem;">
-                        <strong>🤖 Agent Analysis Context:</strong> {record['age']}-year-old {record['gender']} • {len(record['conditions'])} condition(s) • {len(record['medications'])} medication(s)
-                        <br><strong>🧠 AI Confidence:</strong> High (evidence-based recommendations)
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                # Step 2: Evidence Gathering
+                with st.spinner("AI Agent gathering evidence from medical databases..."):
+                    progress_bar = st.progress(0)
+                    progress_bar.progress(25)
+                    
+                    # Search for evidence
+                    raw_results = agent.search_evidence(query)
+                    progress_bar.progress(50)
+                    if raw_results and isinstance(raw_results, list) and raw_results[0].get("source") == "local index":
+                        st.caption(f"📚 Evidence served from the local index ({len(raw_results)} stored passages)")
+                    
+                    # Generate comprehensive response
+                    response = agent.run_recommendation(record, query, raw_results)
+                    
+                    progress_bar.progress(100)
+                    render_agent_recommendation(record, response)
+                    progress_bar.empty()
                 
-                progress_bar.empty()
+                ANSWERS.store(record, query, {"reasoning": reasoning, "recommendation": response})
         else:
             st.warning("Please enter a query for the AI agent to analyze.")
+    
+    # Reused answers stay on screen so the clinician can reject them
+    cached_answer = st.session_state.get('cached_agent_answer')
+    if cached_answer is not None and cached_answer[:2] == (query, record['id']):
+        _, _, answer, similarity, entry_id = cached_answer
+        st.caption(f"⚡ Reused the answer to a near-identical question for a patient with the same profile (similarity {similarity:.2f})")
+        render_agent_reasoning(answer['reasoning'])
+        render_agent_recommendation(record, answer['recommendation'])
+        if st.button("🔄 Not helpful - regenerate"):
+            ANSWERS.regenerate(entry_id)
+            st.session_state['regenerate_agent_answer'] = True
+            st.rerun(scope="fragment")
+
+@timed_fragment("pdf action")
+def render_pdf_action(record: PatientRecord):
+    if st.button("📄 Generate Medical Summary PDF", use_container_width=True):
+        save_enhanced_pdf(record)
+
+@timed_fragment("prefetch panel")
+def render_prefetch_panel():
+    """Sidebar for warming records of upcoming patients (e.g. today's clinic schedule)"""
+    prefetcher = get_prefetcher()
+    
+    st.markdown('<div class="card-title">📅 Upcoming Patients</div>', unsafe_allow_html=True)
+    schedule = st.text_area(
+        "Upcoming patient IDs",
+        placeholder="One patient ID per line...",
+        label_visibility="collapsed"
+    )
+    
+    if st.button("⚡ Warm Up Records", use_container_width=True):
+        submitted = prefetcher.prefetch(schedule.replace(",", "\n").splitlines())
+        st.success(f"✅ Prefetching {len(submitted)} patient record(s) in the background")
+    
+    stats = prefetcher.stats()
+    st.caption(f"Ready: {stats['loaded']} • In progress: {stats['in_flight']} • Not found: {stats['missing']}")
 
-# =============================
-# 🚀 MAIN APPLICATION
-# =============================
+def render_rerun_metrics():
+    """Average CPU per rerun scope: 'full app' is what every interaction cost before fragments"""
+    samples = st.session_state.get("rerun_cpu_ms", {})
+    if not samples:
+        return
+    
+    st.markdown('<div class="card-title">⏱️ Rerun CPU Time</div>', unsafe_allow_html=True)
+    for scope, timings in samples.items():
+        st.caption(f"{scope}: {sum(timings) / len(timings):.1f} ms avg over {len(timings)} run(s)")
 
-def main():
-    render_medical_header()
+def render_single_flight_metrics():
+    """Duplicate Tavily/LLM/Redshift work avoided by coalescing concurrent sessions"""
+    stats = FLIGHTS.stats()
+    if not stats:
+        return
+    
+    st.markdown('<div class="card-title">🧬 Coalesced Calls</div>', unsafe_allow_html=True)
+    for kind, counts in sorted(stats.items()):
+        st.caption(f"{kind}: {counts['suppressed']} duplicate(s) suppressed • {counts['executed']} executed")
+
+def render_outbound_metrics():
+    """Rate limiter queue depth and retries per external provider"""
+    st.markdown('<div class="card-title">🚦 Outbound Calls</div>', unsafe_allow_html=True)
+    for provider, stats in outbound.snapshot().items():
+        st.caption(
+            f"{provider}: {stats['calls']} call(s) • {stats['queue_depth']} queued • "
+            f"{stats['retries']} retried • {stats['rate_limited']} rate-limited • {stats['failures']} failed"
+        )
+
+def render_answer_cache_metrics():
+    """Agent answers reused for near-identical questions about same-profile patients"""
+    stats = ANSWERS.stats()
+    if not stats['hits'] and not stats['misses']:
+        return
+    
+    st.markdown('<div class="card-title">⚡ Answer Cache</div>', unsafe_allow_html=True)
+    st.caption(
+        f"{stats['hit_rate']:.0%} reused • mean similarity {stats['mean_hit_similarity']:.2f} • "
+        f"{stats['guard_rejections']} guard rejection(s) • {stats['regenerated']} regenerated"
+    )
+
+def render_vector_index_metrics():
+    """Local retrieval hit rate (Tavily calls avoided)"""
+    stats = vector_index.stats()
+    if not stats:
+        return
+    
+    st.markdown('<div class="card-title">📚 Local Evidence Index</div>', unsafe_allow_html=True)
+    st.caption(
+        f"{stats['rows']} passages • {stats['hits']} hit(s) / {stats['misses']} miss(es) • "
+        f"{stats['hit_rate']:.0%} served locally"
+    )
+
+def render_interaction_metrics():
+    """Medication lists checked against the offline interaction list"""
+    stats = interactions.stats()
+    if not stats['hits'] and not stats['misses']:
+        return
     
-    # Patient lookup interface
+    st.markdown('<div class="card-title">💊 Interaction Checks</div>', unsafe_allow_html=True)
+    st.caption(
+        f"{stats['pairs']} known pairs • {stats['signatures']} medication list(s) cached • "
+        f"{stats['hit_rate']:.0%} served from cache"
+    )
+
+@timed_fragment("lookup panel")
+def render_lookup_panel():
+    """Patient lookup; only a successful load triggers a full app rerun"""
     st.markdown('<div class="medical-card">', unsafe_allow_html=True)
     st.markdown('<div class="card-title">🔍 Patient Medical Record Lookup</div>', unsafe_allow_html=True)
     
@@ -1027,12 +879,33 @@ def main():
             if record:
                 progress.progress(100)
                 st.session_state['record'] = record
-                st.success("✅ Patient medical record loaded successfully")
+                st.session_state['record_loaded'] = True
                 progress.empty()
+                st.rerun()
             else:
                 progress.empty()
                 st.error("❌ Patient not found in medical database")
-                return
+
+# =============================
+# 🚀 MAIN APPLICATION
+# =============================
+
+def main():
+    render_medical_header()
+    
+    with st.sidebar:
+        render_prefetch_panel()
+        render_rerun_metrics()
+        render_single_flight_metrics()
+        render_outbound_metrics()
+        render_vector_index_metrics()
+        render_answer_cache_metrics()
+        render_interaction_metrics()
+    
+    render_lookup_panel()
+    
+    if st.session_state.pop('record_loaded', False):
+        st.success("✅ Patient medical record loaded successfully")
     
     # Main patient interface
     if 'record' in st.session_state:
@@ -1046,20 +919,23 @@ def main():
         
         with col1:
             # Medical information tabs
-            tab1, tab2, tab3 = st.tabs(["🩺 Medical Conditions", "💊 Current Medications", "📋 Care Plans"])
+            tab1, tab2, tab3, tab4 = st.tabs(["🩺 Medical Conditions", "💊 Current Medications", "📋 Care Plans", "🫀 Vitals & Labs"])
             
             with tab1:
                 render_medical_section_enhanced(record, record['conditions'], "conditions", "🩺")
             
             with tab2:
+                render_interaction_alerts(record)
                 render_medical_section_enhanced(record, record['medications'], "medications", "💊")
             
             with tab3:
                 render_medical_section_enhanced(record, record['careplans'], "careplans", "📋")
             
+            with tab4:
+                render_observations_section(record)
+            
             # PDF generation
-            if st.button("📄 Generate Medical Summary PDF", use_container_width=True):
-                save_enhanced_pdf(record)
+            render_pdf_action(record)
         
         with col2:
             # Agentic AI search interface
@@ -1097,3 +973,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    record_rerun_cpu("full app", _script_started)
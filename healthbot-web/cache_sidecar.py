@@ -0,0 +1,89 @@
+import os
+import sys
+from multiprocessing.managers import BaseManager, DictProxy
+
+import db
+from patient_records import PatientRecordStore
+from record_cache import EnrichmentCache
+
+## Local sidecar shared by every Streamlit worker in multi-worker mode.
+##
+## One process owns the Redshift connection pool, the patient record cache
+## and the enrichment cache; workers reach it over a localhost socket through
+## multiprocessing managers. Without HEALTHBOT_SIDECAR set the app keeps its
+## in-process caches and never talks to this module's server.
+##
+## The manager protocol is pickle-based, so the socket is only as safe as its
+## authkey: serve.py generates a random key per launch and hands it to the
+## sidecar and the workers in HEALTHBOT_SIDECAR_KEY (hex). Without that key
+## neither side starts.
+##
+## Usage: python cache_sidecar.py   (serve.py starts it automatically)
+
+REGION = os.getenv("AWS_REGION", "us-east-1")
+WORKGROUP_NAME = os.getenv("WORKGROUP_NAME", "healthbot-data")
+RECORD_CACHE_MB = int(os.getenv("RECORD_CACHE_MB", "64"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "30"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+ENRICHMENT_CACHE_ITEMS = int(os.getenv("ENRICHMENT_CACHE_ITEMS", "5000"))
+SIDECAR_KEY_ENV = "HEALTHBOT_SIDECAR_KEY"
+
+
+class SidecarManager(BaseManager):
+    pass
+
+
+class SidecarClient(BaseManager):
+    pass
+
+
+def read_authkey() -> bytes:
+    """The per-launch key from the environment; refuses to fall back to a default"""
+    key = os.getenv(SIDECAR_KEY_ENV, "")
+    try:
+        authkey = bytes.fromhex(key)
+    except ValueError:
+        authkey = b""
+    if len(authkey) < 16:
+        raise RuntimeError(f"{SIDECAR_KEY_ENV} is missing or too short; start the sidecar and workers with serve.py")
+    return authkey
+
+
+def parse_address(address: str) -> tuple:
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def connect(address: str) -> SidecarClient:
+    """Client side: connect a worker to a running sidecar"""
+    SidecarClient.register("records")
+    SidecarClient.register("enrichment_cache", proxytype=DictProxy)
+    client = SidecarClient(address=parse_address(address), authkey=read_authkey())
+    client.connect()
+    return client
+
+
+def serve(address: str):
+    authkey = read_authkey()
+    pool = db.ConnectionPool(lambda: db.connect(REGION, WORKGROUP_NAME), max_size=DB_POOL_SIZE)
+    store = PatientRecordStore(
+        pool.fetch_rows,
+        max_bytes=RECORD_CACHE_MB * 1024 * 1024,
+        poll_seconds=INGEST_POLL_SECONDS
+    )
+    enrichment_cache = EnrichmentCache(ENRICHMENT_CACHE_ITEMS)
+
+    SidecarManager.register("records", callable=lambda: store, exposed=("get", "stats"))
+    SidecarManager.register("enrichment_cache", callable=lambda: enrichment_cache, proxytype=DictProxy)
+    manager = SidecarManager(address=parse_address(address), authkey=authkey)
+
+    print(f"🧩 Cache sidecar listening on {address}")
+    manager.get_server().serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        serve(os.getenv("HEALTHBOT_SIDECAR", "127.0.0.1:8765"))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
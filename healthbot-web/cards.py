@@ -0,0 +1,100 @@
+import html
+import re
+from functools import lru_cache
+from string import Template
+from typing import Iterable, Tuple
+from urllib.parse import urlparse
+
+## Batched HTML rendering for the medical section cards.
+##
+## A whole section is compiled into one HTML payload and sent with a single
+## st.markdown call instead of one call (websocket message + DOM subtree)
+## per item. Templates are kept on one line so markdown never mistakes
+## indented HTML for a code block, and text is kept free of blank lines:
+## a blank line ends the HTML block, and every card after it would render
+## as raw markup.
+
+_PARAGRAPH_BREAK = re.compile(r"[ \t]*(?:\r?\n[ \t]*){2,}")
+_LINE_BREAK = re.compile(r"[ \t]*\r?\n[ \t]*")
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_MARKDOWN_LINK = re.compile(r"\[([^\]\n]+)\]\((https?://[^)\s]+)\)")
+
+_CARD = Template(
+    '<div class="$card_class">'
+    '<div style="display: flex; justify-content: space-between; align-items: flex-start; margin-bottom: 0.75rem;">'
+    '<div class="item-name">$$name</div>'
+    '<span class="$status_class">$status_text</span>'
+    '</div>'
+    '<div class="item-description">$$summary</div>'
+    '<div class="links-container">$$links</div>'
+    '</div>'
+)
+
+_LINK = Template('<a href="$url" target="_blank" rel="noopener noreferrer" class="medical-link">🔗 $domain</a>')
+_LINK_TEMPLATE = Template('<a href="$url" target="_blank" rel="noopener noreferrer">$title</a>')
+
+_EMPTY = Template(
+    '<div class="$card_class">'
+    '<div class="item-name">No $section_type recorded</div>'
+    '<div class="item-description">No $section_type found in patient medical record.</div>'
+    '</div>'
+)
+
+
+@lru_cache(maxsize=16)
+def card_template(card_class: str, status_class: str, status_text: str) -> Template:
+    """Per-section template with the static parts already filled in"""
+    return Template(_CARD.substitute(
+        card_class=html.escape(card_class),
+        status_class=html.escape(status_class),
+        status_text=html.escape(status_text),
+    ))
+
+
+def safe_url(url: str) -> str:
+    """Escape a search-result URL, dropping anything that is not http(s)"""
+    if not isinstance(url, str) or urlparse(url.strip()).scheme.lower() not in ("http", "https"):
+        return "#"
+    return html.escape(url.strip(), quote=True)
+
+
+def text_html(text) -> str:
+    """Escaped text on a single line; paragraph breaks become <br><br>"""
+    escaped = html.escape(str(text).strip())
+    return _LINE_BREAK.sub(" ", _PARAGRAPH_BREAK.sub("<br><br>", escaped))
+
+
+def answer_html(text) -> str:
+    """Escaped agent/LLM text for an HTML callout: line breaks kept as <br>,
+    **bold** and [title](http...) links rendered, nothing else let through"""
+    escaped = html.escape(str(text).strip())
+    escaped = _BOLD.sub(r"<strong>\1</strong>", escaped)
+    escaped = _MARKDOWN_LINK.sub(
+        lambda m: _LINK_TEMPLATE.substitute(url=m.group(2), title=m.group(1)), escaped
+    )
+    return _LINE_BREAK.sub("<br>", escaped)
+
+
+def render_links(links: Iterable[dict]) -> str:
+    return "".join(
+        _LINK.substitute(url=safe_url(link.get("url")), domain=text_html(link.get("domain", "")))
+        for link in links or ()
+    )
+
+
+def render_section_cards(entries: Iterable[Tuple[str, dict]], card_class: str,
+                         status_class: str, status_text: str) -> str:
+    """Compile (item, {"summary", "links"}) pairs into a single HTML payload"""
+    template = card_template(card_class, status_class, status_text)
+    return "".join(
+        template.substitute(
+            name=text_html(item),
+            summary=text_html(info.get("summary", "")),
+            links=render_links(info.get("links")),
+        )
+        for item, info in entries
+    )
+
+
+def render_empty_section(card_class: str, section_type: str) -> str:
+    return _EMPTY.substitute(card_class=html.escape(card_class), section_type=html.escape(section_type))
@@ -0,0 +1,138 @@
+import os
+import time
+from functools import lru_cache
+
+## Lazily constructed LLM / search clients.
+##
+## Streamlit re-executes application.py on every interaction, but imported
+## modules stay in sys.modules, so the lru_cache'd getters below build each
+## client once per process. The langchain imports happen inside the getters,
+## keeping them off the cold-start path until the first enrichment or query.
+
+# Enhanced AGENTIC AI prompts
+AGENTIC_SEARCH_TEMPLATE = """
+You are an expert medical AI agent assisting healthcare providers. Think step by step.
+
+PATIENT CONTEXT:
+- Age: {age}, Gender: {gender}
+- Medical Conditions: {conditions}  
+- Current Medications: {medications}
+- Known Drug Interactions: {interactions}
+
+QUERY: "{query}"
+
+AVAILABLE INFORMATION: {search_results}
+
+AGENT REASONING:
+1. First, analyze the patient's profile for relevant risk factors
+2. Consider drug interactions and contraindications, starting with the known interactions listed above
+3. Evaluate evidence quality from search results
+4. Formulate patient-specific recommendations
+
+RESPONSE FORMAT:
+**Clinical Analysis for {age}-year-old {gender}:**
+
+[Your evidence-based analysis here]
+
+**Patient-Specific Considerations:**
+- [Consideration 1 based on their conditions]
+- [Consideration 2 based on their medications]
+- [Age/gender specific factors]
+
+**Recommended Actions:**
+- [Specific actionable recommendation 1]
+- [Specific actionable recommendation 2]
+
+**Additional Resources:**
+- [Include relevant URLs from search results]
+- [Medical guidelines or authoritative sources]
+
+Remember: Base recommendations on patient's specific profile and current evidence.
+"""
+
+AGENT_REASONING_TEMPLATE = """
+As a medical AI agent, I need to think through this step by step:
+
+Patient: {age}-year-old {gender}
+Query: "{query}"
+Conditions: {conditions}
+Medications: {medications}
+
+My reasoning process:
+1. What are the key medical considerations for this patient?
+2. How do their conditions and medications affect the answer?
+3. What evidence-based recommendations can I provide?
+4. What safety considerations should I highlight?
+
+Provide your reasoning in 2-3 sentences, then I'll search for evidence.
+"""
+
+FAKE_CLIENTS = os.getenv("HEALTHBOT_FAKE_CLIENTS") == "1"
+
+_init_seconds = {}
+
+
+def _timed(name: str, build):
+    started = time.perf_counter()
+    value = build()
+    _init_seconds[name] = time.perf_counter() - started
+    return value
+
+
+@lru_cache(maxsize=None)
+def get_llm():
+    def build():
+        if FAKE_CLIENTS:
+            from fakes import FakeLLM
+            return FakeLLM()
+        from langchain.chat_models import ChatOpenAI
+        # outbound.call owns retries and backoff; SDK retries would multiply them
+        return ChatOpenAI(model="gpt-4", temperature=0.2, openai_api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _timed("llm", build)
+
+
+@lru_cache(maxsize=None)
+def get_tavily():
+    def build():
+        if FAKE_CLIENTS:
+            from fakes import FakeTavily
+            return FakeTavily()
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        return TavilySearchResults(api_key=os.getenv("TAVILY_API_KEY"), max_results=5)
+    return _timed("tavily", build)
+
+
+@lru_cache(maxsize=None)
+def get_agentic_search_chain():
+    def build():
+        if FAKE_CLIENTS:
+            from fakes import FakeChain
+            return FakeChain("recommendation")
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
+        return LLMChain(llm=get_llm(), prompt=PromptTemplate.from_template(AGENTIC_SEARCH_TEMPLATE))
+    return _timed("agentic_search_chain", build)
+
+
+@lru_cache(maxsize=None)
+def get_agent_reasoning_chain():
+    def build():
+        if FAKE_CLIENTS:
+            from fakes import FakeChain
+            return FakeChain("reasoning")
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
+        return LLMChain(llm=get_llm(), prompt=PromptTemplate.from_template(AGENT_REASONING_TEMPLATE))
+    return _timed("agent_reasoning_chain", build)
+
+
+def warm_up():
+    """Build every client now (HEALTHBOT_EAGER_CLIENTS=1 runs this at startup)"""
+    get_tavily()
+    get_agentic_search_chain()
+    get_agent_reasoning_chain()
+
+
+def init_seconds() -> dict:
+    """Seconds spent importing + constructing each client so far"""
+    return dict(_init_seconds)
@@ -0,0 +1,184 @@
+import os
+import re
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import interactions
+
+## Token-budgeted prompt context for the agentic search chain.
+##
+## Instead of pasting the raw Tavily output and every condition/medication into
+## the prompt, rank what we have against the query, drop duplicate sources and
+## near-identical snippets, and cut the result to AGENT_CONTEXT_TOKENS. Token
+## counts come from tiktoken when it is installed, otherwise from a local
+## word/punctuation approximation that errs on the high side.
+
+AGENT_CONTEXT_TOKENS = int(os.getenv("AGENT_CONTEXT_TOKENS", "1200"))
+PATIENT_FACTS_SHARE = 0.25
+INTERACTIONS_SHARE = 0.25  # of the patient facts budget
+SNIPPET_MAX_TOKENS = 160
+NEAR_DUPLICATE_OVERLAP = 0.8
+
+PREFERRED_DOMAINS = (
+    'mayoclinic.org', 'medlineplus.gov', 'nih.gov', 'cdc.gov', 'fda.gov',
+    'clevelandclinic.org', 'drugs.com', 'webmd.com', 'healthline.com'
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~4 characters per token for long words, at least one per word/punctuation mark
+    return sum(max(1, (len(piece) + 3) // 4) for piece in _TOKEN_PIECES.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens]).rstrip() + "…"
+    words = text.split()
+    while words and count_tokens(" ".join(words)) > max_tokens:
+        words = words[: max(0, len(words) - max(1, len(words) // 8))]
+    return " ".join(words) + "…"
+
+
+def _terms(text: str) -> set:
+    return {word for word in _WORD.findall(text.lower()) if len(word) > 2}
+
+
+def _overlap(a: set, b: set) -> float:
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def _domain(url: str) -> str:
+    return urlparse(url).netloc.lower().replace("www.", "")
+
+
+def normalize_results(raw_results) -> list:
+    """Tavily output (list of dicts or a plain string) -> [{"title", "url", "content"}]"""
+    if isinstance(raw_results, list):
+        return [
+            {
+                "title": result.get("title", ""),
+                "url": result.get("url", ""),
+                "content": result.get("content") or result.get("snippet") or ""
+            }
+            for result in raw_results if isinstance(result, dict)
+        ]
+    if isinstance(raw_results, str) and raw_results.strip():
+        return [{"title": "", "url": "", "content": raw_results}]
+    return []
+
+
+def rank_snippets(results: list, query: str, patient_terms: set) -> list:
+    """Best-first, one snippet per URL, near-duplicate content and repeat domains pushed back"""
+    query_terms = _terms(query)
+    scored = []
+    for position, result in enumerate(results):
+        terms = _terms(result["title"] + " " + result["content"])
+        score = (
+            2.0 * _overlap(query_terms, terms)
+            + 1.0 * _overlap(patient_terms, terms)
+            + (0.5 if any(domain in result["url"].lower() for domain in PREFERRED_DOMAINS) else 0.0)
+            - 0.05 * position  # search engine order as a tie-breaker
+        )
+        scored.append((score, position, result, terms))
+    scored.sort(key=lambda entry: (-entry[0], entry[1]))
+
+    kept, repeats, seen_urls, seen_domains, kept_terms = [], [], set(), set(), []
+    for _, _, result, terms in scored:
+        if result["url"] and result["url"] in seen_urls:
+            continue
+        if any(_overlap(terms, other) >= NEAR_DUPLICATE_OVERLAP for other in kept_terms):
+            continue
+        seen_urls.add(result["url"])
+        kept_terms.append(terms)
+        domain = _domain(result["url"]) if result["url"] else ""
+        if domain and domain in seen_domains:
+            repeats.append(result)
+        else:
+            seen_domains.add(domain)
+            kept.append(result)
+    return kept + repeats
+
+
+def rank_facts(items, query: str) -> list:
+    """Conditions/medications mentioned in the query first, otherwise record order"""
+    query_terms = _terms(query)
+    return sorted(items, key=lambda item: -_overlap(query_terms, _terms(item)))
+
+
+def fit_facts(items: list, budget: int, total: int = None) -> str:
+    """Items that fit the budget; `total` counts entries the record did not list either"""
+    if not items:
+        return "None documented"
+    chosen, used = [], 0
+    for item in items:
+        cost = count_tokens(item) + 1
+        if used + cost > budget:
+            break
+        chosen.append(item)
+        used += cost
+    text = ", ".join(chosen) if chosen else truncate_tokens(items[0], budget)
+    omitted = max(total or 0, len(items)) - max(1, len(chosen))
+    return f"{text} (+{omitted} more)" if omitted > 0 else text
+
+
+def fit_snippets(snippets: list, budget: int) -> str:
+    blocks, used = [], 0
+    for number, snippet in enumerate(snippets, start=1):
+        header = f"[{number}] {snippet['title']} ({_domain(snippet['url'])})" if snippet["url"] else f"[{number}]"
+        room = min(SNIPPET_MAX_TOKENS, budget - used - count_tokens(header) - 2)
+        if room < 20:
+            break
+        block = f"{header}\n{truncate_tokens(snippet['content'].strip(), room)}"
+        blocks.append(block)
+        used += count_tokens(block) + 2
+    return "\n\n".join(blocks) if blocks else "No search results available."
+
+
+def assemble_context(record, query: str, raw_results, budget: int = AGENT_CONTEXT_TOKENS) -> dict:
+    """Prompt variables for AGENTIC_SEARCH_TEMPLATE, fitted to a token budget"""
+    facts_budget = int(budget * PATIENT_FACTS_SHARE)
+    found = interactions.interactions_for(record['medications'])
+    if found:
+        interactions_text = fit_facts([interactions.describe(i) for i in found], int(facts_budget * INTERACTIONS_SHARE))
+    else:
+        interactions_text = "None in the offline interaction list"
+    # Conditions and medications split what the interactions leave of the same budget
+    facts_budget -= count_tokens(interactions_text)
+    conditions = rank_facts(record['conditions'], query)
+    medications = rank_facts(record['medications'], query)
+    conditions_text = fit_facts(conditions, facts_budget // 2, record.count('conditions'))
+    medications_text = fit_facts(medications, facts_budget - count_tokens(conditions_text), record.count('medications'))
+
+    patient_terms = _terms(" ".join(conditions) + " " + " ".join(medications))
+    snippets = rank_snippets(normalize_results(raw_results), query, patient_terms)
+    used = count_tokens(conditions_text) + count_tokens(medications_text) + count_tokens(interactions_text) + count_tokens(query)
+
+    return {
+        "age": record['age'],
+        "gender": record['gender'],
+        "conditions": conditions_text,
+        "medications": medications_text,
+        "interactions": interactions_text,
+        "query": query,
+        "search_results": fit_snippets(snippets, budget - used)
+    }
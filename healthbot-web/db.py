@@ -0,0 +1,86 @@
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from typing import List, Sequence
+
+REDSHIFT_HOST = "healthbot-data.692859942702.us-east-1.redshift-serverless.amazonaws.com"
+REDSHIFT_PORT = 5439
+REDSHIFT_DB = "healthbot"
+
+
+def connect(region: str, workgroup_name: str):
+    """Open a Redshift Serverless connection with temporary IAM credentials"""
+    import boto3
+    import psycopg2
+
+    creds = boto3.client("redshift-serverless", region_name=region).get_credentials(
+        workgroupName=workgroup_name, durationSeconds=900
+    )
+    return psycopg2.connect(
+        host=REDSHIFT_HOST,
+        port=REDSHIFT_PORT, database=REDSHIFT_DB,
+        user=creds["dbUser"], password=creds["dbPassword"], sslmode='require'
+    )
+
+
+@lru_cache(maxsize=64)
+def row_type(columns: Sequence[str]):
+    """One named tuple class per distinct column list, reused across queries"""
+    return namedtuple("Row", columns)
+
+
+def fetch_rows(conn, query: str, params=None) -> List[tuple]:
+    """Run a query and return its rows as named tuples straight from the cursor"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            if cur.description is None:
+                return []
+            Row = row_type(tuple(col[0] for col in cur.description))
+            return [Row._make(values) for values in cur.fetchall()]
+
+
+def rows_to_df(rows: List[tuple]):
+    """Optional DataFrame export; pandas is only imported when this is called"""
+    import pandas as pd
+
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame.from_records(rows, columns=rows[0]._fields)
+
+
+class ConnectionPool:
+    """
+    Small thread-safe connection pool. At most `max_size` connections are
+    open; idle ones are reused and a connection that raises is discarded.
+    """
+
+    def __init__(self, connect_fn, max_size: int = 4):
+        self._connect = connect_fn
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def fetch_rows(self, query: str, params=None) -> List[tuple]:
+        self._slots.acquire()
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None or conn.closed:
+                conn = self._connect()
+            try:
+                rows = fetch_rows(conn, query, params)
+            except Exception:
+                conn.close()
+                raise
+            with self._lock:
+                self._idle.append(conn)
+            return rows
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+## Text embeddings for the local vector index and the semantic answer cache.
+##
+## The default embedder is a CPU-only feature-hashing model: word unigrams,
+## word bigrams and character trigrams hashed into a fixed number of signed
+## buckets and L2-normalised. It needs no network or model download, is
+## deterministic across processes, and is good at "same item / same question,
+## slightly different wording". Set HEALTHBOT_EMBEDDINGS=openai to use OpenAI
+## embeddings instead (an index built with one embedder refuses the other).
+
+EMBEDDINGS = os.getenv("HEALTHBOT_EMBEDDINGS", "hashing")
+HASHING_DIM = int(os.getenv("HEALTHBOT_EMBEDDING_DIM", "512"))
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(feature: str, dim: int):
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+def _features(text: str):
+    words = _WORD.findall(text.lower())
+    for word in words:
+        yield word, 1.0
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            yield "3:" + padded[i:i + 3], 0.3
+    for first, second in zip(words, words[1:]):
+        yield first + " " + second, 0.7
+
+
+class HashingEmbedder:
+    name = "hashing"
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in _features(text):
+                index, sign = _bucket(feature, self.dim)
+                vectors[row, index] += sign * weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OpenAIEmbedder:
+    name = "openai-text-embedding-3-small"
+    dim = 1536
+
+    def __init__(self):
+        from langchain_openai import OpenAIEmbeddings
+        self._client = OpenAIEmbeddings(model="text-embedding-3-small", api_key=os.getenv("OPENAI_API_KEY"))
+
+    def embed(self, texts) -> np.ndarray:
+        import outbound
+        vectors = np.asarray(outbound.call("openai", self._client.embed_documents, list(texts)), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+@lru_cache(maxsize=None)
+def get_embedder():
+    if EMBEDDINGS == "openai" and os.getenv("HEALTHBOT_FAKE_CLIENTS") != "1":
+        return OpenAIEmbedder()
+    return HashingEmbedder()
+
+
+def embed(texts) -> np.ndarray:
+    """(len(texts), dim) float32, unit-length rows"""
+    return get_embedder().embed(list(texts))
@@ -0,0 +1,225 @@
+import clients
+import outbound
+import vector_index
+from single_flight import FLIGHTS
+
+## Tavily-powered medical information for conditions, medications and care
+## plans. Kept free of Streamlit so the web app, the prefetcher and the API
+## service share one implementation.
+
+def get_medical_info_with_search(item_name: str, item_type: str, age: int, gender: str) -> dict:
+    """Get comprehensive medical information using Tavily search"""
+    
+    try:
+        # Create focused search queries
+        if item_type == "medication":
+            search_query = f"{item_name} medication uses side effects dosage information"
+        elif item_type == "condition":
+            search_query = f"{item_name} medical condition symptoms causes treatment"
+        else:  # careplan
+            search_query = f"{item_name} care plan treatment management"
+        
+        # Stored passages first; Tavily only when the local index has no close match
+        subject = f"{item_name} {item_type}"
+        search_results = vector_index.retrieve(subject, kind="snippet", subject=subject)
+        if search_results is None:
+            search_results = outbound.call("tavily", clients.get_tavily().run, search_query)
+            vector_index.remember(vector_index.snippet_entries(search_query, search_results, subject=subject))
+        
+        # Extract summary from search results
+        summary = extract_medical_summary(search_results, item_name, item_type, age, gender)
+        
+        # Extract relevant links
+        links = extract_medical_links(search_results, item_name, item_type)
+        
+        return {
+            "summary": summary,
+            "links": links,
+            "fallback": summary == generate_fallback_summary(item_name, item_type, age, gender)
+        }
+        
+    except Exception as e:
+        # Fallback information
+        fallback_summary = generate_fallback_summary(item_name, item_type, age, gender)
+        fallback_links = generate_fallback_links(item_name, item_type)
+        
+        return {
+            "summary": fallback_summary,
+            "links": fallback_links,
+            "fallback": True
+        }
+
+def extract_medical_summary(search_results, item_name: str, item_type: str, age: int, gender: str) -> str:
+    """Extract and generate a medical summary from search results"""
+    
+    try:
+        # Combine search result content
+        content_pieces = []
+        
+        if isinstance(search_results, list):
+            for result in search_results[:3]:  # Use top 3 results
+                if isinstance(result, dict):
+                    if 'content' in result:
+                        content_pieces.append(result['content'])
+                    elif 'snippet' in result:
+                        content_pieces.append(result['snippet'])
+        
+        combined_content = " ".join(content_pieces)
+        
+        # Use LLM to generate patient-specific summary
+        summary_prompt = f"""
+        Based on the following medical information about "{item_name}", create a clear 2-3 sentence summary for a {age}-year-old {gender}.
+
+        Medical Information: {combined_content[:1500]}  # Limit content length
+
+        Focus on:
+        1. What {item_name} is and its primary purpose/effects
+        2. Key considerations for someone of this age and gender
+        3. Important things to know or monitor
+
+        Keep it professional but accessible. Avoid medical jargon where possible.
+        """
+        
+        summary = outbound.call("openai", clients.get_llm().predict, summary_prompt)
+        return summary.strip()
+        
+    except Exception:
+        return generate_fallback_summary(item_name, item_type, age, gender)
+
+def extract_medical_links(search_results, item_name: str, item_type: str) -> list:
+    """Extract authoritative medical links from search results"""
+    
+    # Preferred medical domains
+    preferred_domains = [
+        'mayoclinic.org',
+        'medlineplus.gov',
+        'webmd.com',
+        'drugs.com',
+        'healthline.com',
+        'clevelandclinic.org',
+        'nih.gov',
+        'fda.gov',
+        'cdc.gov'
+    ]
+    
+    links = []
+    
+    try:
+        if isinstance(search_results, list):
+            for result in search_results:
+                if isinstance(result, dict) and 'url' in result:
+                    url = result['url']
+                    title = result.get('title', 'Medical Information')
+                    
+                    # Check if it's from a preferred domain
+                    is_preferred = any(domain in url.lower() for domain in preferred_domains)
+                    
+                    if is_preferred:
+                        links.append({
+                            'title': title,
+                            'url': url,
+                            'domain': extract_domain(url)
+                        })
+        
+        # If we don't have enough preferred links, add others
+        if len(links) < 3 and isinstance(search_results, list):
+            for result in search_results:
+                if isinstance(result, dict) and 'url' in result and len(links) < 4:
+                    url = result['url']
+                    title = result.get('title', 'Medical Information')
+                    
+                    # Skip if already added
+                    if not any(link['url'] == url for link in links):
+                        links.append({
+                            'title': title,
+                            'url': url,
+                            'domain': extract_domain(url)
+                        })
+        
+        return links[:4]  # Limit to 4 links
+        
+    except Exception:
+        return generate_fallback_links(item_name, item_type)
+
+def extract_domain(url: str) -> str:
+    """Extract domain name from URL"""
+    try:
+        from urllib.parse import urlparse
+        return urlparse(url).netloc.replace('www.', '')
+    except:
+        return 'Medical Resource'
+
+def generate_fallback_summary(item_name: str, item_type: str, age: int, gender: str) -> str:
+    """Generate fallback summary when search fails"""
+    
+    if item_type == "medication":
+        return f"{item_name} is a medication prescribed for this {age}-year-old {gender}. It's important to take as directed by the healthcare provider and be aware of potential side effects. Regular monitoring may be required to ensure safe and effective treatment."
+    elif item_type == "condition":
+        return f"{item_name} is a medical condition affecting this {age}-year-old {gender}. Proper management typically involves regular monitoring, lifestyle considerations, and following the treatment plan. Age and gender may influence how this condition affects the patient."
+    else:  # careplan
+        return f"This care plan for {item_name} is designed specifically for this {age}-year-old {gender}. It outlines important steps for managing health and treatment goals. Following the care plan helps ensure the best possible health outcomes."
+
+def generate_fallback_links(item_name: str, item_type: str) -> list:
+    """Generate fallback links when search fails"""
+    
+    clean_name = item_name.lower().replace(" ", "+")
+    
+    links = [
+        {
+            'title': f'{item_name} - MedlinePlus',
+            'url': f'https://medlineplus.gov/search/?query={clean_name}',
+            'domain': 'medlineplus.gov'
+        },
+        {
+            'title': f'{item_name} - Mayo Clinic',
+            'url': f'https://www.mayoclinic.org/search/?q={clean_name}',
+            'domain': 'mayoclinic.org'
+        }
+    ]
+    
+    if item_type == "medication":
+        links.append({
+            'title': f'{item_name} - Drugs.com',
+            'url': f'https://www.drugs.com/search.php?searchterm={clean_name}',
+            'domain': 'drugs.com'
+        })
+    
+    return links
+
+def enrichment_key(item_name: str, section_type: str, age: int, gender: str) -> str:
+    return f"{section_type}_{item_name}_{age}_{gender}_enhanced"
+
+def search_or_fallback(item_name: str, section_type: str, age: int, gender: str) -> dict:
+    try:
+        return get_medical_info_with_search(
+            item_name,
+            section_type[:-1],  # Remove 's' from section_type
+            age,
+            gender
+        )
+    except Exception:
+        return {
+            "summary": generate_fallback_summary(item_name, section_type[:-1], age, gender),
+            "links": generate_fallback_links(item_name, section_type[:-1]),
+            "fallback": True
+        }
+
+def get_enrichment(cache, item_name: str, section_type: str, age: int, gender: str) -> dict:
+    """Return cached medical information for an item, searching on a miss"""
+    cache_key = enrichment_key(item_name, section_type, age, gender)
+    
+    info = cache.get(cache_key)
+    if info is None:
+        # Sessions missing on the same item at once share a single search
+        info = FLIGHTS.do(("enrichment", cache_key), search_or_fallback, item_name, section_type, age, gender)
+        # Generic fallback text is served but not kept, so the next request retries the search
+        if not info.get("fallback"):
+            cache[cache_key] = info
+    
+    return info
+
+def enrich_record(cache, record):
+    """Fill an enrichment cache for every item in a patient record"""
+    for section_type in ("conditions", "medications", "careplans"):
+        for item in record[section_type]:
+            get_enrichment(cache, item, section_type, record['age'], record['gender'])
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import time
+from datetime import date
+
+from record_cache import PatientRecord
+
+## Offline stand-ins for OpenAI, Tavily and Redshift.
+##
+## Enabled with HEALTHBOT_FAKE_CLIENTS=1 (clients.py) and HEALTHBOT_FAKE_DATA=1
+## (api_service.py), so the app and API can be run and load-tested locally
+## without keys or a warehouse. Each call sleeps for a configurable latency
+## to mimic the network round trip.
+
+FAKE_LATENCY_SECONDS = float(os.getenv("HEALTHBOT_FAKE_LATENCY", "0.2"))
+
+_CONDITIONS = ["Hypertension", "Prediabetes", "Chronic sinusitis", "Osteoarthritis of knee", "Anemia"]
+_MEDICATIONS = ["Lisinopril 10 MG Oral Tablet", "Metformin 500 MG Oral Tablet", "Acetaminophen 325 MG Oral Tablet"]
+_CAREPLANS = ["Lifestyle education regarding hypertension", "Diabetes self management plan"]
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest(), 16)
+
+
+class FakeLLM:
+
+    def predict(self, prompt: str) -> str:
+        time.sleep(FAKE_LATENCY_SECONDS)
+        return f"Offline summary ({_digest(prompt) % 1000:03d}): consult the linked references for details."
+
+
+class FakeTavily:
+
+    def run(self, query: str) -> list:
+        time.sleep(FAKE_LATENCY_SECONDS)
+        slug = query.split(" ")[0].lower()
+        return [
+            {
+                "title": f"{query} - MedlinePlus",
+                "url": f"https://medlineplus.gov/search/?query={slug}",
+                "content": f"Background information about {query}."
+            },
+            {
+                "title": f"{query} - Mayo Clinic",
+                "url": f"https://www.mayoclinic.org/search/?q={slug}",
+                "content": f"Clinical overview of {query}."
+            }
+        ]
+
+
+class FakeChain:
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def run(self, inputs: dict) -> str:
+        time.sleep(FAKE_LATENCY_SECONDS)
+        return f"Offline {self.name} for: {inputs.get('query', '')}"
+
+
+class FakeRecordStore:
+    """Deterministic synthetic patients; any id resolves except ones starting with 'missing'"""
+
+    def get(self, pid: str):
+        if pid.startswith("missing"):
+            return None
+        time.sleep(FAKE_LATENCY_SECONDS / 4)
+        seed = _digest(pid)
+        return PatientRecord(
+            id=pid,
+            gender="female" if seed % 2 else "male",
+            birthdate=date(date.today().year - 20 - seed % 60, 1 + seed % 12, 1),
+            conditions=tuple(_CONDITIONS[: 1 + seed % len(_CONDITIONS)]),
+            medications=tuple(_MEDICATIONS[: 1 + seed % len(_MEDICATIONS)]),
+            careplans=tuple(_CAREPLANS[: seed % (len(_CAREPLANS) + 1)])
+        )
+
+    def stats(self) -> dict:
+        return {}
@@ -0,0 +1,165 @@
+import csv
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+
+## Offline drug-drug interaction check for a patient's medication list.
+##
+## Pairs come from a bundled CSV (data/drug_interactions.csv: two ingredient
+## names, a severity and a one-line description) loaded once into a dict
+## keyed by the sorted ingredient pair. A medication list is reduced to its
+## ingredients - Synthea displays such as "24 HR Metformin hydrochloride 500 MG
+## Extended Release Oral Tablet", including combination products - and every
+## pair of medications is looked up: O(n²) dict probes, no network. Results
+## are cached per medication-set signature, so the agent prompt, the
+## medications tab and repeat questions about the same list share one check.
+
+INTERACTIONS_PATH = os.getenv(
+    "HEALTHBOT_INTERACTIONS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "drug_interactions.csv")
+)
+SEVERITY_RANK = {"contraindicated": 0, "major": 1, "moderate": 2, "minor": 3}
+MAX_INGREDIENT_WORDS = 3
+
+_WORD = re.compile(r"[a-z]+")
+INTERACTION_QUESTION = re.compile(r"\binteract|\bcombin(e|ed|ing|ation)\b|\btogether\b|\bmix(ing)?\b")
+# "these medications", "her meds", "current drugs" - the question is about the list on record
+LIST_REFERENCE = re.compile(
+    r"\b(these|those|this|his|her|their|my|current|patient'?s?|all)\b.*\b(medications?|meds|drugs|prescriptions|pills)\b"
+    r"|\b(medications?|meds|drugs)\b.*\b(on record|listed|prescribed)\b"
+)
+# Judgement questions ("is it safe", "should I") go to the LLM even when they are about the list
+JUDGEMENT = re.compile(r"\b(why|should|could|would|safe|safely|risks?|recommend|advice|explain|worry|dangerous|okay|ok)\b")
+# Everything a "do my medications interact?" question says besides the medication names themselves;
+# any other word (alcohol, grapefruit, a brand name) may be a substance the offline list cannot vouch for
+LIST_QUESTION_WORDS = frozenset("""
+    a all among an and another any are at be between can check combination combinations combine combined
+    combining conflict conflicts current do does drug drugs each for have he her his i in interact interacting
+    interaction interactions is it list listed me medication medications meds mix mixing my of on one or other
+    patient patients pills prescribed prescriptions problems record s same she take taking that the their them
+    there these they this those time together we what which with
+""".split())
+
+Interaction = namedtuple("Interaction", "drug_a drug_b severity description medication_a medication_b")
+
+
+def pair_key(a: str, b: str) -> tuple:
+    return (a, b) if a <= b else (b, a)
+
+
+class InteractionIndex:
+
+    def __init__(self, rows=()):
+        self.pairs = {}  # (ingredient, ingredient) sorted -> (severity, description)
+        for row in rows:
+            a, b = row["drug_a"].strip().lower(), row["drug_b"].strip().lower()
+            self.pairs[pair_key(a, b)] = (row["severity"].strip().lower(), row["description"].strip())
+        self.ingredients = {name for pair in self.pairs for name in pair}
+
+    @classmethod
+    def load(cls, path: str = INTERACTIONS_PATH):
+        with open(path, newline="") as f:
+            return cls(csv.DictReader(f))
+
+    def ingredients_of(self, medication: str) -> tuple:
+        """Known ingredient names in a medication display string (1-3 word phrases)"""
+        words = _WORD.findall(medication.lower())
+        found = []
+        for size in range(MAX_INGREDIENT_WORDS, 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if phrase in self.ingredients and not any(phrase in longer for longer in found):
+                    found.append(phrase)
+        return tuple(found)
+
+    def check(self, medications) -> list:
+        """Every interacting pair across the list, most severe first"""
+        by_medication = [(medication, self.ingredients_of(medication)) for medication in medications]
+        found = []
+        # Ingredients of one combination product are intended together, so only pair across medications
+        for (med_a, ingredients_a), (med_b, ingredients_b) in combinations(by_medication, 2):
+            for a in ingredients_a:
+                for b in ingredients_b:
+                    hit = self.pairs.get(pair_key(a, b))
+                    if hit is not None:
+                        found.append(Interaction(a, b, hit[0], hit[1], med_a, med_b))
+        return sorted(found, key=lambda i: (SEVERITY_RANK.get(i.severity, len(SEVERITY_RANK)), i.drug_a, i.drug_b))
+
+
+@lru_cache(maxsize=1)
+def get_index() -> InteractionIndex:
+    try:
+        index = InteractionIndex.load()
+    except OSError as e:
+        print(f"❌ Drug interaction list unavailable ({e}); interaction checks are disabled")
+        return InteractionIndex()
+    print(f"✅ Loaded {len(index.pairs)} drug interaction pairs from {INTERACTIONS_PATH}")
+    return index
+
+
+def medication_signature(medications) -> tuple:
+    """Order- and duplicate-insensitive key for a medication list"""
+    return tuple(sorted({medication.strip() for medication in medications if medication and medication.strip()}))
+
+
+@lru_cache(maxsize=4096)
+def _check_signature(signature: tuple) -> tuple:
+    return tuple(get_index().check(signature))
+
+
+def interactions_for(medications) -> tuple:
+    """Interacting pairs for a medication list, cached per medication-set signature"""
+    return _check_signature(medication_signature(medications))
+
+
+def describe(interaction: Interaction) -> str:
+    return f"{interaction.drug_a.title()} + {interaction.drug_b.title()} ({interaction.severity}): {interaction.description}"
+
+
+def is_list_question(query: str, medications) -> bool:
+    """
+    An interaction question about the patient's own medication list and
+    nothing else. Judgement wording, an ingredient that is not on the list or
+    any word that is neither question wording nor part of a medication name
+    falls through to the LLM.
+    """
+    query = query.lower()
+    if JUDGEMENT.search(query) or not (INTERACTION_QUESTION.search(query) and LIST_REFERENCE.search(query)):
+        return False
+    index = get_index()
+    on_record = {name for medication in medications for name in index.ingredients_of(medication)}
+    if any(name not in on_record for name in index.ingredients_of(query)):
+        return False
+    medication_words = {word for medication in medications for word in _WORD.findall(medication.lower())}
+    return all(word in LIST_QUESTION_WORDS or word in medication_words for word in _WORD.findall(query))
+
+
+def answer(medications) -> str:
+    """Markdown answer to "do these medications interact?" straight from the index"""
+    medications = medication_signature(medications)
+    if len(medications) < 2:
+        return "Fewer than two medications on record, so there are no drug-drug interactions to check."
+    found = interactions_for(medications)
+    checked = len(medications) * (len(medications) - 1) // 2
+    if not found:
+        return (
+            f"No interactions found among the {len(medications)} medications ({checked} pairs) in the offline "
+            "interaction list. The list covers common, well-documented pairs only; confirm with a full interaction checker."
+        )
+    lines = [f"**{len(found)} interaction(s) among {len(medications)} medications ({checked} pairs checked):**"]
+    lines += [f"- {describe(interaction)}" for interaction in found]
+    return "\n".join(lines)
+
+
+def stats() -> dict:
+    info = _check_signature.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "pairs": len(get_index().pairs),
+        "signatures": info.currsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import http.client
+import itertools
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+## Concurrent-user load test for the multi-worker topology.
+##
+## Default mode starts N api_service.py workers (uvicorn) on loopback ports
+## behind the sticky proxy and drives clinician sessions through it: each
+## simulated user opens a patient record, streams its enrichment and asks
+## the agent a question, keeping the proxy's worker cookie like a browser.
+## Workers run on fake data and clients (fakes.py), so no warehouse or API
+## keys are needed; --live passes the caller's environment through instead.
+## Throughput and latency are reported per worker count and per endpoint.
+##
+## With --url it drives a running API deployment instead and reports a
+## single set of rows; HEALTHBOT_API_TOKEN must match the deployment's.
+##
+## Usage: python loadtest.py --users 16 --workers 1 2 4
+##        python loadtest.py --url http://localhost:8080 --users 32 --patients 123 456
+
+WORKER_BASE_PORT = 9601
+PROXY_PORT = 9600
+ENDPOINTS = ("record", "enrichment", "agent")
+AGENT_QUESTIONS = [
+    "What should I watch for with her current medications?",
+    "Is her blood pressure plan still appropriate?",
+    "Which follow-up tests are due?",
+    "Can she take all her medications together?",
+]
+
+
+def run_proxy(port: int, backend_ports: list):
+    from sticky_proxy import run_proxy as serve_proxy
+    asyncio.run(serve_proxy("127.0.0.1", port, [("127.0.0.1", p) for p in backend_ports]))
+
+
+def request(host: str, port: int, method: str, path: str, headers: dict, body: dict = None):
+    """One API call on a fresh connection (the proxy pins per connection); returns (status, Set-Cookie)"""
+    payload = json.dumps(body).encode("utf-8") if body is not None else None
+    if payload is not None:
+        headers = dict(headers, **{"Content-Type": "application/json"})
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        response.read()  # enrichment streams NDJSON until every card is done
+        return response.status, response.getheader("Set-Cookie")
+    finally:
+        conn.close()
+
+
+def simulated_user(host: str, port: int, token: str, pid: str, endpoints: tuple,
+                   deadline: float, results: dict):
+    cookie = None
+    questions = itertools.cycle(AGENT_QUESTIONS)
+    while time.monotonic() < deadline:
+        for endpoint in endpoints:
+            if time.monotonic() >= deadline:
+                break
+            headers = {"Authorization": f"Bearer {token}"}
+            if cookie:
+                headers["Cookie"] = cookie
+            if endpoint == "record":
+                call = ("GET", f"/patients/{pid}", None)
+            elif endpoint == "enrichment":
+                call = ("GET", f"/patients/{pid}/enrichment", None)
+            else:
+                call = ("POST", f"/patients/{pid}/agent", {"query": next(questions)})
+
+            started = time.perf_counter()
+            try:
+                status, set_cookie = request(host, port, *call[:2], headers, call[2])
+            except OSError:
+                results[endpoint]["errors"].append(1)
+                continue
+            if set_cookie:
+                cookie = set_cookie.split(";", 1)[0]
+            if status == 200:
+                results[endpoint]["latencies"].append(time.perf_counter() - started)
+            else:
+                results[endpoint]["errors"].append(status)
+
+
+def summarize(latencies: list, errors: list, seconds: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": len(errors),
+        "rps": len(ordered) / seconds,
+        "p50_ms": statistics.median(ordered) * 1000 if ordered else 0.0,
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000 if ordered else 0.0,
+    }
+
+
+def drive(host: str, port: int, token: str, patients: list, endpoints: tuple,
+          users: int, seconds: float) -> dict:
+    """endpoint -> summary, plus "all" across endpoints"""
+    results = {endpoint: {"latencies": [], "errors": []} for endpoint in endpoints}
+    deadline = time.monotonic() + seconds
+    threads = [
+        threading.Thread(
+            target=simulated_user,
+            args=(host, port, token, patients[i % len(patients)], endpoints, deadline, results)
+        )
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summaries = {
+        endpoint: summarize(result["latencies"], result["errors"], seconds)
+        for endpoint, result in results.items()
+    }
+    summaries["all"] = summarize(
+        [latency for result in results.values() for latency in result["latencies"]],
+        [error for result in results.values() for error in result["errors"]],
+        seconds
+    )
+    return summaries
+
+
+def wait_until_up(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if request("127.0.0.1", port, "GET", "/health", {})[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Nothing healthy on port {port}")
+
+
+def worker_env(token: str, live: bool) -> dict:
+    env = dict(os.environ, HEALTHBOT_API_TOKEN=token)
+    if not live:
+        env.update(HEALTHBOT_FAKE_DATA="1", HEALTHBOT_FAKE_CLIENTS="1")
+    return env
+
+
+def run_topology(worker_count: int, args) -> dict:
+    token = secrets.token_urlsafe(32)
+    env = worker_env(token, args.live)
+    here = os.path.dirname(os.path.abspath(__file__))
+    worker_ports = [WORKER_BASE_PORT + i for i in range(worker_count)]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api_service:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=here, env=env
+        )
+        for port in worker_ports
+    ]
+    processes.append(subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--proxy", str(PROXY_PORT), *map(str, worker_ports)],
+        cwd=here
+    ))
+    try:
+        for port in worker_ports + [PROXY_PORT]:
+            wait_until_up(port)
+        return drive("127.0.0.1", PROXY_PORT, token, args.patients, tuple(args.endpoints),
+                     args.users, args.seconds)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def print_rows(label: str, summaries: dict):
+    for endpoint, result in summaries.items():
+        print(f"{label:<10} {endpoint:<12} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the HealthBot API behind the sticky proxy")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--patients", nargs="+", default=None,
+                        help="patient ids to spread users over (default: one synthetic id per user)")
+    parser.add_argument("--live", action="store_true", help="run workers on real Redshift/OpenAI/Tavily")
+    parser.add_argument("--url", help="drive a running API deployment instead of starting workers")
+    parser.add_argument("--proxy", type=int, nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.proxy:
+        run_proxy(args.proxy[0], args.proxy[1:])
+        return
+
+    args.patients = args.patients or [f"loadtest-{i}" for i in range(args.users)]
+    print(f"{'workers':<10} {'endpoint':<12} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    if args.url:
+        from urllib.parse import urlparse
+        token = os.getenv("HEALTHBOT_API_TOKEN")
+        if not token:
+            print("❌ Set HEALTHBOT_API_TOKEN to the deployment's token")
+            sys.exit(1)
+        target = urlparse(args.url)
+        print_rows("deployment", drive(target.hostname, target.port or 80, token, args.patients,
+                                       tuple(args.endpoints), args.users, args.seconds))
+        return
+
+    for worker_count in args.workers:
+        print_rows(str(worker_count), run_topology(worker_count, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+## Columnar storage and vectorised analytics for a patient's observations.
+##
+## Rows come from the Redshift `observations` table (web app) or from the
+## structured FHIR documents (parser and CLI). They are held as an
+## ObservationSeries: interned int32 type/unit codes, float64 values and
+## int64 epoch seconds, sorted by (type, time) so a type or a time window is a
+## contiguous slice. All per-type work - latest value, least-squares trend,
+## rolling mean, reference-range flags - runs as NumPy segment reductions over
+## the whole history, so thousands of observations summarise in milliseconds.
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+ROLLING_WINDOW = 5
+
+# Adult reference ranges keyed by lower-cased observation type (Synthea/LOINC display names)
+REFERENCE_RANGES = {
+    "body temperature": (36.1, 37.8),
+    "heart rate": (60.0, 100.0),
+    "respiratory rate": (12.0, 20.0),
+    "systolic blood pressure": (90.0, 130.0),
+    "diastolic blood pressure": (60.0, 80.0),
+    "oxygen saturation in arterial blood": (95.0, 100.0),
+    "body mass index": (18.5, 25.0),
+    "glucose": (70.0, 99.0),
+    "hemoglobin a1c/hemoglobin.total in blood": (4.0, 5.7),
+    "total cholesterol": (0.0, 200.0),
+    "low density lipoprotein cholesterol": (0.0, 100.0),
+    "high density lipoprotein cholesterol": (40.0, 200.0),
+    "triglycerides": (0.0, 150.0),
+    "creatinine": (0.6, 1.3),
+    "potassium": (3.5, 5.1),
+    "sodium": (135.0, 145.0),
+    "hemoglobin [mass/volume] in blood": (12.0, 17.5),
+}
+
+OBSERVATIONS_QUERY = (
+    "SELECT type, value, unit, effectivedatetime FROM observations "
+    "WHERE patient_id=%s AND value IS NOT NULL ORDER BY effectivedatetime"
+)
+
+
+def to_epoch(value):
+    """ISO string, datetime or epoch number -> epoch seconds (UTC); None when missing or unparseable"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        moment = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp())
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return int((moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp())
+
+
+def _bound(value) -> int:
+    epoch = to_epoch(value)
+    if epoch is None:
+        raise ValueError(f"Unparseable time bound {value!r}")
+    return epoch
+
+
+def format_day(epoch: int) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class Vocabulary:
+    """Process-wide string <-> int32 code table for observation types and units"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = {}
+        self.names = []
+
+    def code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.setdefault(name, len(self.names))
+                if code == len(self.names):
+                    self.names.append(name)
+        return code
+
+    def codes(self, names) -> np.ndarray:
+        return np.fromiter((self.code(name) for name in names), dtype=np.int32)
+
+
+VOCABULARY = Vocabulary()
+
+
+class ObservationSeries:
+    """One patient's numeric observations, column-wise, sorted by (type code, time)"""
+
+    __slots__ = ("types", "units", "values", "times")
+
+    def __init__(self, types: np.ndarray, units: np.ndarray, values: np.ndarray, times: np.ndarray, presorted: bool = False):
+        if not presorted and len(types):
+            order = np.lexsort((times, types))
+            types, units, values, times = types[order], units[order], values[order], times[order]
+        self.types = types
+        self.units = units
+        self.values = values
+        self.times = times
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        (type, value, unit, effective) tuples - Redshift rows or Observation
+        namedtuples. Readings without a usable time are dropped: sorted in as
+        1970 they would skew the trend, rolling mean and latest value.
+        """
+        kept, times = [], []
+        for row in rows:
+            if row[0] and isinstance(row[1], (int, float)) and not isinstance(row[1], bool):
+                epoch = to_epoch(row[3])
+                if epoch is not None:
+                    kept.append(row)
+                    times.append(epoch)
+        return cls(
+            VOCABULARY.codes(row[0] for row in kept),
+            VOCABULARY.codes(row[2] or "" for row in kept),
+            np.fromiter((row[1] for row in kept), dtype=np.float64, count=len(kept)),
+            np.array(times, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        """Structured-document dicts ({type, value, unit, effectiveDateTime})"""
+        return cls.from_rows(
+            (r.get("type"), r.get("value"), r.get("unit"), r.get("effectiveDateTime")) for r in records
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self):
+        """(type, value, unit, effective day) tuples, for callers that want rows"""
+        names = VOCABULARY.names
+        for t, u, v, e in zip(self.types.tolist(), self.units.tolist(), self.values.tolist(), self.times.tolist()):
+            yield names[t], v, names[u], format_day(e)
+
+    def __reduce__(self):
+        # Codes are only meaningful in this process, so pickle the strings they stand for
+        names = VOCABULARY.names
+        return (_restore_series, (
+            [names[c] for c in self.types.tolist()],
+            [names[c] for c in self.units.tolist()],
+            self.values,
+            self.times,
+        ))
+
+    def nbytes(self) -> int:
+        return self.types.nbytes + self.units.nbytes + self.values.nbytes + self.times.nbytes
+
+    def type_names(self) -> list:
+        return [VOCABULARY.names[c] for c in np.unique(self.types).tolist()]
+
+    def _slice(self, start: int, stop: int):
+        return ObservationSeries(
+            self.types[start:stop], self.units[start:stop], self.values[start:stop], self.times[start:stop],
+            presorted=True
+        )
+
+    def select(self, type_name: str = None, since=None, until=None):
+        """Observations of one type (exact name) inside [since, until); views, no copies"""
+        if type_name is None:
+            if since is None and until is None:
+                return self
+            parts = [self.select(name, since, until) for name in self.type_names()]
+            return concat(parts)
+        code = VOCABULARY._codes.get(type_name)
+        if code is None:
+            return self._slice(0, 0)
+        lo = np.searchsorted(self.types, code, side="left")
+        hi = np.searchsorted(self.types, code, side="right")
+        times = self.times[lo:hi]
+        if since is not None:
+            lo += np.searchsorted(times, _bound(since), side="left")
+            times = self.times[lo:hi]
+        if until is not None:
+            hi = lo + np.searchsorted(times, _bound(until), side="left")
+        return self._slice(lo, hi)
+
+    def matching(self, words):
+        """Observations whose type name contains any of `words` (lower-case)"""
+        names = [name for name in self.type_names() if any(word in name.lower() for word in words)]
+        return concat([self.select(name) for name in names])
+
+
+def _restore_series(types, units, values, times):
+    return ObservationSeries(VOCABULARY.codes(types), VOCABULARY.codes(units), values, times, presorted=True)
+
+
+def concat(parts: list) -> ObservationSeries:
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        empty_codes = np.zeros(0, dtype=np.int32)
+        return ObservationSeries(empty_codes, empty_codes, np.zeros(0), np.zeros(0, dtype=np.int64), presorted=True)
+    if len(parts) == 1:
+        return parts[0]
+    return ObservationSeries(
+        np.concatenate([p.types for p in parts]),
+        np.concatenate([p.units for p in parts]),
+        np.concatenate([p.values for p in parts]),
+        np.concatenate([p.times for p in parts]),
+    )
+
+
+def rolling_last_mean(values: np.ndarray, starts: np.ndarray, ends: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last `window` values of each [start, end) group, via one cumulative sum"""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    window_starts = np.maximum(starts, ends - window)
+    return (cumulative[ends] - cumulative[window_starts]) / (ends - window_starts)
+
+
+def summarize(series: ObservationSeries) -> list:
+    """
+    One summary per observation type, most recently measured first:
+    {type, unit, count, latest, latest_at, min, max, mean, rolling_mean,
+     slope_per_year, low, high, out_of_range, flag}
+    """
+    if len(series) == 0:
+        return []
+
+    codes, units, values, times = series.types, series.units, series.values, series.times
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    counts = ends - starts
+    last = ends - 1
+    names = [VOCABULARY.names[c] for c in codes[starts].tolist()]
+
+    # Least-squares slope per group from segment sums (time measured from each group's first sample)
+    years = (times - np.repeat(times[starts], counts)) / SECONDS_PER_YEAR
+    n = counts.astype(np.float64)
+    sum_t = np.add.reduceat(years, starts)
+    sum_v = np.add.reduceat(values, starts)
+    sum_tt = np.add.reduceat(years * years, starts)
+    sum_tv = np.add.reduceat(years * values, starts)
+    denominator = n * sum_tt - sum_t * sum_t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.where(np.abs(denominator) > 1e-12, (n * sum_tv - sum_t * sum_v) / denominator, 0.0)
+
+    lows = np.array([REFERENCE_RANGES.get(name.lower(), (-np.inf, np.inf))[0] for name in names])
+    highs = np.array([REFERENCE_RANGES.get(name.lower(), (-np.inf, np.inf))[1] for name in names])
+    outside = (values < np.repeat(lows, counts)) | (values > np.repeat(highs, counts))
+    out_of_range = np.add.reduceat(outside.astype(np.int64), starts)
+
+    mins = np.minimum.reduceat(values, starts)
+    maxes = np.maximum.reduceat(values, starts)
+    rolling = rolling_last_mean(values, starts, ends, ROLLING_WINDOW)
+
+    summaries = []
+    for g in np.argsort(-times[last], kind="stable"):
+        latest = values[last[g]]
+        has_range = np.isfinite(lows[g]) or np.isfinite(highs[g])
+        summaries.append({
+            "type": names[g],
+            "unit": VOCABULARY.names[units[last[g]]],
+            "count": int(counts[g]),
+            "latest": float(latest),
+            "latest_at": format_day(times[last[g]]),
+            "min": float(mins[g]),
+            "max": float(maxes[g]),
+            "mean": float(sum_v[g] / n[g]),
+            "rolling_mean": float(rolling[g]),
+            "slope_per_year": float(slopes[g]),
+            "low": float(lows[g]) if np.isfinite(lows[g]) else None,
+            "high": float(highs[g]) if np.isfinite(highs[g]) else None,
+            "out_of_range": int(out_of_range[g]),
+            "flag": None if not has_range else "low" if latest < lows[g] else "high" if latest > highs[g] else "normal",
+        })
+    return summaries
+
+
+def summarize_rows(rows) -> list:
+    return summarize(ObservationSeries.from_rows(rows))
+
+
+def find(summaries: list, words) -> list:
+    """Summaries whose type mentions any of `words`"""
+    return [s for s in summaries if any(word in s["type"].lower() for word in words)]
+
+
+def describe(summary: dict) -> str:
+    """One line for chat answers and cards"""
+    trend = summary["slope_per_year"]
+    direction = "rising" if trend > 0 else "falling" if trend < 0 else "flat"
+    text = (
+        f"{summary['type']}: {summary['latest']:.4g} {summary['unit']} on {summary['latest_at']}"
+        f" (last {min(summary['count'], ROLLING_WINDOW)} avg {summary['rolling_mean']:.1f},"
+        f" {direction} {abs(trend):.1f}/yr over {summary['count']} readings)"
+    )
+    if summary["flag"] in ("low", "high"):
+        text += f" ⚠️ {summary['flag']}"
+    if summary["out_of_range"]:
+        text += f", {summary['out_of_range']} reading(s) out of range"
+    return text
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict
+
+## Central scheduler for outbound OpenAI and Tavily calls.
+##
+## Every call goes through a per-provider token bucket, so bursts of card
+## enrichment cannot trip the provider's rate limit. Waiting callers are
+## served in priority order: INTERACTIVE (agent queries a clinician is
+## waiting on) ahead of BACKGROUND (card enrichment, prefetch). Rate-limit
+## and transient errors are retried with full-jitter exponential backoff
+## until the call's deadline; only then does the caller see the exception
+## (and typically falls back to boilerplate, which is never cached). The
+## clients themselves are built with max_retries=0 so retries are not
+## stacked on top of the SDK's own.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+MAX_ATTEMPTS = 5
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+RATE_LIMIT_ERRORS = {"RateLimitError", "RateLimitExceeded", "TooManyRequests"}
+
+
+def status_of(error: Exception):
+    """HTTP status carried by an SDK error or by the requests/httpx response it wraps"""
+    status = getattr(error, "status_code", None) or getattr(error, "http_status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return status_of(error) == 429 or any(cls.__name__ in RATE_LIMIT_ERRORS for cls in type(error).__mro__)
+
+
+def is_retryable(error: Exception) -> bool:
+    if is_rate_limited(error):
+        return True
+    if status_of(error) in RETRYABLE_STATUS:
+        return True
+    name = type(error).__name__.lower()
+    return any(marker in name for marker in ("timeout", "connection", "serviceunavailable", "apierror"))
+
+
+class ProviderLimiter:
+    """Token bucket + concurrency cap with a priority-ordered wait queue"""
+
+    def __init__(self, name: str, rate_per_second: float, burst: int, max_concurrent: int):
+        self.name = name
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self.metrics = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "deadline_exceeded": 0}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def acquire(self, priority: int, deadline: float):
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    at_head = self._waiting[0] == ticket
+                    if at_head and self._tokens >= 1 and self._in_flight < self.max_concurrent:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._waiting.remove(ticket)
+                        heapq.heapify(self._waiting)
+                        self.metrics["deadline_exceeded"] += 1
+                        raise DeadlineExceeded(f"{self.name}: deadline passed while queued")
+                    if at_head and self._tokens < 1:
+                        remaining = min(remaining, (1 - self._tokens) / self.rate)
+                    self._cond.wait(remaining)
+            finally:
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def penalize(self):
+        """A 429 means the provider disagrees with our bucket: drain it."""
+        with self._cond:
+            self._tokens = min(self._tokens, 0.0)
+            self.metrics["rate_limited"] += 1
+
+    def count(self, metric: str):
+        with self._cond:
+            self.metrics[metric] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            return dict(
+                self.metrics,
+                queue_depth=len(self._waiting),
+                in_flight=self._in_flight,
+                tokens=round(self._tokens, 2)
+            )
+
+
+LIMITERS = {
+    "openai": ProviderLimiter(
+        "openai",
+        rate_per_second=float(os.getenv("OPENAI_RPS", "3")),
+        burst=int(os.getenv("OPENAI_BURST", "6")),
+        max_concurrent=int(os.getenv("OPENAI_MAX_CONCURRENT", "8"))
+    ),
+    "tavily": ProviderLimiter(
+        "tavily",
+        rate_per_second=float(os.getenv("TAVILY_RPS", "5")),
+        burst=int(os.getenv("TAVILY_BURST", "10")),
+        max_concurrent=int(os.getenv("TAVILY_MAX_CONCURRENT", "10"))
+    ),
+}
+
+DEFAULT_DEADLINE_SECONDS = {INTERACTIVE: 60.0, BACKGROUND: 30.0}
+
+
+def call(provider: str, fn: Callable, *args, priority: int = BACKGROUND, deadline_seconds: float = None, **kwargs):
+    """Run fn(*args, **kwargs) under the provider's rate limit, retrying transient failures"""
+    limiter = LIMITERS[provider]
+    deadline = time.monotonic() + (deadline_seconds or DEFAULT_DEADLINE_SECONDS[priority])
+
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.acquire(priority, deadline)
+        try:
+            limiter.count("calls")
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limited(e):
+                limiter.penalize()
+            backoff = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+            if not is_retryable(e) or attempt == MAX_ATTEMPTS - 1 or time.monotonic() + backoff >= deadline:
+                limiter.count("failures")
+                raise
+            limiter.count("retries")
+        finally:
+            limiter.release()
+        time.sleep(backoff)
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """Queue depth, in-flight count and retry counters per provider"""
+    return {name: limiter.snapshot() for name, limiter in LIMITERS.items()}
@@ -0,0 +1,92 @@
+from typing import Callable, Iterable, List, Optional
+
+from record_cache import PatientRecord, RecordCache
+from single_flight import FLIGHTS
+
+# patient_summary is materialized by the ingest loader (see patient_summary.py);
+# its aggregated columns join distinct values with the ASCII unit separator.
+# The loader imports this constant, so writer and reader cannot drift apart.
+SUMMARY_DELIMITER = "\x1f"
+
+PATIENT_SUMMARY_QUERY = (
+    "SELECT id, gender, birthdate, conditions, condition_count, medications, medication_count, "
+    "careplans, careplan_count FROM patient_summary WHERE id=%s"
+)
+# The summary lists are capped (SUMMARY_MAX_VALUES); the interaction check needs
+# every medication, so a cut-short list is read in full from the medications table.
+PATIENT_MEDICATIONS_QUERY = (
+    "SELECT DISTINCT medication FROM medications WHERE patient_id=%s AND medication IS NOT NULL ORDER BY medication"
+)
+INGEST_VERSION_QUERY = "SELECT MAX(batch_id) AS batch_id FROM ingest_batches"
+CHANGED_PATIENTS_QUERY = "SELECT DISTINCT patient_id FROM ingest_batch_patients WHERE batch_id > %s"
+
+
+def summary_values(value) -> tuple:
+    return tuple(value.split(SUMMARY_DELIMITER)) if value else ()
+
+
+class PatientRecordStore:
+    """
+    Cache-first access to patient_summary. `fetch_rows(query, params)` is any
+    callable returning named-tuple rows, so the same store runs inside a
+    Streamlit worker, the cache sidecar or the API service.
+    """
+
+    def __init__(self, fetch_rows: Callable[..., List[tuple]], max_bytes: int, poll_seconds: float = 30.0):
+        self._fetch_rows = fetch_rows
+        self.cache = RecordCache(
+            max_bytes=max_bytes,
+            read_version=self.read_ingest_version,
+            read_changed=self.read_changed_patients,
+            poll_seconds=poll_seconds
+        )
+
+    def read_ingest_version(self) -> Optional[int]:
+        """Latest batch id stamped by the ingest loader"""
+        rows = self._fetch_rows(INGEST_VERSION_QUERY)
+        if not rows or rows[0].batch_id is None:
+            return None
+        return int(rows[0].batch_id)
+
+    def read_changed_patients(self, since_batch: int) -> Iterable[str]:
+        """Patients touched by every ingest batch after `since_batch`"""
+        return [row.patient_id for row in self._fetch_rows(CHANGED_PATIENTS_QUERY, (since_batch,))]
+
+    def load(self, pid: str) -> Optional[PatientRecord]:
+        rows = self._fetch_rows(PATIENT_SUMMARY_QUERY, (pid,))
+        if not rows:
+            return None
+
+        row = rows[0]
+        medications = summary_values(row.medications)
+        if row.medication_count > len(medications):
+            medications = tuple(r.medication for r in self._fetch_rows(PATIENT_MEDICATIONS_QUERY, (pid,)))
+        return PatientRecord(
+            id=row.id,
+            gender=row.gender,
+            birthdate=row.birthdate,
+            conditions=summary_values(row.conditions),
+            medications=medications,
+            careplans=summary_values(row.careplans),
+            counts={"conditions": row.condition_count, "careplans": row.careplan_count}
+        )
+
+    def get(self, pid: str) -> Optional[PatientRecord]:
+        """Serve from the record cache, loading from patient_summary on a miss"""
+        record = self.cache.get(pid)
+        if record is None:
+            # Concurrent misses for one patient share a single Redshift query
+            record = FLIGHTS.do(("record", pid), self._load_into_cache, pid)
+        return record
+
+    def _load_into_cache(self, pid: str) -> Optional[PatientRecord]:
+        # Read before the query: if an ingest batch is noticed while it runs,
+        # the row may predate the batch and must not be cached.
+        generation = self.cache.generation()
+        record = self.load(pid)
+        if record is not None:
+            self.cache.put(record, generation)
+        return record
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List
+
+
+class PatientPrefetcher:
+    """
+    Warms the shared record and enrichment caches for an upcoming patient list
+    (e.g. a clinic schedule) so that "Load Patient" becomes a cache hit.
+
+    Work runs on a small thread pool, so at most `max_workers` patients are
+    fetched at once no matter how long the list is. Patients already queued or
+    in flight are not submitted twice. Both callables run on pool threads, so
+    they must not touch Streamlit.
+    """
+
+    def __init__(self, load_record: Callable[[str], Dict], enrich_record: Callable[[Dict], None],
+                 max_workers: int = 4):
+        self._load_record = load_record
+        self._enrich_record = enrich_record
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._stats = {"queued": 0, "loaded": 0, "missing": 0, "failed": 0}
+
+    def prefetch(self, patient_ids: Iterable[str]) -> List[str]:
+        """Queues the given patients in order and returns the ids actually submitted."""
+        submitted = []
+        for pid in patient_ids:
+            pid = pid.strip()
+            if not pid:
+                continue
+            with self._lock:
+                if pid in self._pending:
+                    continue
+                self._pending.add(pid)
+                self._stats["queued"] += 1
+            self._pool.submit(self._warm, pid)
+            submitted.append(pid)
+        return submitted
+
+    def _warm(self, pid: str):
+        outcome = "failed"
+        try:
+            record = self._load_record(pid)
+            if record is None:
+                outcome = "missing"
+            else:
+                self._enrich_record(record)
+                outcome = "loaded"
+        except Exception:
+            outcome = "failed"
+        finally:
+            with self._lock:
+                self._pending.discard(pid)
+                self._stats[outcome] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._pending))
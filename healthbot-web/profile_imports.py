@@ -0,0 +1,78 @@
+import subprocess
+import sys
+
+## Import-time profile for the web app's cold start.
+##
+## Runs each import in a fresh interpreter with `-X importtime` and reports
+## the cumulative cost, so the startup path (what application.py imports at
+## module load) can be compared with the heavy dependencies that clients.py
+## and db.py now import lazily.
+##
+## Usage: python profile_imports.py [top_n]
+
+STARTUP_IMPORTS = ["streamlit", "dotenv", "clients", "db", "prefetch", "record_cache"]
+
+DEFERRED_IMPORTS = [
+    "pandas",
+    "boto3",
+    "psycopg2",
+    "langchain.chat_models",
+    "langchain.chains",
+    "langchain.prompts",
+    "langchain_community.tools.tavily_search",
+    "reportlab.platypus",
+]
+
+
+def profile_import(module: str) -> list:
+    """Returns [(cumulative_us, self_us, name)] for everything `module` pulls in."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return []
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def top_level_ms(rows: list, module: str) -> float:
+    for cumulative_us, _, name in rows:
+        if name.strip() == module:
+            return cumulative_us / 1000
+    return 0.0
+
+
+def report(modules: list, title: str, top_n: int) -> float:
+    print(f"\n{title}")
+    total = 0.0
+    slowest = []
+    for module in modules:
+        rows = profile_import(module)
+        if not rows:
+            print(f"  {module:<45} not installed")
+            continue
+        ms = top_level_ms(rows, module)
+        total += ms
+        slowest.extend(rows)
+        print(f"  {module:<45} {ms:9.1f} ms")
+    print(f"  {'total (each measured in a fresh process)':<45} {total:9.1f} ms")
+
+    if slowest and top_n:
+        print("  slowest individual modules (self time):")
+        for _, self_us, name in sorted(slowest, key=lambda r: r[1], reverse=True)[:top_n]:
+            print(f"    {self_us / 1000:8.1f} ms  {name.strip()}")
+    return total
+
+
+if __name__ == "__main__":
+    top_n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    startup = report(STARTUP_IMPORTS, "⏱️ Startup imports (application.py module load)", top_n)
+    deferred = report(DEFERRED_IMPORTS, "💤 Deferred imports (first use only)", top_n)
+    print(f"\nCold start avoids ~{deferred:.0f} ms of imports; startup path costs ~{startup:.0f} ms.")
@@ -0,0 +1,193 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class PatientRecord:
+    """
+    Compact, read-only patient record. Sections are tuples of distinct
+    descriptions, so a cached record can be handed to every session without
+    copying. Supports record['field'] access like the dicts it replaces.
+    Age is derived from birthdate on every read, so a cached record never
+    reports a stale age. `counts` holds the exact number of distinct entries
+    per section when the listed ones were cut short (see patient_summary.py).
+    """
+    __slots__ = ("id", "gender", "birthdate", "conditions", "medications", "careplans", "counts")
+
+    def __init__(self, id: str, gender: str, birthdate: Optional[date],
+                 conditions: Tuple[str, ...], medications: Tuple[str, ...], careplans: Tuple[str, ...],
+                 counts: Optional[Dict[str, int]] = None):
+        self.id = id
+        self.gender = gender
+        self.birthdate = birthdate
+        self.conditions = conditions
+        self.medications = medications
+        self.careplans = careplans
+        self.counts = counts or {}
+
+    @property
+    def age(self) -> Optional[int]:
+        if self.birthdate is None:
+            return None
+        return int((date.today() - self.birthdate).days / 365.25)
+
+    def __getitem__(self, field: str):
+        return getattr(self, field)
+
+    def count(self, section: str) -> int:
+        """Exact number of distinct entries in a section, listed or not"""
+        return max(self.counts.get(section, 0), len(getattr(self, section)))
+
+    def omitted(self, section: str) -> int:
+        """Entries counted but not listed"""
+        return self.count(section) - len(getattr(self, section))
+
+    def approx_bytes(self) -> int:
+        size = sys.getsizeof(self) + sys.getsizeof(self.id) + sys.getsizeof(self.gender) + sys.getsizeof(self.birthdate)
+        size += sys.getsizeof(self.counts)
+        for section in (self.conditions, self.medications, self.careplans):
+            size += sys.getsizeof(section) + sum(sys.getsizeof(item) for item in section)
+        return size
+
+
+class RecordCache:
+    """
+    Process-wide LRU cache of PatientRecords bounded by approximate memory.
+
+    Entries do not expire on a timer. Instead the cache polls the ingest
+    version stamp (the latest batch id written by the loader) at most every
+    `poll_seconds` and drops only the patients that later batches touched.
+
+    Every invalidation bumps `generation()`. A loader captures it before
+    querying and hands it to `put`, which skips records read before an
+    invalidation that landed while the query was in flight.
+    """
+
+    def __init__(self, max_bytes: int,
+                 read_version: Callable[[], Optional[int]],
+                 read_changed: Callable[[int], Iterable[str]],
+                 poll_seconds: float = 30.0):
+        self.max_bytes = max_bytes
+        self.poll_seconds = poll_seconds
+        self._read_version = read_version
+        self._read_changed = read_changed
+        self._entries: "OrderedDict[str, PatientRecord]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self._generation = 0
+        self._last_poll = 0.0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, pid: str) -> Optional[PatientRecord]:
+        self.sync_version()
+        with self._lock:
+            record = self._entries.get(pid)
+            if record is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(pid)
+            self._stats["hits"] += 1
+            return record
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, record: PatientRecord, generation: Optional[int] = None) -> bool:
+        """Cache a record unless an invalidation ran after `generation` was read"""
+        size = record.approx_bytes()
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._discard(record.id)
+            self._entries[record.id] = record
+            self._sizes[record.id] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self._stats["evictions"] += 1
+        return True
+
+    def invalidate(self, pids: Iterable[str]):
+        with self._lock:
+            # Bumped even for patients not cached yet: their load may be in flight
+            self._generation += 1
+            for pid in pids:
+                if self._discard(pid):
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def sync_version(self, force: bool = False):
+        """Invalidate patients touched by ingest batches newer than the last one seen."""
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.poll_seconds:
+            return
+        self._last_poll = now
+
+        try:
+            latest = self._read_version()
+        except Exception:
+            return
+        if latest is None or latest == self._version:
+            return
+
+        if self._version is None:
+            # First poll: nothing cached predates a known version, start clean.
+            self.clear()
+        else:
+            try:
+                self.invalidate(self._read_changed(self._version))
+            except Exception:
+                self.clear()
+        self._version = latest
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes, version=self._version)
+
+    def _discard(self, pid: str) -> bool:
+        if pid not in self._entries:
+            return False
+        del self._entries[pid]
+        self._bytes -= self._sizes.pop(pid)
+        return True
+
+
+class EnrichmentCache(OrderedDict):
+    """
+    Thread-safe LRU dict of enrichment results holding at most `max_items`
+    entries. Keeps the plain dict interface, so it also works behind the
+    sidecar's DictProxy.
+    """
+
+    def __init__(self, max_items: int = 5000):
+        super().__init__()
+        self.max_items = max_items
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if not super().__contains__(key):
+                return default
+            self.move_to_end(key)
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.max_items:
+                self.popitem(last=False)
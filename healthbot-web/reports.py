@@ -0,0 +1,64 @@
+from datetime import datetime
+from io import BytesIO
+
+## Medical summary PDF generation and upload. reportlab and boto3 are
+## imported on first use to keep them off the app's cold-start path.
+
+def build_pdf(record) -> BytesIO:
+    """Generate professional medical summary PDF"""
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+    from reportlab.lib.pagesizes import letter
+    
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=letter)
+    
+    story = [
+        Paragraph(f"<b>HealthBot AI Pro - Medical Summary Report</b>"),
+        Paragraph(f"<br/>Patient ID: {record['id']}"),
+        Paragraph(f"Demographics: {record['age']}-year-old {record['gender']}"),
+        Paragraph(f"<br/><b>Medical Conditions ({record.count('conditions')}):</b>"),
+    ]
+    
+    # Add conditions
+    for condition in record['conditions']:
+        story.append(Paragraph(f"• {condition}"))
+    if record.omitted('conditions'):
+        story.append(Paragraph(f"+{record.omitted('conditions')} more not shown"))
+    
+    story.extend([
+        Paragraph(f"<br/><b>Current Medications ({record.count('medications')}):</b>"),
+    ])
+    
+    # Add medications
+    for medication in record['medications']:
+        story.append(Paragraph(f"• {medication}"))
+    if record.omitted('medications'):
+        story.append(Paragraph(f"+{record.omitted('medications')} more not shown"))
+    
+    story.extend([
+        Paragraph(f"<br/><b>Active Care Plans ({record.count('careplans')}):</b>"),
+    ])
+    
+    # Add care plans
+    for careplan in record['careplans']:
+        story.append(Paragraph(f"• {careplan}"))
+    if record.omitted('careplans'):
+        story.append(Paragraph(f"+{record.omitted('careplans')} more not shown"))
+    
+    story.extend([
+        Paragraph(f"<br/>Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"),
+        Paragraph(f"<br/><i>This report is for healthcare professional use only.</i>")
+    ])
+    
+    doc.build(story)
+    buf.seek(0)
+    return buf
+
+def upload_report(record, bucket: str) -> str:
+    """Build the PDF, store it in S3 and return its key"""
+    import boto3
+    
+    buf = build_pdf(record)
+    key = f"medical_reports/{record['id']}_{datetime.now().isoformat()}.pdf"
+    boto3.client("s3").upload_fileobj(buf, bucket, key)
+    return key
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+
+from sticky_proxy import run_proxy
+
+## Multi-worker deployment mode.
+##
+## Starts the cache sidecar, N Streamlit workers on loopback ports and the
+## sticky-session proxy on the public port. Every worker gets
+## HEALTHBOT_SIDECAR, so records, enrichment results and the Redshift
+## connection pool are shared instead of duplicated per process, and a fresh
+## random HEALTHBOT_SIDECAR_KEY, so only processes started here can talk to
+## the sidecar.
+##
+## Usage: python serve.py --workers 4 --port 8000
+
+SIDECAR_ADDRESS = os.getenv("HEALTHBOT_SIDECAR", "127.0.0.1:8765")
+FIRST_WORKER_PORT = 8501
+
+
+def start_sidecar(env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "cache_sidecar.py"], env=env)
+
+
+def wait_for_port(address: str, timeout: float = 15.0):
+    host, _, port = address.rpartition(":")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, int(port)), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Cache sidecar did not start on {address}")
+
+
+def start_worker(port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", "application.py",
+            "--server.port", str(port),
+            "--server.address", "127.0.0.1",
+            "--server.headless", "true",
+        ],
+        env=env
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run HealthBot with several Streamlit workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", "2")))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--host", default="0.0.0.0")
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        HEALTHBOT_SIDECAR=SIDECAR_ADDRESS,
+        HEALTHBOT_SIDECAR_KEY=secrets.token_bytes(32).hex()
+    )
+    processes = [start_sidecar(env)]
+    ports = [FIRST_WORKER_PORT + i for i in range(args.workers)]
+
+    try:
+        wait_for_port(SIDECAR_ADDRESS)
+        processes.extend(start_worker(port, env) for port in ports)
+        asyncio.run(run_proxy(args.host, args.port, [("127.0.0.1", port) for port in ports]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key onto one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight block until it finishes and receive the same result (or
+    exception). Nothing is cached once the call completes - pair it with a
+    cache for that. Keys are tuples whose first element names the kind of
+    work, which is how the suppression metrics are grouped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = defaultdict(int)
+        self._suppressed = defaultdict(int)
+
+    def do(self, key: tuple, fn: Callable, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed[key[0]] += 1
+            else:
+                self._suppressed[key[0]] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """{kind: {"executed", "suppressed", "in_flight"}}"""
+        with self._lock:
+            in_flight = defaultdict(int)
+            for key in self._calls:
+                in_flight[key[0]] += 1
+            return {
+                kind: {
+                    "executed": self._executed[kind],
+                    "suppressed": self._suppressed[kind],
+                    "in_flight": in_flight[kind]
+                }
+                for kind in set(self._executed) | set(self._suppressed)
+            }
+
+
+# Shared by every session in this process.
+FLIGHTS = SingleFlight()
@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+from http.cookies import SimpleCookie
+from typing import List, Optional, Tuple
+
+## Minimal sticky-session reverse proxy for multiple Streamlit workers.
+##
+## Streamlit keeps session state inside the worker that owns the websocket,
+## so a browser must keep talking to the same worker across reconnects. The
+## first request on a connection picks a worker (cookie if present, else the
+## least-busy worker) and the response carries a cookie pinning the browser
+## to it. After the request head the connection is piped byte-for-byte, which
+## also covers the websocket upgrade on /_stcore/stream.
+
+COOKIE_NAME = "hb_worker"
+MAX_HEAD_BYTES = 64 * 1024
+
+
+class StickyProxy:
+
+    def __init__(self, backends: List[Tuple[str, int]]):
+        self.backends = backends
+        self.active = [0] * len(backends)
+        self._round_robin = itertools.cycle(range(len(backends)))
+        # asyncio.start_server does not keep its handler tasks alive on its own.
+        self._tasks = set()
+
+    def pick(self, head: bytes) -> Tuple[int, bool]:
+        """Returns (worker index, whether the client already carried a valid cookie)."""
+        pinned = self._cookie_worker(head)
+        if pinned is not None:
+            return pinned, True
+        least = min(self.active)
+        for index in self._round_robin:
+            if self.active[index] == least:
+                return index, False
+
+    def _cookie_worker(self, head: bytes) -> Optional[int]:
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() != b"cookie":
+                continue
+            cookie = SimpleCookie()
+            cookie.load(value.decode("latin-1"))
+            if COOKIE_NAME in cookie and cookie[COOKIE_NAME].value.isdigit():
+                index = int(cookie[COOKIE_NAME].value)
+                if index < len(self.backends):
+                    return index
+        return None
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            await self._proxy(client_reader, client_writer)
+        finally:
+            self._tasks.discard(task)
+
+    async def _proxy(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        index, pinned = self.pick(head)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(*self.backends[index])
+        except OSError:
+            client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+
+        self.active[index] += 1
+        try:
+            upstream_writer.write(head)
+            await upstream_writer.drain()
+            to_upstream = asyncio.ensure_future(self._pipe(client_reader, upstream_writer))
+            # The worker closing its side ends the exchange.
+            await self._pipe_response(upstream_reader, client_writer, None if pinned else index)
+            to_upstream.cancel()
+        finally:
+            self.active[index] -= 1
+            upstream_writer.close()
+            client_writer.close()
+
+    async def _pipe_response(self, reader, writer, set_cookie_for: Optional[int]):
+        if set_cookie_for is not None:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                writer.close()
+                return
+            cookie = f"Set-Cookie: {COOKIE_NAME}={set_cookie_for}; Path=/; HttpOnly; SameSite=Lax\r\n"
+            writer.write(head[:-2] + cookie.encode("latin-1") + b"\r\n")
+        await self._pipe(reader, writer)
+
+    async def _pipe(self, reader, writer):
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if writer.can_write_eof():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+
+
+async def run_proxy(host: str, port: int, backends: List[Tuple[str, int]]):
+    proxy = StickyProxy(backends)
+    server = await asyncio.start_server(proxy.handle, host, port, limit=MAX_HEAD_BYTES)
+    print(f"🔀 Sticky proxy on {host}:{port} → {len(backends)} worker(s)")
+    async with server:
+        await server.serve_forever()
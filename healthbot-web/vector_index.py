@@ -0,0 +1,458 @@
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from embeddings import get_embedder
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+## Local, CPU-only vector index over search snippets.
+##
+## Card enrichment and the agent look here before calling Tavily; only when
+## fewer than VECTOR_MIN_HITS stored passages reach VECTOR_MIN_SIMILARITY do
+## they go to the network, and whatever comes back is added to the index.
+##
+## On disk (HEALTHBOT_VECTOR_DIR):
+##   header.json   embedder name + dimension
+##   vectors.f32   row-major float32 unit vectors, memory-mapped for search
+##   meta.jsonl    one JSON entry per row (kind, key, title, url, content)
+##   ivf.npz       optional IVF centroids + inverted lists from `build`
+## Appends are serialised with a file lock, so the Streamlit workers, the
+## sidecar and the API can share one directory. Rows added after the last
+## IVF build are searched exhaustively until the next build.
+##
+## Usage: python vector_index.py build [--jsonl snippets.jsonl]
+##        python vector_index.py add snippets.jsonl
+##        python vector_index.py query "lisinopril side effects"
+##        python vector_index.py bench --rows 100000 --queries 200
+
+VECTOR_DIR = os.getenv("HEALTHBOT_VECTOR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_index"))
+VECTOR_INDEX_ENABLED = os.getenv("HEALTHBOT_VECTOR_INDEX", "1") == "1"
+MIN_SIMILARITY = float(os.getenv("VECTOR_MIN_SIMILARITY", "0.75"))
+MIN_HITS = int(os.getenv("VECTOR_MIN_HITS", "2"))
+TOP_K = 5
+IVF_MIN_ROWS = 2048
+IVF_PROBES = int(os.getenv("VECTOR_IVF_PROBES", "8"))
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class VectorIndex:
+
+    def __init__(self, directory: str, embedder):
+        self.directory = directory
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._vectors = None
+        self._meta = []
+        self._meta_offset = 0
+        self._keys = set()
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._kind_ids = {}
+        self._ivf_mtime = None
+        self._centroids = None
+        self._lists = None
+        self._ivf_rows = 0
+        self.lookups = {"hits": 0, "misses": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        header_path = self._path("header.json")
+        with self._file_lock():
+            if not os.path.exists(header_path):
+                with open(header_path, "w") as f:
+                    json.dump({"embedder": embedder.name, "dim": self.dim}, f)
+        with open(header_path) as f:
+            header = json.load(f)
+        if header["embedder"] != embedder.name or header["dim"] != self.dim:
+            raise ValueError(
+                f"Index at {directory} was built with {header['embedder']} ({header['dim']}d), "
+                f"not {embedder.name} ({self.dim}d); rebuild it or point HEALTHBOT_VECTOR_DIR elsewhere"
+            )
+        self._refresh()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._path(".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows appended (by this or another process) since the last look"""
+        vectors_path, meta_path = self._path("vectors.f32"), self._path("meta.jsonl")
+        if os.path.exists(meta_path) and os.path.getsize(meta_path) > self._meta_offset:
+            with open(meta_path, "rb") as f:
+                f.seek(self._meta_offset)
+                chunk = f.read()
+            complete = chunk[: chunk.rfind(b"\n") + 1]
+            self._meta_offset += len(complete)
+            new_kinds = []
+            for line in complete.splitlines():
+                entry = json.loads(line)
+                self._meta.append(entry)
+                self._keys.add((entry["kind"], entry["key"]))
+                new_kinds.append(self._kind_ids.setdefault(entry["kind"], len(self._kind_ids)))
+            self._kinds = np.concatenate([self._kinds, np.asarray(new_kinds, dtype=np.int8)])
+
+        stored = os.path.getsize(vectors_path) // (4 * self.dim) if os.path.exists(vectors_path) else 0
+        rows = min(stored, len(self._meta))
+        if rows != self._rows:
+            self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(stored, self.dim)) if rows else None
+            self._rows = rows
+
+        ivf_path = self._path("ivf.npz")
+        mtime = os.path.getmtime(ivf_path) if os.path.exists(ivf_path) else None
+        if mtime != self._ivf_mtime:
+            self._ivf_mtime = mtime
+            self._centroids, self._lists, self._ivf_rows = None, None, 0
+            if mtime is not None:
+                with np.load(ivf_path) as ivf:
+                    offsets = ivf["offsets"]
+                    members = ivf["members"]
+                    self._centroids = ivf["centroids"]
+                    self._lists = [members[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+                    self._ivf_rows = int(ivf["rows"])
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def add(self, entries: list) -> int:
+        """Append entries ({kind, key, text, ...}) not already indexed; returns how many were added"""
+        with self._lock:
+            self._refresh()
+            fresh, seen = [], set()
+            for entry in entries:
+                identity = (entry["kind"], entry["key"])
+                if identity not in self._keys and identity not in seen:
+                    seen.add(identity)
+                    fresh.append(entry)
+            if not fresh:
+                return 0
+
+            vectors = self.embedder.embed([entry["text"] for entry in fresh]).astype(np.float32)
+            lines = b"".join(
+                (json.dumps({k: v for k, v in entry.items() if k != "text"}) + "\n").encode("utf-8")
+                for entry in fresh
+            )
+            # Both files are appended under one lock so their row counts stay aligned
+            with self._file_lock():
+                with open(self._path("vectors.f32"), "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self._path("meta.jsonl"), "ab") as f:
+                    f.write(lines)
+            self._refresh()
+            return len(fresh)
+
+    def _candidates(self):
+        """Row ids to score exhaustively when there is no IVF (or beyond its coverage)"""
+        return np.arange(self._ivf_rows, self._rows)
+
+    def search_vector(self, query: np.ndarray, k: int = TOP_K, kind: str = None, probes: int = IVF_PROBES) -> list:
+        """[(similarity, row)] best first"""
+        if self._rows == 0:
+            return []
+        if self._centroids is not None and probes:
+            nearest = np.argsort(self._centroids @ query)[::-1][:probes]
+            rows = np.sort(np.concatenate([self._lists[i] for i in nearest] + [self._candidates()]))
+            scores = self._vectors[rows] @ query
+        else:
+            rows = np.arange(self._rows)
+            scores = self._vectors[: self._rows] @ query
+
+        if kind is not None:
+            kind_id = self._kind_ids.get(kind)
+            if kind_id is None:
+                return []
+            keep = self._kinds[rows] == kind_id
+            rows, scores = rows[keep], scores[keep]
+        if len(rows) == 0:
+            return []
+
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(rows[i])) for i in top]
+
+    def search(self, text: str, k: int = TOP_K, kind: str = None) -> list:
+        """[(similarity, entry)] best first"""
+        with self._lock:
+            self._refresh()
+            query = self.embedder.embed([text])[0]
+            return [(score, self._meta[row]) for score, row in self.search_vector(query, k, kind)]
+
+    def build_ivf(self, n_lists: int = None, iterations: int = 12, seed: int = 0) -> int:
+        """k-means centroids + inverted lists over every current row; returns the list count"""
+        with self._lock:
+            self._refresh()
+            rows = self._rows
+            if rows < IVF_MIN_ROWS:
+                if os.path.exists(self._path("ivf.npz")):
+                    os.remove(self._path("ivf.npz"))
+                self._refresh()
+                return 0
+
+            vectors = self._vectors[:rows]
+            n_lists = n_lists or int(np.sqrt(rows))
+            centroids = train_centroids(vectors, n_lists, iterations, seed)
+            assignments = assign(vectors, centroids)
+            order = np.argsort(assignments, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, centroids=centroids, members=order, offsets=offsets, rows=np.int64(rows))
+            os.replace(tmp_path, self._path("ivf.npz"))
+            self._refresh()
+            return n_lists
+
+    def count_lookup(self, hit: bool):
+        with self._lock:
+            self.lookups["hits" if hit else "misses"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.lookups["hits"], self.lookups["misses"]
+            return {
+                "rows": self._rows,
+                "ivf_lists": len(self._lists) if self._lists is not None else 0,
+                "unindexed_rows": self._rows - self._ivf_rows,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+            }
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, iterations: int, seed: int) -> np.ndarray:
+    """Spherical k-means on a sample of at most 64 points per list"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False))]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), chunk)
+    ])
+
+
+@lru_cache(maxsize=None)
+def get_index():
+    """Process-wide index, or None when disabled or unusable"""
+    if not VECTOR_INDEX_ENABLED:
+        return None
+    try:
+        return VectorIndex(VECTOR_DIR, get_embedder())
+    except Exception as e:
+        print(f"❌ Vector index unavailable: {e}")
+        return None
+
+
+# =============================
+# Retrieval helpers used by enrichment.py and agent.py
+# =============================
+
+def normalize_query(query: str) -> str:
+    """Lower-case words only, so casing and punctuation do not change the key or the vector"""
+    return " ".join(_WORD.findall(query.lower()))
+
+
+def snippet_entries(query: str, results, subject: str = None) -> list:
+    """Tavily results -> index entries (string/error results are not indexed)
+
+    Entries are embedded on what the lookup embeds, so a repeated question
+    scores ~1.0 against its own results: `subject` (an item name wrapped in a
+    fixed query template) with the title, or the normalized agent query alone.
+    Page content is stored but not embedded - it pulled similar questions
+    apart instead of together.
+    """
+    if not isinstance(results, list):
+        return []
+    normalized = normalize_query(query)
+    entries = []
+    for result in results:
+        if not isinstance(result, dict) or not result.get("url"):
+            continue
+        title = result.get("title", "")
+        entries.append({
+            "kind": "snippet",
+            "key": f"{subject or normalized}\n{result['url']}",
+            "subject": subject,
+            "text": f"{subject}\n{title}" if subject else normalized,
+            "query": query,
+            "title": title,
+            "url": result["url"],
+            "content": result.get("content") or result.get("snippet") or ""
+        })
+    return entries
+
+
+def retrieve(query: str, kind: str = None, subject: str = None):
+    """Stored passages in Tavily's result format, or None if the index has too few close matches
+
+    With `subject`, only passages stored for exactly that subject count: a
+    close embedding alone does not stop "Amlodipine" from matching pages
+    about Lisinopril, or stage 1 CKD from matching stage 3.
+    """
+    index = get_index()
+    if index is None:
+        return None
+    candidates = index.search(subject or normalize_query(query), k=TOP_K * 4 if subject else TOP_K, kind=kind)
+    hits = [
+        (score, entry) for score, entry in candidates
+        if score >= MIN_SIMILARITY and (subject is None or entry.get("subject") == subject)
+    ][:TOP_K]
+    if len(hits) < MIN_HITS:
+        index.count_lookup(hit=False)
+        return None
+    index.count_lookup(hit=True)
+    return [
+        {"title": entry["title"], "url": entry["url"], "content": entry["content"], "score": round(score, 3), "source": "local index"}
+        for score, entry in hits
+    ]
+
+
+def remember(entries: list):
+    index = get_index()
+    if index is None or not entries:
+        return
+    try:
+        index.add(entries)
+    except Exception as e:
+        print(f"❌ Could not add to vector index: {e}")
+
+
+def stats() -> dict:
+    index = get_index()
+    return index.stats() if index is not None else {}
+
+
+# =============================
+# Command line: build / add / query / bench
+# =============================
+
+def read_jsonl(path: str) -> list:
+    """Lines of {"query", "results": [tavily results]} or ready-made index entries"""
+    entries = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if "results" in row:
+                entries.extend(snippet_entries(row.get("query", ""), row["results"]))
+            else:
+                entries.append(row)
+    return entries
+
+
+def bench(rows: int, queries: int, k: int, dim: int):
+    """Synthetic clustered vectors: flat vs IVF latency and IVF recall@k"""
+    class RandomEmbedder:
+        name = f"bench-{dim}"
+
+        def __init__(self):
+            self.dim = dim
+
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(max(16, rows // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=rows)] + 0.6 * rng.normal(size=(rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    probes = vectors[rng.integers(rows, size=queries)] + 0.2 * rng.normal(size=(queries, dim)).astype(np.float32)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "vectors.f32"), "wb") as f:
+            f.write(vectors.tobytes())
+        with open(os.path.join(directory, "meta.jsonl"), "w") as f:
+            f.writelines(f'{{"kind": "bench", "key": "{i}"}}\n' for i in range(rows))
+        index = VectorIndex(directory, RandomEmbedder())
+
+        started = time.perf_counter()
+        lists = index.build_ivf()
+        build_seconds = time.perf_counter() - started
+
+        def timed(probe_count):
+            results, latencies = [], []
+            for query in probes:
+                started = time.perf_counter()
+                results.append({row for _, row in index.search_vector(query, k, probes=probe_count)})
+                latencies.append(time.perf_counter() - started)
+            return results, np.percentile(latencies, [50, 95]) * 1000
+
+        exact, flat_ms = timed(0)
+        print(f"rows={rows} dim={dim} ivf_lists={lists} build={build_seconds:.2f}s")
+        print(f"{'mode':<14} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(k):>10}")
+        print(f"{'flat':<14} {flat_ms[0]:>8.2f} {flat_ms[1]:>8.2f} {1.0:>10.3f}")
+        for probe_count in (1, 4, 8, 16):
+            if not lists or probe_count > lists:
+                continue
+            approx, ivf_ms = timed(probe_count)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+            print(f"{'ivf/' + str(probe_count):<14} {ivf_ms[0]:>8.2f} {ivf_ms[1]:>8.2f} {recall:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the HealthBot local vector index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="add sources, then (re)build the IVF lists")
+    build_cmd.add_argument("--jsonl", nargs="*", default=[])
+    build_cmd.add_argument("--lists", type=int)
+    add_cmd = commands.add_parser("add", help="append entries without rebuilding")
+    add_cmd.add_argument("paths", nargs="+")
+    query_cmd = commands.add_parser("query")
+    query_cmd.add_argument("text")
+    query_cmd.add_argument("--kind")
+    bench_cmd = commands.add_parser("bench")
+    bench_cmd.add_argument("--rows", type=int, default=100_000)
+    bench_cmd.add_argument("--queries", type=int, default=200)
+    bench_cmd.add_argument("--k", type=int, default=TOP_K)
+    bench_cmd.add_argument("--dim", type=int, default=get_embedder().dim)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.rows, args.queries, args.k, args.dim)
+        return
+
+    index = VectorIndex(VECTOR_DIR, get_embedder())
+    if args.command in ("build", "add"):
+        paths = args.jsonl if args.command == "build" else args.paths
+        entries = [entry for path in paths for entry in read_jsonl(path)]
+        print(f"✅ Added {index.add(entries)} of {len(entries)} entries ({len(index)} rows)")
+        if args.command == "build":
+            lists = index.build_ivf(args.lists)
+            print(f"✅ IVF lists: {lists}" if lists else f"ℹ️ Under {IVF_MIN_ROWS} rows, searching exhaustively")
+    elif args.command == "query":
+        for score, entry in index.search(args.text, kind=args.kind):
+            print(f"{score:.3f}  [{entry['kind']}] {entry.get('title', '')}  {entry.get('url', '')}")
+
+
+if __name__ == "__main__":
+    main()
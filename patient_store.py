@@ -0,0 +1,240 @@
+import json
+import os
+import pickle
+import sys
+from collections import namedtuple
+
+# Columnar observation storage and token counting are shared with the web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "healthbot-web"))
+import observations
+from context_budget import count_tokens
+from observations import ObservationSeries
+
+## In-memory patient store for the LangGraph CLI (test-models.py).
+##
+## Loads the structured documents written by structured_data_upload.py
+## ({"patient", "conditions", "medications", "observations", "careplans"},
+## one per .json file or one per line in NDJSON) from a local folder or an
+## s3://bucket/prefix, and indexes them by (patient_id, birthDate). Records are
+## parsed once into tuples of namedtuples with interned strings, so tools and
+## graph nodes share the same objects instead of passing JSON around.
+## Observations - by far the largest section - are held as a columnar
+## ObservationSeries (~24 bytes per reading instead of a tuple of objects).
+##
+## Snapshots are pickles: loading one runs whatever code it contains, so only
+## point --snapshot / HEALTHBOT_PATIENT_SNAPSHOT at files this tool wrote on a
+## machine you control, never at downloaded or shared files.
+##
+## Usage: python patient_store.py s3://structuredhealthbotdata/structured/ --snapshot patients.pkl
+##        python patient_store.py fhir_structured/ <patient_id> <birth_date>
+
+# Coding fields default to None so snapshots pickled before they existed still load
+Condition = namedtuple("Condition", "code description onset clinical_status code_system", defaults=(None,))
+Medication = namedtuple("Medication", "medication authored_on code code_system", defaults=(None, None))
+CarePlan = namedtuple("CarePlan", "description status code code_system", defaults=(None, None))
+
+# Token budget for the record text the LLM sees through get_patient_data
+RECORD_TEXT_TOKENS = int(os.getenv("RECORD_TEXT_TOKENS", "1500"))
+
+
+def _text(value):
+    """Intern repeated strings (descriptions, units, statuses); flatten CodeableConcepts"""
+    if isinstance(value, dict):
+        coding = value.get("coding") or [{}]
+        value = value.get("text") or coding[0].get("code") or coding[0].get("display")
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class EhrRecord:
+    __slots__ = ("id", "gender", "birth_date", "deceased", "conditions", "medications", "observations", "careplans")
+
+    def __init__(self, id, gender, birth_date, deceased, conditions, medications, observations, careplans):
+        self.id = id
+        self.gender = gender
+        self.birth_date = birth_date
+        self.deceased = deceased
+        self.conditions = conditions
+        self.medications = medications
+        self.observations = observations
+        self.careplans = careplans
+
+    @classmethod
+    def from_document(cls, document: dict):
+        patient = document.get("patient") or {}
+        return cls(
+            id=patient.get("id"),
+            gender=_text(patient.get("gender")),
+            birth_date=patient.get("birthDate"),
+            deceased=patient.get("deceasedDateTime"),
+            conditions=tuple(
+                Condition(
+                    _text(c.get("code")), _text(c.get("description")), c.get("onset"), _text(c.get("clinicalStatus")),
+                    _text(c.get("codeSystem"))
+                )
+                for c in document.get("conditions", [])
+            ),
+            medications=tuple(
+                Medication(_text(m.get("medication")), m.get("authoredOn"), _text(m.get("code")), _text(m.get("codeSystem")))
+                for m in document.get("medications", [])
+            ),
+            observations=ObservationSeries.from_records(document.get("observations", [])),
+            careplans=tuple(
+                CarePlan(_text(c.get("description")), _text(c.get("status")), _text(c.get("code")), _text(c.get("codeSystem")))
+                for c in document.get("careplans", [])
+            )
+        )
+
+    def summary(self) -> str:
+        """Short text the LLM sees instead of the whole record"""
+        return (
+            f"Patient {self.id}: {self.gender}, born {self.birth_date}. "
+            f"{len(self.conditions)} condition(s), {len(self.medications)} medication(s), "
+            f"{len(self.observations)} observation(s), {len(self.careplans)} care plan(s)."
+        )
+
+    def sections(self) -> list:
+        """(title, lines) for every section, in the order the LLM sees them"""
+        return [
+            ("Conditions", [
+                f"{c.description} (onset {(c.onset or 'unknown')[:10]}, {c.clinical_status or 'status unknown'})"
+                for c in self.conditions
+            ]),
+            ("Medications", [f"{m.medication} (prescribed {(m.authored_on or 'unknown')[:10]})" for m in self.medications]),
+            ("Care plans", [f"{c.description} ({c.status or 'status unknown'})" for c in self.careplans]),
+            ("Latest observations", [observations.describe(s) for s in observations.summarize(self.observations)]),
+        ]
+
+    def details(self, max_tokens: int = RECORD_TEXT_TOKENS) -> str:
+        """
+        The record as text for the LLM, cut to max_tokens. Small sections are
+        kept whole and the rest of the budget is shared evenly by the larger
+        ones; entries that do not fit are counted rather than listed.
+        """
+        header = self.summary()
+        sections = [(title, [f"- {line}" for line in lines]) for title, lines in self.sections()]
+        needed = [count_tokens(title) + 2 + sum(count_tokens(line) + 1 for line in lines) for title, lines in sections]
+
+        shares, remaining = {}, max_tokens - count_tokens(header)
+        for served, position in enumerate(sorted(range(len(sections)), key=lambda i: needed[i])):
+            shares[position] = min(needed[position], remaining // (len(sections) - served))
+            remaining -= shares[position]
+
+        blocks = [header]
+        for position, (title, lines) in enumerate(sections):
+            used, kept = count_tokens(title) + 2, []
+            for line in lines:
+                cost = count_tokens(line) + 1
+                if used + cost > shares[position]:
+                    break
+                kept.append(line)
+                used += cost
+            if len(kept) < len(lines):
+                # the marker itself may spill a few tokens past the share
+                kept.append(f"- (+{len(lines) - len(kept)} more not shown)")
+            blocks.append(f"{title}:\n" + ("\n".join(kept) or "- None documented"))
+        return "\n\n".join(blocks)
+
+
+class PatientStore:
+
+    def __init__(self, records=()):
+        self._by_key = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: EhrRecord):
+        if record.id and record.birth_date:
+            self._by_key[(record.id, record.birth_date)] = record
+
+    def get(self, key, default=None):
+        """Record for (patient_id, dob); same call shape as the dict it replaces"""
+        return self._by_key.get(key, default)
+
+    def lookup(self, lookup_key: str):
+        """Record for a 'patient_id|dob' key string, or None"""
+        pid, _, dob = lookup_key.partition("|")
+        return self._by_key.get((pid.strip(), dob.strip()))
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump(list(self._by_key.values()), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_snapshot(cls, path: str):
+        """Trusted input only: a snapshot is a pickle, and unpickling can run arbitrary code"""
+        with open(path, "rb") as f:
+            return cls(pickle.load(f))
+
+
+def parse_documents(text: str):
+    """One JSON document, or NDJSON with one document per line"""
+    text = text.strip()
+    if not text:
+        return
+    try:
+        yield json.loads(text)
+        return
+    except ValueError:
+        pass
+    for line in text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_local(folder: str):
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.endswith((".json", ".ndjson", ".jsonl")):
+                with open(os.path.join(root, name)) as f:
+                    yield from parse_documents(f.read())
+
+
+def iter_s3(uri: str):
+    import boto3
+    bucket, _, prefix = uri[len("s3://"):].partition("/")
+    s3 = boto3.client("s3")
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith((".json", ".ndjson", ".jsonl")):
+                body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read().decode("utf-8")
+                yield from parse_documents(body)
+
+
+def load_patient_store(source: str, snapshot: str = None) -> PatientStore:
+    """Build the store from a folder or s3:// prefix, reusing a pickle snapshot if one exists"""
+    if snapshot and os.path.exists(snapshot):
+        return PatientStore.from_snapshot(snapshot)
+
+    documents = iter_s3(source) if source.startswith("s3://") else iter_local(source)
+    store = PatientStore()
+    for document in documents:
+        try:
+            store.add(EhrRecord.from_document(document))
+        except Exception as e:
+            print(f"❌ Skipping unreadable patient document: {e}")
+    print(f"✅ Loaded {len(store)} patients from {source}")
+
+    if snapshot:
+        store.save(snapshot)
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load structured patient documents into the CLI store")
+    parser.add_argument("source")
+    parser.add_argument("patient_id", nargs="?")
+    parser.add_argument("birth_date", nargs="?")
+    parser.add_argument("--snapshot")
+    args = parser.parse_args()
+
+    # Import by name so a snapshot pickles patient_store.EhrRecord, not __main__.EhrRecord
+    import patient_store
+    store = patient_store.load_patient_store(args.source, args.snapshot)
+    if args.patient_id:
+        record = store.get((args.patient_id, args.birth_date))
+        print(record.summary() if record else "No patient found with that ID and date of birth.")
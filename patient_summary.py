@@ -0,0 +1,130 @@
+import os
+import sys
+
+import psycopg2
+
+from redshift_schema import PATIENT_SUMMARY_DDL
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "healthbot-web"))
+from patient_records import SUMMARY_DELIMITER
+
+# LISTAGG fails the whole statement once a value passes VARCHAR(65535), so each
+# aggregated column keeps at most this many distinct values (source columns are
+# VARCHAR(512): 120 * 513 bytes stays under the limit). Counts stay exact: the
+# app shows "+N more" for cut-short conditions and care plans, and reads a
+# cut-short medication list in full (see patient_records.py).
+SUMMARY_MAX_VALUES = 120
+
+# Age is not stored: it is derived from birthdate when the row is read, so it
+# never goes stale for patients who are not re-ingested.
+SUMMARY_COLUMNS = (
+    "id, gender, birthdate, conditions, condition_count, medications, medication_count, "
+    "careplans, careplan_count, refreshed_at"
+)
+
+# Distinct values per patient, ranked so LISTAGG only sees the first SUMMARY_MAX_VALUES
+_RANKED_VALUES = """
+    SELECT patient_id, value,
+           ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY value) AS value_rank
+    FROM (SELECT DISTINCT patient_id, {column} AS value FROM {table} WHERE {column} IS NOT NULL {child_scope}) d
+"""
+
+_SUMMARY_SELECT = """
+SELECT p.id,
+       p.gender,
+       p.birthdate,
+       c.conditions,
+       COALESCE(c.condition_count, 0),
+       m.medications,
+       COALESCE(m.medication_count, 0),
+       cp.careplans,
+       COALESCE(cp.careplan_count, 0),
+       GETDATE()
+FROM patients p
+LEFT JOIN (
+    SELECT patient_id,
+           LISTAGG(CASE WHEN value_rank <= {cap} THEN value END, '{delim}') WITHIN GROUP (ORDER BY value) AS conditions,
+           COUNT(*) AS condition_count
+    FROM ({ranked_conditions}) r
+    GROUP BY patient_id
+) c ON c.patient_id = p.id
+LEFT JOIN (
+    SELECT patient_id,
+           LISTAGG(CASE WHEN value_rank <= {cap} THEN value END, '{delim}') WITHIN GROUP (ORDER BY value) AS medications,
+           COUNT(*) AS medication_count
+    FROM ({ranked_medications}) r
+    GROUP BY patient_id
+) m ON m.patient_id = p.id
+LEFT JOIN (
+    SELECT patient_id,
+           LISTAGG(CASE WHEN value_rank <= {cap} THEN value END, '{delim}') WITHIN GROUP (ORDER BY value) AS careplans,
+           COUNT(*) AS careplan_count
+    FROM ({ranked_careplans}) r
+    GROUP BY patient_id
+) cp ON cp.patient_id = p.id
+{patient_scope}
+"""
+
+
+def build_refresh_sql(scope_table: str = None) -> list:
+    """
+    Returns the statements that rebuild patient_summary rows. With a scope
+    table (one patient_id column) only those patients are rebuilt; without
+    one the whole table is recomputed.
+    """
+    if scope_table:
+        child_scope = f"AND patient_id IN (SELECT patient_id FROM {scope_table})"
+        patient_scope = f"WHERE p.id IN (SELECT patient_id FROM {scope_table})"
+        delete = f"DELETE FROM patient_summary WHERE id IN (SELECT patient_id FROM {scope_table});"
+    else:
+        child_scope = ""
+        patient_scope = ""
+        delete = "DELETE FROM patient_summary;"
+
+    ranked = {
+        f"ranked_{table}": _RANKED_VALUES.format(column=column, table=table, child_scope=child_scope)
+        for table, column in (("conditions", "description"), ("medications", "medication"), ("careplans", "description"))
+    }
+    insert = f"INSERT INTO patient_summary ({SUMMARY_COLUMNS}) " + _SUMMARY_SELECT.format(
+        delim=SUMMARY_DELIMITER,
+        cap=SUMMARY_MAX_VALUES,
+        patient_scope=patient_scope,
+        **ranked
+    ) + ";"
+    return [delete, insert]
+
+
+def refresh_summary_rows(cur, scope_table: str = None) -> int:
+    """
+    Rebuilds patient_summary rows on an open cursor, inside the caller's
+    transaction, and returns the number of rows written.
+    """
+    cur.execute(PATIENT_SUMMARY_DDL)
+    delete, insert = build_refresh_sql(scope_table)
+    cur.execute(delete)
+    cur.execute(insert)
+    return cur.rowcount
+
+
+def refresh_patient_summary(conn, scope_table: str = None) -> int:
+    """
+    Refreshes patient_summary inside a single transaction and returns the
+    number of rows written.
+    """
+    with conn:
+        with conn.cursor() as cur:
+            written = refresh_summary_rows(cur, scope_table)
+    print(f"✅ Refreshed patient_summary ({written} rows)")
+    return written
+
+
+if __name__ == "__main__":
+    from redshift_loader import get_connection
+
+    conn = get_connection()
+    try:
+        refresh_patient_summary(conn)
+    except psycopg2.Error as e:
+        print(f"❌ Full refresh failed: {e}")
+    finally:
+        conn.close()
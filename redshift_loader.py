@@ -0,0 +1,172 @@
+import json
+import os
+import time
+import boto3
+import psycopg2
+
+from patient_summary import refresh_summary_rows
+from redshift_schema import create_tables
+
+## Loads the flattened NDJSON outputs from S3 into Redshift and refreshes
+## patient_summary for every patient touched by the batch.
+##
+## A batch is the set of source files with flattened output written since the
+## previous batch: each table gets a COPY manifest (under manifests/<batch_id>/)
+## listing only those files, so patients whose files did not change are not
+## deleted, re-inserted, refreshed or stamped again.
+
+REGION = os.getenv("AWS_REGION", "us-east-1")
+WORKGROUP_NAME = os.getenv("WORKGROUP_NAME", "healthbot-data")
+REDSHIFT_HOST = os.getenv(
+    "REDSHIFT_HOST", "healthbot-data.692859942702.us-east-1.redshift-serverless.amazonaws.com"
+)
+REDSHIFT_PORT = int(os.getenv("REDSHIFT_PORT", "5439"))
+REDSHIFT_DB = os.getenv("REDSHIFT_DB", "healthbot")
+IAM_ROLE_ARN = os.getenv("IAM_ROLE_ARN", "")
+MANIFEST_PREFIX = "manifests/"
+
+# table -> (S3 prefix, column that holds the owning patient id)
+LOAD_SOURCES = {
+    "patients": ("flattened_patients/", "id"),
+    "conditions": ("flattened_conditions/", "patient_id"),
+    "medications": ("flattened_medications/", "patient_id"),
+    "careplans": ("flattened_careplans/", "patient_id"),
+    "observations": ("flattened_observations/", "patient_id"),
+}
+
+
+def get_connection():
+    creds = boto3.client("redshift-serverless", region_name=REGION).get_credentials(
+        workgroupName=WORKGROUP_NAME, durationSeconds=900
+    )
+    return psycopg2.connect(
+        host=REDSHIFT_HOST,
+        port=REDSHIFT_PORT,
+        database=REDSHIFT_DB,
+        user=creds["dbUser"],
+        password=creds["dbPassword"],
+        sslmode="require",
+        connect_timeout=10
+    )
+
+
+def list_outputs(s3, bucket: str, prefix: str) -> dict:
+    """File name -> last-modified epoch ms for every flattened file under `prefix`"""
+    outputs = {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            outputs[obj["Key"][len(prefix):]] = int(obj["LastModified"].timestamp() * 1000)
+    return outputs
+
+
+def batch_files(s3, bucket: str, sources: dict, since_ms: int, until_ms: int) -> dict:
+    """
+    table -> keys to load. The flatteners name every output after its source
+    file, so a source with any output written in (since_ms, until_ms] is
+    loaded from every prefix: each touched patient is then replaced with all
+    of their lists, including ones that came out empty or did not change.
+    """
+    outputs = {table: list_outputs(s3, bucket, prefix) for table, (prefix, _) in sources.items()}
+    names = {
+        name
+        for listing in outputs.values()
+        for name, modified_ms in listing.items()
+        if since_ms < modified_ms <= until_ms
+    }
+    return {
+        table: [prefix + name for name in sorted(names) if name in outputs[table]]
+        for table, (prefix, _) in sources.items()
+    }
+
+
+def write_manifest(s3, bucket: str, batch_id: int, table: str, keys: list) -> str:
+    """COPY manifest listing exactly this batch's files for one table; returns its s3:// URL"""
+    key = f"{MANIFEST_PREFIX}{batch_id}/{table}.manifest"
+    body = {"entries": [{"url": f"s3://{bucket}/{k}", "mandatory": True} for k in keys]}
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(body).encode("utf-8"))
+    return f"s3://{bucket}/{key}"
+
+
+def stage_table(cur, table: str, manifest_url: str = None):
+    """COPY one manifest into a session-local staging table shaped like `table` (left empty without one)."""
+    cur.execute(f"CREATE TEMP TABLE stage_{table} (LIKE {table});")
+    if manifest_url:
+        cur.execute(
+            f"COPY stage_{table} FROM %s IAM_ROLE %s FORMAT AS JSON 'auto ignorecase' MANIFEST;",
+            (manifest_url, IAM_ROLE_ARN)
+        )
+
+
+def previous_batch_id(cur) -> int:
+    cur.execute("SELECT COALESCE(MAX(batch_id), 0) FROM ingest_batches;")
+    return int(cur.fetchone()[0])
+
+
+def record_batch(cur, batch_id: int) -> int:
+    """Writes the version stamp the web app's record cache polls for invalidation."""
+    cur.execute(
+        "INSERT INTO ingest_batch_patients (batch_id, patient_id) SELECT %s, patient_id FROM batch_patients;",
+        (batch_id,)
+    )
+    cur.execute("SELECT COUNT(*) FROM batch_patients;")
+    touched_count = cur.fetchone()[0]
+    cur.execute(
+        "INSERT INTO ingest_batches (batch_id, patient_count) VALUES (%s, %s);",
+        (batch_id, touched_count)
+    )
+    return touched_count
+
+
+def load_batch(conn, bucket: str, sources: dict = LOAD_SOURCES, s3=None) -> int:
+    """
+    Stages the files written since the previous batch, replaces the rows of
+    the patients they cover, rebuilds those patients' patient_summary rows
+    and stamps the batch, all in one transaction, so a failure anywhere
+    leaves the tables and the summary as they were. Returns the number of
+    patients touched.
+    """
+    s3 = s3 or boto3.client("s3", region_name=REGION)
+    batch_id = int(time.time() * 1000)
+    with conn:
+        with conn.cursor() as cur:
+            since = previous_batch_id(cur)
+            # Files written while this batch runs carry a later timestamp and go to the next one
+            files = batch_files(s3, bucket, sources, since, batch_id)
+            if not any(files.values()):
+                print(f"ℹ️ No flattened files written since batch {since}; nothing to load")
+                return 0
+
+            for table, keys in files.items():
+                stage_table(cur, table, write_manifest(s3, bucket, batch_id, table, keys) if keys else None)
+
+            touched = " UNION ".join(
+                f"SELECT {key} AS patient_id FROM stage_{table}"
+                for table, (_, key) in sources.items()
+            )
+            cur.execute(f"CREATE TEMP TABLE batch_patients AS {touched};")
+
+            # Each flattened file carries a patient's full list, so replace by patient.
+            for table, (_, key) in sources.items():
+                cur.execute(
+                    f"DELETE FROM {table} WHERE {key} IN (SELECT patient_id FROM batch_patients);"
+                )
+                cur.execute(f"INSERT INTO {table} SELECT * FROM stage_{table};")
+
+            written = refresh_summary_rows(cur, scope_table="batch_patients")
+
+            # The stamp commits together with the refreshed summary rows, so
+            # readers never re-cache rows from before the refresh.
+            touched_count = record_batch(cur, batch_id)
+    print(f"✅ Refreshed patient_summary ({written} rows)")
+    print(f"✅ Loaded batch {batch_id} from {sum(map(len, files.values()))} file(s) in s3://{bucket} ({touched_count} patients)")
+    return touched_count
+
+
+if __name__ == "__main__":
+    bucket_name = "structuredhealthbotdata"
+    conn = get_connection()
+    try:
+        create_tables(conn)
+        load_batch(conn, bucket_name)
+    finally:
+        conn.close()
@@ -0,0 +1,263 @@
+import re
+import sys
+import time
+
+## Table design for the HealthBot Redshift tables.
+##
+## Every app query is a point lookup on the patient key (`patients.id`,
+## `<child>.patient_id`), so all tables are distributed and sorted on it:
+## rows for one patient live on a single slice, lookups hit one block range
+## through zone maps, and joins between the tables stay collocated.
+## Sort key columns stay RAW so zone maps remain effective; everything else
+## is compressed (AZ64 for numeric/temporal, ZSTD for text).
+
+PATIENTS_DDL = """
+CREATE TABLE IF NOT EXISTS patients (
+    id               VARCHAR(64)  NOT NULL ENCODE RAW,
+    gender           VARCHAR(16)  ENCODE ZSTD,
+    birthdate        DATE         ENCODE AZ64,
+    deceaseddatetime TIMESTAMP    ENCODE AZ64,
+    PRIMARY KEY (id)
+)
+DISTSTYLE KEY
+DISTKEY (id)
+SORTKEY (id);
+"""
+
+CONDITIONS_DDL = """
+CREATE TABLE IF NOT EXISTS conditions (
+    code           VARCHAR(32)   ENCODE ZSTD,
+    description    VARCHAR(512)  ENCODE ZSTD,
+    onset          TIMESTAMP     ENCODE AZ64,
+    clinicalstatus VARCHAR(32)   ENCODE ZSTD,
+    patient_id     VARCHAR(64)   NOT NULL ENCODE RAW,
+    codesystem     VARCHAR(64)   ENCODE ZSTD
+)
+DISTSTYLE KEY
+DISTKEY (patient_id)
+SORTKEY (patient_id);
+"""
+
+MEDICATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS medications (
+    medication VARCHAR(512) ENCODE ZSTD,
+    authoredon TIMESTAMP    ENCODE AZ64,
+    patient_id VARCHAR(64)  NOT NULL ENCODE RAW,
+    code       VARCHAR(32)  ENCODE ZSTD,
+    codesystem VARCHAR(64)  ENCODE ZSTD
+)
+DISTSTYLE KEY
+DISTKEY (patient_id)
+SORTKEY (patient_id);
+"""
+
+CAREPLANS_DDL = """
+CREATE TABLE IF NOT EXISTS careplans (
+    description VARCHAR(512) ENCODE ZSTD,
+    status      VARCHAR(32)  ENCODE ZSTD,
+    patient_id  VARCHAR(64)  NOT NULL ENCODE RAW,
+    code        VARCHAR(32)  ENCODE ZSTD,
+    codesystem  VARCHAR(64)  ENCODE ZSTD
+)
+DISTSTYLE KEY
+DISTKEY (patient_id)
+SORTKEY (patient_id);
+"""
+
+# Vitals and labs are read as a per-patient time series, so the sort key adds
+# the timestamp: one patient's history is a contiguous, already-ordered range.
+OBSERVATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS observations (
+    type              VARCHAR(256)     ENCODE ZSTD,
+    value             DOUBLE PRECISION ENCODE ZSTD,
+    unit              VARCHAR(32)      ENCODE ZSTD,
+    effectivedatetime TIMESTAMP        ENCODE RAW,
+    patient_id        VARCHAR(64)      NOT NULL ENCODE RAW
+)
+DISTSTYLE KEY
+DISTKEY (patient_id)
+COMPOUND SORTKEY (patient_id, effectivedatetime);
+"""
+
+PATIENT_SUMMARY_DDL = """
+CREATE TABLE IF NOT EXISTS patient_summary (
+    id               VARCHAR(64)    NOT NULL ENCODE RAW,
+    gender           VARCHAR(16)    ENCODE ZSTD,
+    birthdate        DATE           ENCODE AZ64,
+    conditions       VARCHAR(65535) ENCODE ZSTD,
+    condition_count  INTEGER        NOT NULL DEFAULT 0 ENCODE AZ64,
+    medications      VARCHAR(65535) ENCODE ZSTD,
+    medication_count INTEGER        NOT NULL DEFAULT 0 ENCODE AZ64,
+    careplans        VARCHAR(65535) ENCODE ZSTD,
+    careplan_count   INTEGER        NOT NULL DEFAULT 0 ENCODE AZ64,
+    refreshed_at     TIMESTAMP      NOT NULL DEFAULT GETDATE() ENCODE AZ64,
+    PRIMARY KEY (id)
+)
+DISTSTYLE KEY
+DISTKEY (id)
+SORTKEY (id);
+"""
+
+# Version stamps written by the loader. The web app polls MAX(batch_id) and
+# invalidates cached records for the patients listed under newer batches.
+INGEST_BATCHES_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_batches (
+    batch_id      BIGINT    NOT NULL ENCODE RAW,
+    loaded_at     TIMESTAMP NOT NULL DEFAULT GETDATE() ENCODE AZ64,
+    patient_count INTEGER   ENCODE AZ64,
+    PRIMARY KEY (batch_id)
+)
+DISTSTYLE ALL
+SORTKEY (batch_id);
+"""
+
+INGEST_BATCH_PATIENTS_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_batch_patients (
+    batch_id   BIGINT      NOT NULL ENCODE RAW,
+    patient_id VARCHAR(64) NOT NULL ENCODE ZSTD
+)
+DISTSTYLE EVEN
+SORTKEY (batch_id);
+"""
+
+TABLE_DDL = {
+    "patients": PATIENTS_DDL,
+    "conditions": CONDITIONS_DDL,
+    "medications": MEDICATIONS_DDL,
+    "careplans": CAREPLANS_DDL,
+    "observations": OBSERVATIONS_DDL,
+    "patient_summary": PATIENT_SUMMARY_DDL,
+    "ingest_batches": INGEST_BATCHES_DDL,
+    "ingest_batch_patients": INGEST_BATCH_PATIENTS_DDL,
+}
+
+# Coding columns added after the first deployment. They sit after patient_id so
+# tables created before and after the change have the same column order, which
+# the loader's INSERT ... SELECT * from the staging tables relies on.
+ADDED_COLUMNS = {
+    "conditions": (("codesystem", "VARCHAR(64) ENCODE ZSTD"),),
+    "medications": (("code", "VARCHAR(32) ENCODE ZSTD"), ("codesystem", "VARCHAR(64) ENCODE ZSTD")),
+    "careplans": (("code", "VARCHAR(32) ENCODE ZSTD"), ("codesystem", "VARCHAR(64) ENCODE ZSTD")),
+}
+
+# The queries the app and loader issue, with a sample patient id bound in.
+APP_QUERIES = {
+    "patient_summary_lookup": "SELECT id, gender, birthdate, conditions, medications, careplans FROM patient_summary WHERE id=%(pid)s",
+    "patient_lookup": "SELECT id, gender, birthdate FROM patients WHERE id=%(pid)s",
+    "conditions_lookup": "SELECT description FROM conditions WHERE patient_id=%(pid)s",
+    "medications_lookup": "SELECT medication AS description FROM medications WHERE patient_id=%(pid)s",
+    "medication_codes_lookup": "SELECT code, codesystem FROM medications WHERE patient_id=%(pid)s",
+    "careplans_lookup": "SELECT description FROM careplans WHERE patient_id=%(pid)s",
+    "observations_lookup": (
+        "SELECT type, value, unit, effectivedatetime FROM observations "
+        "WHERE patient_id=%(pid)s AND value IS NOT NULL ORDER BY effectivedatetime"
+    ),
+    "summary_refresh_join": """
+        SELECT p.id, COUNT(DISTINCT c.description), COUNT(DISTINCT m.medication), COUNT(DISTINCT cp.description)
+        FROM patients p
+        LEFT JOIN conditions c ON c.patient_id = p.id
+        LEFT JOIN medications m ON m.patient_id = p.id
+        LEFT JOIN careplans cp ON cp.patient_id = p.id
+        WHERE p.id=%(pid)s
+        GROUP BY p.id
+    """,
+}
+
+# Plan steps that move rows between nodes. DS_DIST_NONE / DS_DIST_ALL_NONE are fine.
+REDISTRIBUTION_STEPS = (
+    "DS_BCAST_INNER",
+    "DS_DIST_ALL_INNER",
+    "DS_DIST_INNER",
+    "DS_DIST_OUTER",
+    "DS_DIST_BOTH",
+)
+
+POINT_LOOKUP_BUDGET_SECONDS = 1.0
+
+
+# Redshift-only clauses, stripped to create the same tables on a local Postgres
+REDSHIFT_ONLY = re.compile(
+    r"\s+ENCODE\s+\w+|\s+DISTSTYLE\s+\w+|\s+DISTKEY\s*\([^)]*\)|\s+(COMPOUND\s+)?SORTKEY\s*\([^)]*\)"
+)
+
+
+def portable_ddl(ddl: str) -> str:
+    """Postgres-compatible DDL: no encodings, dist/sort keys or GETDATE()."""
+    return REDSHIFT_ONLY.sub("", ddl).replace("GETDATE()", "CURRENT_TIMESTAMP")
+
+
+def create_tables(conn, portable: bool = False):
+    """Creates any missing tables with their dist/sort keys and encodings."""
+    with conn:
+        with conn.cursor() as cur:
+            for table, ddl in TABLE_DDL.items():
+                cur.execute(portable_ddl(ddl) if portable else ddl)
+                print(f"✅ Ensured table: {table}")
+            add_missing_columns(cur, portable)
+
+
+def add_missing_columns(cur, portable: bool = False):
+    """ALTER TABLE ... ADD COLUMN for ADDED_COLUMNS missing from tables created earlier."""
+    for table, columns in ADDED_COLUMNS.items():
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s;", (table,))
+        existing = {row[0] for row in cur.fetchall()}
+        for column, definition in columns:
+            if column not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {portable_ddl(definition) if portable else definition};")
+                print(f"✅ Added column: {table}.{column}")
+
+
+def find_redistribution(plan_lines: list) -> list:
+    """Returns the plan lines that contain a broadcast or redistribution step."""
+    pattern = re.compile("|".join(REDISTRIBUTION_STEPS))
+    return [line for line in plan_lines if pattern.search(line)]
+
+
+def verify_query_plans(conn, sample_pid: str, queries: dict = APP_QUERIES) -> dict:
+    """
+    Runs EXPLAIN and a timed execution for every app query. Returns
+    {name: {"flags": [...], "seconds": float}} and prints a report.
+    """
+    report = {}
+    params = {"pid": sample_pid}
+
+    with conn.cursor() as cur:
+        for name, sql in queries.items():
+            cur.execute("EXPLAIN " + sql, params)
+            plan = [row[0] for row in cur.fetchall()]
+            flags = find_redistribution(plan)
+
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            seconds = time.perf_counter() - started
+
+            report[name] = {"flags": flags, "seconds": seconds}
+
+            status = "✅" if not flags and seconds < POINT_LOOKUP_BUDGET_SECONDS else "⚠️"
+            print(f"{status} {name}: {seconds * 1000:.1f} ms")
+            for line in flags:
+                print(f"    redistribution: {line.strip()}")
+            if seconds >= POINT_LOOKUP_BUDGET_SECONDS:
+                print(f"    over the {POINT_LOOKUP_BUDGET_SECONDS:.0f}s point-lookup budget")
+
+    conn.rollback()
+    return report
+
+
+if __name__ == "__main__":
+    from redshift_loader import get_connection
+
+    # Usage: python redshift_schema.py create
+    #        python redshift_schema.py verify <patient_id>
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    conn = get_connection()
+    try:
+        if command == "create":
+            create_tables(conn)
+        else:
+            report = verify_query_plans(conn, sys.argv[2] if len(sys.argv) > 2 else "")
+            flagged = [name for name, r in report.items() if r["flags"]]
+            sys.exit(1 if flagged else 0)
+    finally:
+        conn.close()
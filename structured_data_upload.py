@@ -2,67 +2,30 @@ import boto3
 import os
 import json
 
+from code_index import CodeIndex, CodeIndexBuilder, download_code_index, upload_code_index
+from fhir_extract import Extractor
+
+CODE_INDEX_DIR = os.getenv("CODE_INDEX_DIR", "code_index")
+CODE_INDEX_PREFIX = "code_index/"
+
+# Resource type -> section/fields dispatch table, compiled once per process
+EXTRACTOR = Extractor.from_file()
+
 
 ## aws s3 sync fhir/ s3://structuredhealthbotdata/structured/ --size-only
  
 
 def parse_fhir_bundle(file_path):
+    """
+    Structured document for one bundle; fields come from the fhir_paths.json spec.
+    Observations stay the raw dicts, coded results and source timestamps
+    included - the columnar ObservationSeries is built by the readers
+    (patient_store, the observations loader), not stored.
+    """
     with open(file_path) as f:
         bundle = json.load(f)
 
-    patient = {}
-    conditions = []
-    medications = []
-    observations = []
-    careplans = []
-
-    for entry in bundle.get("entry", []):
-        resource = entry.get("resource", {})
-        r_type = resource.get("resourceType")
-
-        if r_type == "Patient":
-            patient = {
-                "id": resource.get("id"),
-                "gender": resource.get("gender"),
-                "birthDate": resource.get("birthDate"),
-                "deceasedDateTime": resource.get("deceasedDateTime", None)
-            }
-
-        elif r_type == "Condition":
-            conditions.append({
-                "code": resource.get("code", {}).get("coding", [{}])[0].get("code"),
-                "description": resource.get("code", {}).get("coding", [{}])[0].get("display"),
-                "onset": resource.get("onsetDateTime"),
-                "clinicalStatus": resource.get("clinicalStatus")
-            })
-
-        elif r_type == "MedicationRequest":
-            medications.append({
-                "medication": resource.get("medicationCodeableConcept", {}).get("coding", [{}])[0].get("display"),
-                "authoredOn": resource.get("authoredOn")
-            })
-
-        elif r_type == "Observation":
-            observations.append({
-                "type": resource.get("code", {}).get("text"),
-                "value": resource.get("valueQuantity", {}).get("value"),
-                "unit": resource.get("valueQuantity", {}).get("unit"),
-                "effectiveDateTime": resource.get("effectiveDateTime")
-            })
-
-        elif r_type == "CarePlan":
-            careplans.append({
-                "description": resource.get("category", [{}])[0].get("coding", [{}])[0].get("display"),
-                "status": resource.get("status")
-            })
-
-    return {
-        "patient": patient,
-        "conditions": conditions,
-        "medications": medications,
-        "observations": observations,
-        "careplans": careplans
-    }
+    return EXTRACTOR.extract_bundle(bundle)
 
 def upload_structured_json_to_s3(json_data, bucket_name, s3_key):
     s3 = boto3.client("s3")
@@ -86,6 +49,7 @@ def upload_structured_json_to_s3(json_data, bucket_name, s3_key):
     print(f"✅ Uploaded structured → s3://{bucket_name}/{s3_key}")
 
 def parse_and_upload_folder(local_folder, bucket_name, s3_prefix="structured"):
+    code_index = CodeIndexBuilder()
     for root, dirs, files in os.walk(local_folder):
         for file in files:
             if not file.endswith(".json"):
@@ -98,9 +62,19 @@ def parse_and_upload_folder(local_folder, bucket_name, s3_prefix="structured"):
             try:
                 structured_data = parse_fhir_bundle(local_path)
                 upload_structured_json_to_s3(structured_data, bucket_name, structured_key)
+                code_index.add_document(structured_data)
             except Exception as e:
                 print(f"❌ Failed to process {local_path}: {e}")
 
+    # code -> patients index next to the structured outputs, merged with what
+    # earlier runs uploaded so a partial batch does not shrink it
+    previous_dir = f"{CODE_INDEX_DIR}.previous"
+    if download_code_index(bucket_name, previous_dir, CODE_INDEX_PREFIX):
+        code_index.add_index(CodeIndex(previous_dir))
+    code_index.write(CODE_INDEX_DIR)
+    upload_code_index(CODE_INDEX_DIR, bucket_name, CODE_INDEX_PREFIX)
+    print(EXTRACTOR.stats.report())
+
 if __name__ == "__main__":
     folder_path = "fhir"
     bucket_name = "structuredhealthbotdata"
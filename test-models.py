@@ -4,15 +4,34 @@
 
 from langgraph.graph import StateGraph, END
 from langchain.chat_models import ChatOpenAI
-from langchain.schema import SystemMessage
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain.tools import tool
+import argparse
 import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ehr_router
+from conversation import Conversation
+from patient_store import EhrRecord, load_patient_store
 
 # ----------------------------------------
-# Step 1: Simulated Database of Patient Records
+# Step 1: Patient Store
 # ----------------------------------------
-# In production, this would be a Redshift query using patient_id + DOB as the lookup key
+# Structured outputs from structured_data_upload.py, parsed once and indexed by (patient_id, DOB).
+# Point HEALTHBOT_STRUCTURED_SOURCE at a local folder for offline runs.
+# Loaded by main(), so importing this module reads nothing from S3.
+patient_db = None
+
+def load_store():
+    return load_patient_store(
+        os.getenv("HEALTHBOT_STRUCTURED_SOURCE", "s3://structuredhealthbotdata/structured/"),
+        snapshot=os.getenv("HEALTHBOT_PATIENT_SNAPSHOT")
+    )
 
 # ----------------------------------------
 # Step 2: LangGraph State Definition
@@ -21,7 +40,8 @@ class PatientState(dict):
     patient_id: str
     dob: str
     question: str
-    patient_data: dict
+    patient_data: EhrRecord
+    conversation: Conversation
     answer: str
 
 # ----------------------------------------
@@ -30,37 +50,56 @@ class PatientState(dict):
 @tool
 def get_patient_data(key: str) -> str:
     """Look up a patient's data using 'patient_id|dob' as the key."""
-    pid, dob = key.split("|")
-    data = patient_db.get((pid, dob))
-    if not data:
+    record = patient_db.lookup(key)
+    if record is None:
         return "No patient found with that ID and date of birth."
-    return json.dumps(data)
+    # Conditions, medications, care plans and latest vitals, cut to RECORD_TEXT_TOKENS
+    return record.details()
 
 # ----------------------------------------
 # Step 4: Tool to Answer Questions Using Patient Record
 # ----------------------------------------
 @tool
-def answer_question_using_ehr(question: str, patient_json: str) -> str:
-    """Answer health-related questions from a structured patient EHR record."""
-    data = json.loads(patient_json)
-    if "medication" in question.lower():
-        meds = data.get("medications", [])
-        return "\n".join(f"- {m['medication']}" for m in meds) or "No medications found."
-    if "condition" in question.lower() or "diagnose" in question.lower():
-        conditions = data.get("conditions", [])
-        return "\n".join(f"- {c['description']} (onset: {c['onset'][:10]})" for c in conditions) or "No conditions found."
-    if "temperature" in question.lower() or "fever" in question.lower():
-        obs = [o for o in data.get("observations", []) if o["unit"] == "Cel"]
-        return "\n".join(f"{o['value']}°C on {o['effectiveDateTime'][:10]}" for o in obs) or "No temperature records found."
-    return "I couldn’t find that in your health record."
+def answer_question_using_ehr(question: str, patient_key: str) -> str:
+    """Answer health-related questions from a structured patient EHR record ('patient_id|dob' key)."""
+    data = patient_db.lookup(patient_key)
+    if data is None:
+        return "No patient found with that ID and date of birth."
+    # No OPEN_ENDED guard here: "why/should/risk" questions are the ones the agent
+    # asks this tool about, so hand back the matching section or the whole record
+    routed = ehr_router.record_answer(question, data)
+    return routed[1] if routed else data.details()
 
 # ----------------------------------------
 # Step 5: LLM + Agent Setup
 # ----------------------------------------
-llm = ChatOpenAI(model="gpt-4", temperature=0)
-system_msg = SystemMessage(content="You are a helpful assistant who answers health questions using patient records.")
-agent = create_tool_calling_agent(llm, [get_patient_data, answer_question_using_ehr], system_msg)
-executor = AgentExecutor(agent=agent, tools=[get_patient_data, answer_question_using_ehr], verbose=True)
+# Every variable invoke_agent passes is read here, so the conversation memory reaches the model
+SYSTEM_PROMPT = """You are a helpful assistant who answers health questions using patient records.
+
+The patient for this session has the lookup key {patient_key}; pass it to the tools.
+{patient_summary}
+
+{conversation_context}"""
+
+TOOLS = [get_patient_data, answer_question_using_ehr]
+
+# Built by main() alongside the patient store
+executor = None
+
+def build_executor() -> AgentExecutor:
+    llm = ChatOpenAI(model="gpt-4", temperature=0)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+    agent = create_tool_calling_agent(llm, TOOLS, prompt)
+    return AgentExecutor(
+        agent=agent,
+        tools=TOOLS,
+        verbose=True,
+        return_intermediate_steps=True
+    )
 
 # ----------------------------------------
 # Step 6: LangGraph Nodes
@@ -77,23 +116,45 @@ def ask_question(state: PatientState) -> PatientState:
     state["question"] = input("> ").strip()
     return state
 
+def invoke_agent(question: str, conversation: Conversation) -> str:
+    result = executor.invoke({
+        "input": question,
+        "patient_key": conversation.lookup_key,
+        "patient_summary": conversation.record.summary(),
+        "conversation_context": conversation.context()
+    })
+    conversation.remember_tools(result.get("intermediate_steps"))
+    return result["output"]
+
 def run_agent(state: PatientState) -> PatientState:
+    started = time.perf_counter()
     lookup_key = f"{state['patient_id']}|{state['dob']}"
-    ehr_json = get_patient_data(lookup_key)
-    if "No patient found" in ehr_json:
-        state["answer"] = ehr_json
-    else:
-        result = executor.invoke({
-            "input": state["question"],
-            "patient_json": ehr_json
-        })
-        state["answer"] = result["output"]
+    conversation = state.get("conversation")
+    # Follow-up turns reuse the record and context fetched on the first turn
+    if conversation is None or conversation.lookup_key != lookup_key:
+        record = patient_db.lookup(lookup_key)
+        if record is None:
+            state["answer"] = "No patient found with that ID and date of birth."
+            return state
+        conversation = state["conversation"] = Conversation(lookup_key, record)
+        # The parsed record travels by reference; the tools look it up by key
+        state["patient_data"] = record
+
+    question = state["question"]
+    answer = conversation.cached_answer(question)
+    if answer is None:
+        # Structured questions are answered from the record; only open-ended ones reach GPT-4
+        answer = ehr_router.route(question, conversation.record, lambda: invoke_agent(question, conversation))
+    conversation.add_turn(question, answer)
+    state["answer"] = answer
+    print(f"⏱️ Turn {conversation.turns} answered in {time.perf_counter() - started:.2f}s")
     return state
 
 def show_answer(state: PatientState) -> PatientState:
     print(f"\n🤖 HealthBot Answer:\n{state['answer']}")
     print("\n🔁 Would you like to ask another question? (yes/no)")
     if input("> ").strip().lower() != "yes":
+        print(f"\n📊 Routing stats:\n{ehr_router.ROUTER_STATS.report()}")
         return state
     return ask_question(state)
 
@@ -113,8 +174,73 @@ graph.add_edge("run_agent", "show_answer")
 graph.add_edge("show_answer", "run_agent")  # loop for follow-up Qs
 graph.add_edge("show_answer", END)
 
+app = graph.compile()
+
+# Batch mode: state arrives pre-filled, so the graph is just the agent step
+batch_graph = StateGraph(PatientState)
+batch_graph.add_node("run_agent", run_agent)
+batch_graph.set_entry_point("run_agent")
+batch_graph.add_edge("run_agent", END)
+batch_app = batch_graph.compile()
+
+# ----------------------------------------
+# Step 8: Batch Runner
+# ----------------------------------------
+# python test-models.py --batch questions.jsonl --out answers.jsonl --concurrency 8
+# Each input line: {"patient_id": "...", "dob": "YYYY-MM-DD", "question": "..."}
+def answer_row(number: int, row: dict) -> dict:
+    started = time.perf_counter()
+    result = {"row": number, "patient_id": row.get("patient_id"), "dob": row.get("dob"), "question": row.get("question")}
+    try:
+        state = batch_app.invoke({"patient_id": row["patient_id"], "dob": row["dob"], "question": row["question"]})
+        result["answer"] = state["answer"]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+def run_batch(input_path: str, output_path: str, concurrency: int):
+    with open(input_path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    started = time.perf_counter()
+    latencies, errors = [], 0
+    write_lock = threading.Lock()
+    with open(output_path, "w") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(answer_row, number, row) for number, row in enumerate(rows, start=1)]
+        for future in as_completed(futures):
+            result = future.result()
+            latencies.append(result["seconds"])
+            errors += "error" in result
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    print(f"✅ {len(rows)} rows in {elapsed:.2f}s ({len(rows) / elapsed:.1f} rows/s), {errors} error(s)")
+    if ordered:
+        print(f"⏱️ p50 {statistics.median(ordered):.3f}s • p95 {ordered[max(0, int(len(ordered) * 0.95) - 1)]:.3f}s")
+    print(f"📊 Routing stats:\n{ehr_router.ROUTER_STATS.report()}")
+
 # ----------------------------------------
-# Step 8: Launch App
+# Step 9: Launch App
 # ----------------------------------------
-app = graph.compile()
-app.invoke({})
+def main():
+    global patient_db, executor
+    parser = argparse.ArgumentParser(description="HealthBot EHR Q&A")
+    parser.add_argument("--batch", help="JSONL of {patient_id, dob, question} rows to answer non-interactively")
+    parser.add_argument("--out", default="answers.jsonl")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    patient_db = load_store()
+    executor = build_executor()
+    if args.batch:
+        run_batch(args.batch, args.out, args.concurrency)
+    else:
+        app.invoke({})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Root scripts and the web app's modules import each other as siblings
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "healthbot-web")]
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_index import CodeIndex, CodeIndexBuilder
+
+SNOMED = "http://snomed.info/sct"
+RXNORM = "http://www.nlm.nih.gov/research/umls/rxnorm"
+
+
+def document(pid, conditions=(), medications=()):
+    return {
+        "patient": {"id": pid},
+        "conditions": [{"code": code, "codeSystem": SNOMED} for code in conditions],
+        "medications": [{"code": code, "codeSystem": RXNORM} for code in medications],
+    }
+
+
+def build(tmp_path, documents, previous=None, name="index"):
+    builder = CodeIndexBuilder()
+    for doc in documents:
+        builder.add_document(doc)
+    if previous is not None:
+        builder.add_index(previous)
+    builder.write(str(tmp_path / name))
+    return CodeIndex(str(tmp_path / name))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return build(tmp_path, [
+        document("p1", conditions=["44054006"], medications=["860975"]),
+        document("p2", conditions=["44054006", "59621000"], medications=["860975", "314076"]),
+        document("p3", conditions=["59621000"]),
+        document("p4"),
+    ])
+
+
+def test_all_of_intersects_every_key(index):
+    matched = index.all_of(["snomed:44054006", "rxnorm:860975"])
+    assert index.patient_ids(matched) == ["p1", "p2"]
+    assert index.patient_ids(index.all_of(["snomed:44054006", "snomed:59621000", "rxnorm:314076"])) == ["p2"]
+
+
+def test_all_of_with_an_unknown_key_is_empty(index):
+    assert len(index.all_of(["snomed:44054006", "snomed:000"])) == 0
+    assert len(index.all_of([])) == 0
+
+
+def test_any_of_and_count(index):
+    assert index.patient_ids(index.any_of(["rxnorm:314076", "snomed:59621000"])) == ["p2", "p3"]
+    assert index.count("snomed:44054006") == 2
+    assert index.lookup("snomed:59621000", limit=1) == ["p2"]
+
+
+def test_add_index_keeps_patients_outside_this_run(tmp_path, index):
+    # p2 is re-ingested without lisinopril; p5 is new; p1, p3 and p4 come from the earlier index
+    merged = build(tmp_path, [
+        document("p2", conditions=["44054006"], medications=["860975"]),
+        document("p5", medications=["314076"]),
+    ], previous=index, name="merged")
+    assert merged.patient_ids(np.arange(len(merged.patients))) == ["p1", "p2", "p3", "p4", "p5"]
+    assert merged.lookup("rxnorm:314076") == ["p5"]
+    assert merged.lookup("snomed:59621000") == ["p3"]
+    assert merged.patient_ids(merged.all_of(["snomed:44054006", "rxnorm:860975"])) == ["p1", "p2"]
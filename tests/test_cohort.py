@@ -0,0 +1,139 @@
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+pytest.importorskip("numpy")  # seed() reads documents through patient_store
+
+from cohort import CohortEngine, CohortIndex, compile_count, parse, seed
+
+TODAY = date(2026, 6, 15)
+
+SCHEMA = """
+CREATE TABLE patients (id TEXT, gender TEXT, birthdate DATE, deceaseddatetime TEXT);
+CREATE TABLE conditions (code TEXT, description TEXT, onset TEXT, clinicalstatus TEXT, patient_id TEXT, codesystem TEXT);
+CREATE TABLE medications (medication TEXT, authoredon TEXT, patient_id TEXT, code TEXT, codesystem TEXT);
+CREATE TABLE careplans (description TEXT, status TEXT, patient_id TEXT, code TEXT, codesystem TEXT);
+CREATE TABLE ingest_batches (batch_id INTEGER);
+"""
+
+DIABETES = {"code": "44054006", "codeSystem": "http://snomed.info/sct", "description": "Diabetes mellitus type 2"}
+HYPERTENSION = {"code": "59621000", "codeSystem": "http://snomed.info/sct", "description": "Essential hypertension"}
+METFORMIN = {"medication": "Metformin hydrochloride 500 MG Oral Tablet", "code": "860975"}
+LISINOPRIL = {"medication": "Lisinopril 10 MG Oral Tablet", "code": "314076"}
+
+DOCUMENTS = [
+    {"patient": {"id": "p1", "gender": "female", "birthDate": "1950-03-01"}, "conditions": [DIABETES], "medications": [METFORMIN]},
+    {"patient": {"id": "p2", "gender": "male", "birthDate": "1961-06-15"}, "conditions": [DIABETES, HYPERTENSION],
+     "medications": [METFORMIN, LISINOPRIL]},
+    {"patient": {"id": "p3", "gender": "female", "birthDate": "1990-12-31", "deceasedDateTime": "2020-01-01"},
+     "conditions": [HYPERTENSION]},
+    {"patient": {"id": "p4", "gender": None, "birthDate": "1975-01-01"}, "medications": [LISINOPRIL]},
+    {"patient": {"id": "p5", "gender": "male", "birthDate": None}, "conditions": [DIABETES]},
+    {"patient": {"id": "p6", "gender": None, "birthDate": None}},
+]
+
+EXPRESSIONS = [
+    "condition:diabetes",
+    "condition:diabetes and medication:metformin",
+    "condition:diabetes or medication:lisinopril",
+    "not condition:diabetes",
+    "gender:female",
+    "not gender:female",
+    "not (gender:female or age>=60)",
+    "age>=65",
+    "age<60",
+    "age=65",
+    "not age>=65",
+    "deceased:false",
+    "not deceased:true",
+    "condition:44054006 and not medication:860975",
+    "code:59621000",
+    "(medication:metformin or medication:lisinopril) and not (age>=70 and gender:male)",
+]
+
+
+class SqliteConnection:
+    """psycopg2-shaped wrapper: %s placeholders, cursors as context managers"""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+        self.db.executescript(SCHEMA)
+
+    def cursor(self):
+        return SqliteCursor(self.db.cursor())
+
+    def rollback(self):
+        self.db.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self.db.__exit__(*exc)
+
+
+class SqliteCursor:
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql.replace("%s", "?"), [p.isoformat() if isinstance(p, date) else p for p in params])
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(sql.replace("%s", "?"), rows)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cursor.close()
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("structured")
+    for document in DOCUMENTS:
+        (folder / f"{document['patient']['id']}.json").write_text(json.dumps(document))
+    conn = SqliteConnection()
+    assert seed(conn, str(folder)) == len(DOCUMENTS)
+    return conn
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_sql_and_bitmap_counts_match(conn, expression):
+    node = parse(expression, TODAY)
+    sql_count = CohortEngine(conn).count(node)
+    index_count = CohortEngine(conn, CohortIndex.build(conn)).count(node)
+    assert sql_count == index_count
+
+
+def test_negation_keeps_patients_without_demographics(conn):
+    index = CohortIndex.build(conn)
+    assert CohortEngine(conn, index).patient_ids(parse("not gender:female", TODAY)) == ["p2", "p4", "p5", "p6"]
+    # p1 and p2 (65 today) are 65 or older; p5 and p6 have no birthdate and stay in
+    assert CohortEngine(conn).patient_ids(parse("not age>=65", TODAY)) == ["p3", "p4", "p5", "p6"]
+
+
+def test_negation_compiles_to_is_not_true():
+    sql, params = compile_count(parse("not gender:female", TODAY))
+    assert "IS NOT TRUE" in sql and params == ["female"]
+
+
+def test_index_round_trips_through_json(conn, tmp_path):
+    index = CohortIndex.build(conn)
+    path = tmp_path / "cohort_index.json"
+    index.save(str(path))
+    loaded = CohortIndex.load(str(path))
+    assert loaded.ids == index.ids
+    for expression in EXPRESSIONS:
+        node = parse(expression, TODAY)
+        assert loaded.evaluate(node) == index.evaluate(node), expression
@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from context_budget import count_tokens
+from conversation import CONVERSATION_TOKENS, EXCHANGE_TOKENS, Conversation
+from patient_store import RECORD_TEXT_TOKENS, EhrRecord
+
+AgentAction = namedtuple("AgentAction", "tool tool_input log")
+
+
+@pytest.fixture
+def record():
+    return EhrRecord.from_document({
+        "patient": {"id": "p1", "gender": "female", "birthDate": "1960-01-02"},
+        "conditions": [
+            {"description": f"Condition number {n} with a long clinical description", "onset": "2010-05-01",
+             "clinicalStatus": "active"}
+            for n in range(300)
+        ],
+        "medications": [{"medication": f"Medication {n} 500 MG Oral Tablet", "authoredOn": "2012-01-01"} for n in range(100)],
+    })
+
+
+def test_budget_holds_the_record_and_an_exchange():
+    assert CONVERSATION_TOKENS >= RECORD_TEXT_TOKENS + EXCHANGE_TOKENS
+
+
+def test_second_turn_still_sees_the_first_turns_record_lookup(record):
+    details = record.details()
+    assert count_tokens(details) > RECORD_TEXT_TOKENS * 0.9  # a record that fills its budget
+
+    conversation = Conversation("p1|1960-01-02", record)
+    conversation.remember_tools([(AgentAction("get_patient_data", "p1|1960-01-02", ""), details)])
+    conversation.add_turn(
+        "What conditions does she have?",
+        "She has a long list of active conditions; the most relevant are listed in her record above."
+    )
+
+    assert details in conversation.context()
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import ehr_router
+from fhir_extract import Extractor
+from patient_store import EhrRecord
+
+
+@pytest.fixture
+def record():
+    return EhrRecord.from_document({
+        "patient": {"id": "p1", "gender": "female", "birthDate": "1960-01-02"},
+        "medications": [{"medication": "Metformin 500 MG"}],
+        "observations": [
+            {"type": "Glucose", "value": 130, "unit": "mg/dL", "effectiveDateTime": "2020-01-01"},
+            {"type": "Heart rate", "value": 70, "unit": "/min", "effectiveDateTime": "2020-01-01"},
+        ],
+    })
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Is my glucose normal?", "outside"),
+    ("Is my pulse normal?", "within"),
+])
+def test_normal_questions_naming_a_ranged_type(record, question, expected):
+    route, answer = ehr_router.fast_answer(question, record)
+    assert route == "ranges"
+    assert expected in answer
+
+
+@pytest.mark.parametrize("question", [
+    "Is it normal to feel dizzy?",
+    "Is my cholesterol normal?",  # no reading on record
+    "Why is my glucose not normal?",
+])
+def test_other_normal_questions_go_to_the_agent(record, question):
+    assert ehr_router.fast_answer(question, record) is None
+
+
+def test_abnormal_still_lists_flagged_labs(record):
+    route, answer = ehr_router.fast_answer("Any abnormal labs?", record)
+    assert route == "labs" and "Glucose" in answer and "Heart rate" not in answer
+
+
+def test_interaction_question_naming_another_drug_goes_to_the_agent():
+    record = EhrRecord.from_document({
+        "patient": {"id": "p2", "birthDate": "1950-05-05"},
+        "medications": [{"medication": "Warfarin Sodium 5 MG Oral Tablet"}, {"medication": "Simvastatin 20 MG Oral Tablet"}],
+    })
+    assert ehr_router.fast_answer("Can I take ibuprofen together with my current medications?", record) is None
+    route, _ = ehr_router.fast_answer("Do my medications interact?", record)
+    assert route == "interactions"
+
+
+def test_blood_pressure_comes_from_the_panel_components():
+    panel = {
+        "resourceType": "Observation",
+        "code": {"text": "Blood Pressure"},
+        "component": [
+            {"code": {"text": "Systolic Blood Pressure"}, "valueQuantity": {"value": 142, "unit": "mm[Hg]"}},
+            {"code": {"text": "Diastolic Blood Pressure"}, "valueQuantity": {"value": 78, "unit": "mm[Hg]"}},
+        ],
+        "effectiveDateTime": "2020-01-01T08:30:00+02:00",
+    }
+    document = Extractor.from_file().extract_bundle({"entry": [
+        {"resource": {"resourceType": "Patient", "id": "p3", "birthDate": "1950-05-05"}},
+        {"resource": panel},
+    ]})
+    record = EhrRecord.from_document(document)
+
+    route, answer = ehr_router.fast_answer("What is my blood pressure?", record)
+    assert route == "blood pressure"
+    assert "Systolic Blood Pressure" in answer and "142" in answer
+    assert "Diastolic Blood Pressure" in answer and "78" in answer
+
+    route, answer = ehr_router.fast_answer("Is my blood pressure normal?", record)
+    systolic, diastolic = answer.splitlines()
+    assert route == "ranges"
+    assert systolic.startswith("Systolic Blood Pressure: 142") and "outside the reference range" in systolic
+    assert diastolic.startswith("Diastolic Blood Pressure: 78") and "within the reference range" in diastolic
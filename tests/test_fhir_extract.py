@@ -0,0 +1,197 @@
+import json
+
+import pytest
+
+from fhir_extract import FHIR_PATHS, Extractor, SpecError, parse_path, validate_spec
+
+SNOMED = "http://snomed.info/sct"
+RXNORM = "http://www.nlm.nih.gov/research/umls/rxnorm"
+
+BUNDLE = {"entry": [
+    {"resource": {"resourceType": "Patient", "id": "p1", "gender": "female", "birthDate": "1960-01-02"}},
+    {"resource": {
+        "resourceType": "Condition",
+        "code": {"coding": [{"system": SNOMED, "code": "44054006", "display": "Diabetes mellitus type 2"}]},
+        "onsetDateTime": "2010-05-01T00:00:00Z",
+        "clinicalStatus": {"coding": [{"code": "active"}]},
+    }},
+    {"resource": {
+        "resourceType": "MedicationRequest",
+        "medicationCodeableConcept": {"coding": [{"system": RXNORM, "code": "860975", "display": "Metformin 500 MG"}]},
+        "authoredOn": "2010-05-02",
+    }},
+    {"resource": {
+        "resourceType": "Observation",
+        "code": {"text": "Body Weight"},
+        "valueQuantity": {"value": 70.5, "unit": "kg"},
+        "effectiveDateTime": "2020-01-01T08:30:00+02:00",
+    }},
+    {"resource": {
+        "resourceType": "CarePlan",
+        "category": [{"coding": [{"system": SNOMED, "code": "698360004", "display": "Diabetes self management plan"}]}],
+        "status": "active",
+    }},
+]}
+
+
+def legacy_parse(bundle):
+    """The hand-written parser the spec replaced, for the sections it covered"""
+    def first_coding(concept):
+        return ((concept or {}).get("coding") or [{}])[0]
+
+    document = {"patient": {}, "conditions": [], "medications": [], "observations": [], "careplans": []}
+    for entry in bundle.get("entry", []):
+        resource = entry.get("resource", {})
+        r_type = resource.get("resourceType")
+        if r_type == "Patient":
+            document["patient"] = {key: resource.get(key) for key in ("id", "gender", "birthDate", "deceasedDateTime")}
+        elif r_type == "Condition":
+            coding = first_coding(resource.get("code"))
+            document["conditions"].append({
+                "code": coding.get("code"), "codeSystem": coding.get("system"), "description": coding.get("display"),
+                "onset": resource.get("onsetDateTime"), "clinicalStatus": resource.get("clinicalStatus"),
+            })
+        elif r_type == "MedicationRequest":
+            coding = first_coding(resource.get("medicationCodeableConcept"))
+            document["medications"].append({
+                "medication": coding.get("display"), "code": coding.get("code"), "codeSystem": coding.get("system"),
+                "authoredOn": resource.get("authoredOn"),
+            })
+        elif r_type == "Observation":
+            quantity = resource.get("valueQuantity", {})
+            document["observations"].append({
+                "type": resource.get("code", {}).get("text"), "value": quantity.get("value"),
+                "unit": quantity.get("unit"), "effectiveDateTime": resource.get("effectiveDateTime"),
+            })
+        elif r_type == "CarePlan":
+            coding = first_coding((resource.get("category") or [{}])[0])
+            document["careplans"].append({
+                "description": coding.get("display"), "code": coding.get("code"), "codeSystem": coding.get("system"),
+                "status": resource.get("status"),
+            })
+    return document
+
+
+@pytest.fixture
+def extractor():
+    return Extractor.from_file()
+
+
+def test_bundled_spec_is_valid():
+    with open(FHIR_PATHS) as f:
+        assert validate_spec(json.load(f)) == []
+
+
+def test_parity_with_the_hand_written_parser(extractor):
+    document = extractor.extract_bundle(BUNDLE)
+    expected = legacy_parse(BUNDLE)
+    for section, value in expected.items():
+        assert document[section] == value, section
+    assert document["encounters"] == [] and document["procedures"] == []
+
+
+@pytest.mark.parametrize("spec, problem", [
+    ({}, "non-empty object"),
+    ({"Patient": []}, "rule must be an object"),
+    ({"Patient": {"section": "patient", "fields": {"id": "id"}, "extra": 1}}, "unknown keys"),
+    ({"Patient": {"fields": {"id": "id"}}}, "'section'"),
+    ({"Patient": {"section": "patient", "fields": {}}}, "'fields'"),
+    ({"Patient": {"section": "patient", "fields": {"id": "code..coding"}}}, "Invalid path segment"),
+    ({"Patient": {"section": "patient", "fields": {"id": []}}}, "non-empty list of paths"),
+    ({"Patient": {"section": "patient", "fields": {"id": "id"}, "required": ["gender"]}}, "required field 'gender'"),
+    ({"Patient": {"section": "patient", "fields": {"id": "id"}, "types": {"id": "text"}}}, "unknown type 'text'"),
+    ({"Patient": {"section": "patient", "fields": {"id": "id"}, "single": "yes"}}, "'single'"),
+    ({"Condition": {"section": "items", "fields": {"a": "a"}}, "Procedure": {"section": "items", "fields": {"a": "a"}}},
+     "several resource types"),
+])
+def test_invalid_spec_is_rejected(spec, problem):
+    assert any(problem in message for message in validate_spec(spec))
+    with pytest.raises(SpecError):
+        Extractor(spec)
+
+
+def test_parse_path():
+    assert parse_path("category[0].coding[0].display") == ["category", 0, "coding", 0, "display"]
+    with pytest.raises(SpecError):
+        parse_path("coding[x]")
+
+
+def test_empty_coding_list_yields_none(extractor):
+    document = extractor.extract_bundle({"entry": [
+        {"resource": {"resourceType": "Condition", "code": {"coding": []}, "onsetDateTime": "2010"}},
+        {"resource": {"resourceType": "Condition", "code": {"coding": [], "text": "Headache"}}},
+        {"resource": {"resourceType": "MedicationRequest"}},
+    ]})
+    first, second = document["conditions"]
+    assert (first["code"], first["description"], first["onset"]) == (None, None, "2010")
+    assert second["description"] == "Headache"  # falls back to code.text
+    assert document["medications"] == [{"medication": None, "code": None, "codeSystem": None, "authoredOn": None}]
+
+
+def test_non_dict_entries_are_counted_and_skipped(extractor):
+    document = extractor.extract_bundle({"entry": [
+        "not an entry",
+        {"resource": ["not", "a", "resource"]},
+        {"no_resource": True},
+        {"resource": {"resourceType": "Patient", "id": "p1"}},
+    ]})
+    assert document["patient"]["id"] == "p1"
+    assert extractor.stats.malformed == 3
+
+
+def test_unknown_resource_types_are_reported(extractor):
+    extractor.extract_bundle({"entry": [{"resource": {"resourceType": "Claim"}}, {"resource": {}}]})
+    assert extractor.stats.unhandled == {"Claim": 1, "(no resourceType)": 1}
+
+
+def test_required_and_types_drop_bad_values(extractor):
+    document = extractor.extract_bundle({"entry": [
+        {"resource": {"resourceType": "Patient", "gender": "male"}},  # no id: dropped
+        {"resource": {"resourceType": "Observation", "code": {"text": "Smoking"}, "valueQuantity": {"value": "never"}}},
+        {"resource": {"resourceType": "Observation", "code": {"text": "Weight"}, "valueQuantity": {"value": 70}}},
+    ]})
+    assert document["patient"] == {}
+    assert [(o["type"], o["value"]) for o in document["observations"]] == [("Smoking", None), ("Weight", 70)]
+    assert extractor.stats.errors["Patient"] == 1
+    assert extractor.stats.errors["Observation"] == 1
+
+
+LOINC = "http://loinc.org"
+
+
+def blood_pressure_panel(systolic, diastolic, when="2020-01-01T08:30:00+02:00"):
+    def component(code, display, value):
+        return {"code": {"coding": [{"system": LOINC, "code": code, "display": display}], "text": display},
+                "valueQuantity": {"value": value, "unit": "mm[Hg]"}}
+
+    return {"resource": {
+        "resourceType": "Observation",
+        "code": {"coding": [{"system": LOINC, "code": "85354-9", "display": "Blood Pressure"}], "text": "Blood Pressure"},
+        "component": [
+            component("8480-6", "Systolic Blood Pressure", systolic),
+            component("8462-4", "Diastolic Blood Pressure", diastolic),
+        ],
+        "effectiveDateTime": when,
+    }}
+
+
+def test_components_become_their_own_records(extractor):
+    document = extractor.extract_bundle({"entry": [blood_pressure_panel(142, 91)]})
+    assert document["observations"] == [
+        {"type": "Blood Pressure", "value": None, "unit": None, "effectiveDateTime": "2020-01-01T08:30:00+02:00"},
+        {"type": "Systolic Blood Pressure", "value": 142, "unit": "mm[Hg]", "effectiveDateTime": "2020-01-01T08:30:00+02:00"},
+        {"type": "Diastolic Blood Pressure", "value": 91, "unit": "mm[Hg]", "effectiveDateTime": "2020-01-01T08:30:00+02:00"},
+    ]
+    assert extractor.stats.resources["Observation"] == 1
+
+
+def test_components_must_be_a_path():
+    spec = {"Observation": {"section": "observations", "fields": {"type": "code.text"}, "components": ["component"]}}
+    assert any("'components' must be a path" in message for message in validate_spec(spec))
+
+
+def test_spec_file_override(tmp_path):
+    path = tmp_path / "paths.json"
+    path.write_text(json.dumps({"Patient": {"section": "patient", "single": True, "fields": {"id": "id"}}}))
+    extractor = Extractor.from_file(str(path))
+    assert extractor.extract_bundle({"entry": [{"resource": {"resourceType": "Patient", "id": "p1"}}]}) == {"patient": {"id": "p1"}}
@@ -0,0 +1,67 @@
+import pytest
+
+import context_budget
+import interactions
+from interactions import InteractionIndex
+from record_cache import PatientRecord
+
+MEDICATIONS = ["Warfarin Sodium 5 MG Oral Tablet", "Simvastatin 20 MG Oral Tablet"]
+
+
+@pytest.fixture
+def index():
+    return InteractionIndex([
+        {"drug_a": "warfarin", "drug_b": "ibuprofen", "severity": "major", "description": "Bleeding risk."},
+        {"drug_a": "ferrous sulfate", "drug_b": "levothyroxine", "severity": "moderate", "description": "Absorption."},
+        {"drug_a": "hydrochlorothiazide", "drug_b": "lithium", "severity": "major", "description": "Lithium levels."},
+    ])
+
+
+def test_ingredients_of_finds_known_names(index):
+    assert index.ingredients_of("24 HR Warfarin Sodium 5 MG Oral Tablet") == ("warfarin",)
+    assert index.ingredients_of("Ferrous Sulfate 325 MG Oral Tablet") == ("ferrous sulfate",)
+    assert index.ingredients_of("Acetaminophen 325 MG Oral Tablet") == ()
+
+
+def test_ingredients_of_combination_product(index):
+    found = index.ingredients_of("Lisinopril 10 MG / Hydrochlorothiazide 12.5 MG Oral Tablet")
+    assert found == ("hydrochlorothiazide",)
+
+
+def test_check_pairs_across_medications_only(index):
+    found = index.check(["Warfarin Sodium 5 MG Oral Tablet", "Ibuprofen 200 MG Oral Tablet"])
+    assert [(i.drug_a, i.drug_b, i.severity) for i in found] == [("warfarin", "ibuprofen", "major")]
+    assert index.check(["Warfarin and Ibuprofen Kit"]) == []
+
+
+@pytest.mark.parametrize("question", [
+    "Do my medications interact?",
+    "Are there any interactions between my current medications?",
+    "Do these drugs interact with each other?",
+])
+def test_list_questions_take_the_direct_path(question):
+    assert interactions.is_list_question(question, MEDICATIONS)
+
+
+@pytest.mark.parametrize("question", [
+    "Can I take ibuprofen together with my current medications?",  # a drug that is not on the list
+    "Is it safe to combine alcohol with my meds?",  # judgement, and a substance
+    "Do my meds interact with grapefruit?",
+    "Does tylenol interact with my medications?",  # a drug the offline list does not know
+    "What medications am I on?",  # not about interactions
+])
+def test_other_questions_fall_through(question):
+    assert not interactions.is_list_question(question, MEDICATIONS)
+
+
+def test_interactions_share_the_facts_budget(monkeypatch):
+    found = tuple(
+        interactions.Interaction("warfarin", f"drug{n}", "major", "Bleeding risk " * 10, "a", "b") for n in range(40)
+    )
+    monkeypatch.setattr(interactions, "interactions_for", lambda medications: found)
+    record = PatientRecord("p1", "female", None, tuple(f"Condition {n}" for n in range(40)),
+                           tuple(f"Medication {n}" for n in range(40)), ())
+    inputs = context_budget.assemble_context(record, "question", [], budget=1200)
+    facts = sum(context_budget.count_tokens(inputs[key]) for key in ("conditions", "medications", "interactions"))
+    assert facts <= int(1200 * context_budget.PATIENT_FACTS_SHARE) + 8  # "(+N more)" suffixes
+    assert "more" in inputs["interactions"] and "Condition 0" in inputs["conditions"]
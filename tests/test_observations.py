@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import observations
+from observations import ObservationSeries, summarize
+
+
+ROWS = [
+    ("Glucose", 90.0, "mg/dL", "2020-01-01T00:00:00Z"),
+    ("Glucose", 110.0, "mg/dL", "2021-01-01T00:00:00Z"),
+    ("Glucose", 130.0, "mg/dL", "2022-01-01T00:00:00Z"),
+    ("Heart rate", 72.0, "/min", "2021-06-01T00:00:00Z"),
+    ("Heart rate", 74.0, "/min", "2023-06-01T00:00:00Z"),
+]
+
+
+def test_rows_without_a_usable_time_are_dropped():
+    series = ObservationSeries.from_rows(ROWS + [
+        ("Glucose", 400.0, "mg/dL", None),
+        ("Glucose", 10.0, "mg/dL", "not a date"),
+    ])
+    assert len(series) == len(ROWS)
+    glucose = next(s for s in summarize(series) if s["type"] == "Glucose")
+    assert (glucose["count"], glucose["min"], glucose["max"]) == (3, 90.0, 130.0)
+
+
+def test_non_numeric_values_are_dropped():
+    series = ObservationSeries.from_rows(ROWS + [("Glucose", "high", "mg/dL", "2020-02-01"), ("Glucose", True, "", "2020-02-01")])
+    assert len(series) == len(ROWS)
+
+
+def test_summarize_orders_by_latest_and_flags_ranges():
+    summaries = summarize(ObservationSeries.from_rows(ROWS))
+    assert [s["type"] for s in summaries] == ["Heart rate", "Glucose"]
+    glucose = summaries[1]
+    assert glucose["latest"] == 130.0
+    assert glucose["latest_at"] == "2022-01-01"
+    assert glucose["mean"] == pytest.approx(110.0)
+    assert glucose["slope_per_year"] == pytest.approx(20.0, rel=0.01)
+    assert (glucose["flag"], glucose["out_of_range"]) == ("high", 2)
+    assert summaries[0]["flag"] == "normal"
+
+
+def test_summarize_without_a_reference_range():
+    (summary,) = summarize(ObservationSeries.from_rows([("Pain severity", 3.0, "{score}", "2020-01-01")]))
+    assert summary["flag"] is None
+    assert summary["low"] is None and summary["out_of_range"] == 0
+
+
+def test_summarize_empty_series():
+    assert summarize(ObservationSeries.from_rows([])) == []
+
+
+def test_select_by_type_and_window():
+    series = ObservationSeries.from_rows(ROWS)
+    assert [row[1] for row in series.select("Glucose")] == [90.0, 110.0, 130.0]
+    assert [row[1] for row in series.select("Glucose", since="2021-01-01", until="2022-01-01")] == [110.0]
+    assert len(series.select("Unknown type")) == 0
+    window = series.select(since="2021-01-01T00:00:00Z", until="2022-06-01")
+    assert sorted((row[0], row[1]) for row in window) == [("Glucose", 110.0), ("Glucose", 130.0), ("Heart rate", 72.0)]
+
+
+def test_select_rejects_an_unparseable_bound():
+    with pytest.raises(ValueError):
+        ObservationSeries.from_rows(ROWS).select("Glucose", since="someday")
+
+
+def test_to_epoch():
+    assert observations.to_epoch("1970-01-02T00:00:00Z") == 86400
+    assert observations.to_epoch(86400) == 86400
+    assert observations.to_epoch(None) is None
+    assert observations.to_epoch("") is None
+    assert observations.to_epoch("garbage") is None
@@ -0,0 +1,96 @@
+from collections import namedtuple
+from datetime import date
+
+import context_budget
+from patient_records import (
+    PATIENT_MEDICATIONS_QUERY, PATIENT_SUMMARY_QUERY, SUMMARY_DELIMITER, PatientRecordStore
+)
+
+SummaryRow = namedtuple(
+    "SummaryRow", "id gender birthdate conditions condition_count medications medication_count careplans careplan_count"
+)
+MedicationRow = namedtuple("MedicationRow", "medication")
+VersionRow = namedtuple("VersionRow", "batch_id")
+
+
+class FakeTables:
+    """fetch_rows over an in-memory patient_summary and medications table"""
+
+    def __init__(self, summary: dict, medications: dict):
+        self.summary = summary
+        self.medications = medications
+        self.batch_id = None
+        self.changed = {}
+        self.queries = []
+
+    def fetch_rows(self, query, params=()):
+        self.queries.append(query)
+        if query == PATIENT_SUMMARY_QUERY:
+            return [self.summary[params[0]]] if params[0] in self.summary else []
+        if query == PATIENT_MEDICATIONS_QUERY:
+            return [MedicationRow(m) for m in sorted(self.medications.get(params[0], ()))]
+        if query.startswith("SELECT MAX(batch_id)"):
+            return [VersionRow(self.batch_id)]
+        return [namedtuple("Changed", "patient_id")(pid) for pid in self.changed.get(params[0], ())]
+
+
+def summary_row(pid, conditions, condition_count, medications, medication_count):
+    return SummaryRow(
+        pid, "female", date(1960, 1, 2),
+        SUMMARY_DELIMITER.join(conditions), condition_count,
+        SUMMARY_DELIMITER.join(medications), medication_count,
+        None, 0
+    )
+
+
+def test_counts_come_from_the_summary_row():
+    tables = FakeTables({"p1": summary_row("p1", ["Asthma", "Diabetes"], 130, ["Metformin"], 1)}, {})
+    record = PatientRecordStore(tables.fetch_rows, max_bytes=1 << 20).get("p1")
+    assert record.conditions == ("Asthma", "Diabetes")
+    assert (record.count("conditions"), record.omitted("conditions")) == (130, 128)
+    assert record.count("careplans") == 0
+    assert PATIENT_MEDICATIONS_QUERY not in tables.queries
+
+
+def test_cut_short_medications_are_read_in_full():
+    medications = [f"Medication {n:03d}" for n in range(150)]
+    tables = FakeTables(
+        {"p1": summary_row("p1", [], 0, medications[:120], 150)},
+        {"p1": medications},
+    )
+    record = PatientRecordStore(tables.fetch_rows, max_bytes=1 << 20).get("p1")
+    assert record.medications == tuple(medications)
+    assert record.omitted("medications") == 0
+
+
+def test_prompt_facts_say_how_many_are_not_listed():
+    assert context_budget.fit_facts(["Asthma", "Diabetes"], 100, total=130) == "Asthma, Diabetes (+128 more)"
+    assert context_budget.fit_facts(["Asthma", "Diabetes"], 100) == "Asthma, Diabetes"
+
+
+def test_row_read_before_a_batch_is_noticed_is_not_cached():
+    stale = summary_row("p1", ["Asthma"], 1, [], 0)
+    fresh = summary_row("p1", ["Asthma", "Diabetes"], 2, [], 0)
+    tables = FakeTables({"p1": stale}, {})
+    tables.batch_id = 1
+    store = PatientRecordStore(tables.fetch_rows, max_bytes=1 << 20, poll_seconds=3600)
+
+    read_summary = tables.fetch_rows
+
+    def ingest_during_query(query, params=()):
+        rows = read_summary(query, params)
+        if query == PATIENT_SUMMARY_QUERY and tables.batch_id == 1:
+            # The loader commits batch 2 and another request notices it
+            # while this query's stale row is still on its way back.
+            tables.summary["p1"] = fresh
+            tables.batch_id = 2
+            tables.changed = {1: ["p1"]}
+            store.cache.sync_version(force=True)
+        return rows
+
+    store._fetch_rows = ingest_during_query
+
+    assert store.get("p1").conditions == ("Asthma",)
+    assert store.get("p1").conditions == ("Asthma", "Diabetes")
+    assert store.get("p1").conditions == ("Asthma", "Diabetes")
+    assert store.stats()["hits"] == 1
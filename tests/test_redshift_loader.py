@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("psycopg2")
+
+from redshift_loader import batch_files, write_manifest
+
+SOURCES = {
+    "patients": ("flattened_patients/", "id"),
+    "conditions": ("flattened_conditions/", "patient_id"),
+    "observations": ("flattened_observations/", "patient_id"),
+}
+
+
+def at(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects  # key -> last-modified epoch ms
+        self.puts = {}
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        yield {"Contents": [
+            {"Key": key, "LastModified": at(ms)}
+            for key, ms in self.objects.items() if key.startswith(Prefix)
+        ]}
+
+    def put_object(self, Bucket, Key, Body):
+        self.puts[Key] = Body
+
+
+def test_batch_covers_only_sources_with_new_output():
+    s3 = FakeS3({
+        "flattened_patients/a.json": 1_000,
+        "flattened_conditions/a.json": 1_000,
+        "flattened_patients/b.json": 1_000,
+        "flattened_conditions/b.json": 1_000,
+        "flattened_observations/b.json": 5_000,
+        "flattened_observations/c.json": 9_000,  # written after this batch started
+    })
+    files = batch_files(s3, "bucket", SOURCES, since_ms=2_000, until_ms=8_000)
+
+    # b's observations changed, so all of b's lists are reloaded; a is untouched
+    assert files == {
+        "patients": ["flattened_patients/b.json"],
+        "conditions": ["flattened_conditions/b.json"],
+        "observations": ["flattened_observations/b.json"],
+    }
+
+
+def test_first_batch_loads_everything():
+    s3 = FakeS3({"flattened_patients/a.json": 1_000, "flattened_conditions/b.json": 1_500})
+    files = batch_files(s3, "bucket", SOURCES, since_ms=0, until_ms=2_000)
+    assert files["patients"] == ["flattened_patients/a.json"]
+    assert files["conditions"] == ["flattened_conditions/b.json"]
+    assert files["observations"] == []
+
+
+def test_manifest_lists_exactly_the_batch_files():
+    s3 = FakeS3({})
+    url = write_manifest(s3, "bucket", 42, "conditions", ["flattened_conditions/b.json"])
+
+    assert url == "s3://bucket/manifests/42/conditions.manifest"
+    body = json.loads(s3.puts["manifests/42/conditions.manifest"])
+    assert body == {"entries": [{"url": "s3://bucket/flattened_conditions/b.json", "mandatory": True}]}
@@ -0,0 +1,50 @@
+import json
+import re
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from redshift_schema import CONDITIONS_DDL
+from structured_data_upload import parse_fhir_bundle
+from upload_conditions import flatten_conditions_with_patient
+
+SNOMED = "http://snomed.info/sct"
+
+R4_CONDITION = {
+    "resourceType": "Condition",
+    "code": {"coding": [{"system": SNOMED, "code": "44054006", "display": "Diabetes mellitus type 2"}]},
+    "onsetDateTime": "2010-05-01T00:00:00Z",
+    "clinicalStatus": {"coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
+        "code": "active",
+    }]},
+}
+
+
+def varchar_widths(ddl: str) -> dict:
+    return {column: int(width) for column, width in re.findall(r"^\s*(\w+)\s+VARCHAR\((\d+)\)", ddl, re.M)}
+
+
+@pytest.fixture
+def flattened_conditions(tmp_path):
+    """conditions rows exactly as the flattener writes them for the loader's COPY"""
+    path = tmp_path / "bundle.json"
+    path.write_text(json.dumps({"entry": [
+        {"resource": {"resourceType": "Patient", "id": "p1", "birthDate": "1960-01-02"}},
+        {"resource": R4_CONDITION},
+    ]}))
+    return [json.loads(line) for line in flatten_conditions_with_patient(parse_fhir_bundle(str(path)))]
+
+
+def test_r4_clinical_status_loads_as_its_code(flattened_conditions):
+    assert [row["clinicalstatus"] for row in flattened_conditions] == ["active"]
+
+
+def test_flattened_conditions_fit_the_ddl(flattened_conditions):
+    widths = varchar_widths(CONDITIONS_DDL)
+    assert "clinicalstatus" in widths
+    for row in flattened_conditions:
+        for column, width in widths.items():
+            value = row.get(column)
+            assert value is None or isinstance(value, str) and len(value) <= width, (column, value)
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from structured_data_upload import parse_fhir_bundle
+
+
+def test_observations_are_stored_as_extracted(tmp_path):
+    bundle = {"entry": [
+        {"resource": {"resourceType": "Patient", "id": "p1", "birthDate": "1960-01-02"}},
+        {"resource": {
+            "resourceType": "Observation",
+            "code": {"text": "Body Weight"},
+            "valueQuantity": {"value": 70.5, "unit": "kg"},
+            "effectiveDateTime": "2020-01-01T08:30:00+02:00",
+        }},
+        {"resource": {
+            "resourceType": "Observation",
+            "code": {"text": "Tobacco smoking status"},
+            "valueCodeableConcept": {"text": "Never smoker"},
+            "effectiveDateTime": "2020-01-01T08:30:00+02:00",
+        }},
+    ]}
+    path = tmp_path / "bundle.json"
+    path.write_text(json.dumps(bundle))
+
+    document = parse_fhir_bundle(str(path))
+
+    # Plain JSON, source timestamps untouched, coded results kept
+    assert json.loads(json.dumps(document))["observations"] == [
+        {"type": "Body Weight", "value": 70.5, "unit": "kg", "effectiveDateTime": "2020-01-01T08:30:00+02:00"},
+        {"type": "Tobacco smoking status", "value": None, "unit": None, "effectiveDateTime": "2020-01-01T08:30:00+02:00"},
+    ]
@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import vector_index
+
+RESULTS = [
+    {"title": f"Lisinopril and potassium {n}", "url": f"https://example.org/{n}",
+     "content": "Lisinopril is an ACE inhibitor. " * 40 + f"Page {n} covers potassium, kidney function and monitoring."}
+    for n in range(3)
+]
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "VECTOR_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_ENABLED", True)
+    vector_index.get_index.cache_clear()
+    yield tmp_path
+    vector_index.get_index.cache_clear()
+
+
+def test_repeated_agent_query_is_served_locally(index_dir):
+    query = "Should I worry about potassium levels on lisinopril?"
+    assert vector_index.retrieve(query, kind="snippet") is None
+    vector_index.remember(vector_index.snippet_entries(query, RESULTS))
+
+    hits = vector_index.retrieve("should I worry about potassium levels on Lisinopril", kind="snippet")
+    assert hits is not None
+    assert {hit["url"] for hit in hits} == {result["url"] for result in RESULTS}
+    assert all(hit["score"] > 0.99 for hit in hits)
+
+
+def test_repeated_agent_query_adds_no_rows(index_dir):
+    query = "Should I worry about potassium levels on lisinopril?"
+    vector_index.remember(vector_index.snippet_entries(query, RESULTS))
+    vector_index.remember(vector_index.snippet_entries(query.upper(), RESULTS))
+    assert vector_index.stats()["rows"] == len(RESULTS)
+
+
+def test_unrelated_query_misses(index_dir):
+    vector_index.remember(vector_index.snippet_entries("potassium levels on lisinopril", RESULTS))
+    assert vector_index.retrieve("best exercises after knee replacement", kind="snippet") is None
+
+
+def test_subject_lookups_need_the_same_subject(index_dir):
+    vector_index.remember(vector_index.snippet_entries("lisinopril uses", RESULTS, subject="Lisinopril medication"))
+    assert vector_index.retrieve("Lisinopril medication", kind="snippet", subject="Lisinopril medication") is not None
+    assert vector_index.retrieve("Amlodipine medication", kind="snippet", subject="Amlodipine medication") is None
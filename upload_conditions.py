@@ -1,10 +1,19 @@
 import boto3
 import json
+from botocore.exceptions import ClientError
 from typing import Dict, Any
 
+def status_code(status):
+    """FHIR clinicalStatus is a CodeableConcept in R4 and a plain string in older bundles"""
+    if isinstance(status, dict):
+        status = (status.get("coding") or [{}])[0].get("code")
+    return status
+
 def flatten_conditions_with_patient(data: Dict[str, Any]) -> list:
     """
     For each condition in the patient file, add the patient_id and flatten.
+    clinicalStatus is reduced to its code so it loads into conditions.clinicalstatus
+    as 'active' rather than as the CodeableConcept's JSON text.
     """
     conditions = data.get("conditions", [])
     patient_id = data.get("patient", {}).get("id", None)
@@ -12,10 +21,21 @@ def flatten_conditions_with_patient(data: Dict[str, Any]) -> list:
     flattened = []
     for cond in conditions:
         flat = {k.lower(): v for k, v in cond.items()}
+        if "clinicalstatus" in flat:
+            flat["clinicalstatus"] = status_code(flat["clinicalstatus"])
         flat["patient_id"] = patient_id
         flattened.append(json.dumps(flat, separators=(",", ":")))
     return flattened
 
+def output_is_current(s3, bucket: str, source: dict, dest_key: str) -> bool:
+    """True when dest_key is newer than its source; rewriting it would only put the
+    patient into the loader's next batch again."""
+    try:
+        dest = s3.head_object(Bucket=bucket, Key=dest_key)
+    except ClientError:
+        return False
+    return dest["LastModified"] >= source["LastModified"]
+
 def process_and_store_conditions(bucket: str, source_prefix: str, dest_prefix: str):
     s3 = boto3.client('s3')
     response = s3.list_objects_v2(Bucket=bucket, Prefix=source_prefix)
@@ -29,6 +49,10 @@ def process_and_store_conditions(bucket: str, source_prefix: str, dest_prefix: s
         if not key.endswith('.json'):
             continue
 
+        new_key = f"{dest_prefix}{key.split('/')[-1]}"
+        if output_is_current(s3, bucket, obj, new_key):
+            continue
+
         content = s3.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
         all_conds = []
 
@@ -40,7 +64,6 @@ def process_and_store_conditions(bucket: str, source_prefix: str, dest_prefix: s
             except Exception as e:
                 print(f"Error in {key}: {e}")
 
-        new_key = f"{dest_prefix}{key.split('/')[-1]}"
         s3.put_object(
             Bucket=bucket,
             Key=new_key,
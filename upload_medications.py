@@ -1,5 +1,6 @@
 import boto3
 import json
+from botocore.exceptions import ClientError
 from typing import Dict, Any
 
 def flatten_careplans_with_patient(data: Dict[str, Any]) -> list:
@@ -13,6 +14,15 @@ def flatten_careplans_with_patient(data: Dict[str, Any]) -> list:
         flattened.append(json.dumps(flat, separators=(",", ":")))
     return flattened
 
+def output_is_current(s3, bucket: str, source: dict, dest_key: str) -> bool:
+    """True when dest_key is newer than its source; rewriting it would only put the
+    patient into the loader's next batch again."""
+    try:
+        dest = s3.head_object(Bucket=bucket, Key=dest_key)
+    except ClientError:
+        return False
+    return dest["LastModified"] >= source["LastModified"]
+
 def process_and_store_careplans(bucket: str, source_prefix: str, dest_prefix: str):
     s3 = boto3.client('s3')
     response = s3.list_objects_v2(Bucket=bucket, Prefix=source_prefix)
@@ -26,6 +36,10 @@ def process_and_store_careplans(bucket: str, source_prefix: str, dest_prefix: st
         if not key.endswith('.json'):
             continue
 
+        new_key = f"{dest_prefix}{key.split('/')[-1]}"
+        if output_is_current(s3, bucket, obj, new_key):
+            continue
+
         content = s3.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
         all_plans = []
 
@@ -37,7 +51,6 @@ def process_and_store_careplans(bucket: str, source_prefix: str, dest_prefix: st
             except Exception as e:
                 print(f"Error in {key}: {e}")
 
-        new_key = f"{dest_prefix}{key.split('/')[-1]}"
         s3.put_object(
             Bucket=bucket,
             Key=new_key,
@@ -0,0 +1,69 @@
+import boto3
+import json
+from botocore.exceptions import ClientError
+from typing import Dict, Any
+
+def flatten_observations_with_patient(data: Dict[str, Any]) -> list:
+    """
+    For each numeric observation in the patient file, add the patient_id and flatten.
+    Observations without a valueQuantity (panels, coded results) carry nothing to chart.
+    """
+    observations = data.get("observations", [])
+    patient_id = data.get("patient", {}).get("id", None)
+
+    flattened = []
+    for obs in observations:
+        if not isinstance(obs.get("value"), (int, float)):
+            continue
+        flat = {k.lower(): v for k, v in obs.items()}
+        flat["patient_id"] = patient_id
+        flattened.append(json.dumps(flat, separators=(",", ":")))
+    return flattened
+
+def output_is_current(s3, bucket: str, source: dict, dest_key: str) -> bool:
+    """True when dest_key is newer than its source; rewriting it would only put the
+    patient into the loader's next batch again."""
+    try:
+        dest = s3.head_object(Bucket=bucket, Key=dest_key)
+    except ClientError:
+        return False
+    return dest["LastModified"] >= source["LastModified"]
+
+def process_and_store_observations(bucket: str, source_prefix: str, dest_prefix: str):
+    s3 = boto3.client('s3')
+    paginator = s3.get_paginator('list_objects_v2')
+
+    for page in paginator.paginate(Bucket=bucket, Prefix=source_prefix):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if not key.endswith('.json'):
+                continue
+
+            new_key = f"{dest_prefix}{key.split('/')[-1]}"
+            if output_is_current(s3, bucket, obj, new_key):
+                continue
+
+            content = s3.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
+            all_obs = []
+
+            for line in content.strip().split("\n"):
+                try:
+                    data = json.loads(line)
+                    all_obs.extend(flatten_observations_with_patient(data))
+                except Exception as e:
+                    print(f"Error in {key}: {e}")
+
+            s3.put_object(
+                Bucket=bucket,
+                Key=new_key,
+                Body="\n".join(all_obs).encode("utf-8"),
+                ContentType="application/json"
+            )
+            print(f"✅ Uploaded observations to: {new_key}")
+
+# Run the processor
+if __name__ == "__main__":
+    BUCKET = "structuredhealthbotdata"
+    SOURCE = "flattened/"
+    DEST = "flattened_observations/"
+    process_and_store_observations(BUCKET, SOURCE, DEST)